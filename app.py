@@ -1,12 +1,24 @@
 # ========== IMPORTS / CONFIG ==========
 import streamlit as st
 import pandas as pd
+import hashlib
+import math
+import os
 from urllib.parse import quote
-import requests
 from datetime import datetime
-import time
 from ibge_localidades import buscar_estados, buscar_cidades_por_estado
-from nichos_comerciais import obter_todos_nichos, obter_tags_osm_nicho, obter_categorias_nicho
+from nichos_comerciais import obter_todos_nichos, obter_categorias_nicho
+from armazem_leads import carregar_leads, resumo_armazem
+from auditoria_sites import cache_auditorias
+from cache_local import PASTA_CACHE
+from disjuntor import ABERTO, ROTULOS_ESTADO, situacao_servicos
+from instrumentacao import gravar_jsonl, gravar_prometheus, limpar as limpar_metricas, resumir
+from exportacao import FORMATOS, exportar_leads, ler_arquivo
+from pontuacao import NIVEL_ALTA, repontuar
+from fila_jobs import (
+    CONCLUIDO, FINALIZADOS, ROTULOS_STATUS,
+    enviar_job, cancelar_job, obter_job, listar_jobs, carregar_parcial, carregar_resultado,
+)
 
 st.set_page_config(
     page_title="Agente de Prospecção | LP Design",
@@ -52,227 +64,30 @@ def buscar_logo_site(url):
         return None
 
 
-def analisar_site(url):
-    if not url:
-        return {"responde": False, "tem_https": False, "tem_mobile": False, "wordpress": False, "tempo": 0}
-    
-    try:
-        if not url.startswith('http'):
-            url = 'https://' + url
-        
-        start = time.time()
-        response = requests.get(url, timeout=5, allow_redirects=True)
-        tempo = time.time() - start
-        html = response.text.lower()
-        
-        return {
-            "responde": response.status_code == 200,
-            "tem_https": url.startswith('https'),
-            "tem_mobile": 'viewport' in html,
-            "wordpress": 'wp-content' in html or 'wp-includes' in html,
-            "tempo": round(tempo, 2)
-        }
-    except:
-        return {"responde": False, "tem_https": False, "tem_mobile": False, "wordpress": False, "tempo": 0}
-
-
-def calcular_prioridade_score(lead_data, analise_site):
-    score = 0
-    sugestoes = []
-    
-    if not lead_data.get("site"):
-        score += 40
-        sugestoes.append("🌐 Criação de Site")
-    elif not analise_site["responde"]:
-        score += 35
-        sugestoes.append("🔧 Site Offline")
-    else:
-        if not analise_site["tem_https"]:
-            score += 15
-            sugestoes.append("🔒 HTTPS")
-        if analise_site["tempo"] > 3:
-            score += 15
-            sugestoes.append("⚡ Performance")
-        if not analise_site["tem_mobile"]:
-            score += 20
-            sugestoes.append("📱 Mobile")
-    
-    if not lead_data.get("facebook") and not lead_data.get("instagram"):
-        score += 20
-        sugestoes.append("📱 Redes Sociais")
-    
-    sugestoes.append("🎨 Identidade Visual")
-    sugestoes.append("📊 Marketing Digital")
-    
-    if score >= 70:
-        prioridade = "🔴 Alta"
-    elif score >= 40:
-        prioridade = "🟡 Média"
-    else:
-        prioridade = "🟢 Baixa"
-    
-    return {
-        "prioridade": prioridade,
-        "score": min(score, 100),
-        "sugestoes": sugestoes[:5]
-    }
-
-
 def gerar_mensagem_whatsapp(empresa, cidade):
     return f"Olá! Encontrei {empresa} em {cidade} e vejo oportunidades de melhorar a presença digital. Sou da LP Design. Podemos conversar?"
 
 
-def geocodificar_cidade(cidade, estado):
-    try:
-        url = "https://nominatim.openstreetmap.org/search"
-        params = {"q": f"{cidade}, {estado}, Brasil", "format": "json", "limit": 1}
-        headers = {"User-Agent": "LP-Design-Prospector/2.0"}
-        time.sleep(1)
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        data = response.json()
-        if data:
-            return float(data[0]["lat"]), float(data[0]["lon"])
-        return -15.7939, -47.8828
-    except:
-        return -15.7939, -47.8828
-
-
-def mapear_categoria_para_tags(categoria):
-    """Mapeia categorias específicas para tags OSM precisas"""
-    mapeamento = {
-        # Alimentação
-        "restaurantes": ["amenity=restaurant"],
-        "cafeterias": ["amenity=cafe"],
-        "lanchonetes e fast-food": ["amenity=fast_food"],
-        "pizzarias": ["amenity=restaurant", "cuisine=pizza"],
-        "padarias": ["shop=bakery"],
-        "bares e pubs": ["amenity=bar", "amenity=pub"],
-        "sorveterias": ["shop=ice_cream", "amenity=ice_cream"],
-        "confeitarias": ["shop=confectionery", "shop=pastry"],
-        
-        # Saúde
-        "clínicas médicas": ["amenity=clinic", "amenity=doctors"],
-        "consultórios odontológicos": ["amenity=dentist"],
-        "farmácias": ["amenity=pharmacy"],
-        "academias": ["leisure=fitness_centre", "leisure=sports_centre"],
-        "fisioterapia": ["amenity=clinic", "healthcare=physiotherapist"],
-        
-        # Beleza
-        "salões de beleza": ["shop=beauty", "shop=hairdresser"],
-        "barbearias": ["shop=barber"],
-        
-        # Serviços
-        "escritórios de advocacia": ["office=lawyer"],
-        "contabilidade": ["office=accountant"],
-        "imobiliárias": ["office=estate_agent"],
-        
-        # Varejo
-        "lojas de roupas": ["shop=clothes"],
-        "calçados": ["shop=shoes"],
-        "eletrônicos": ["shop=electronics"],
-        "móveis e decoração": ["shop=furniture"],
-        
-        # Automotivo
-        "oficinas mecânicas": ["shop=car_repair"],
-        "lava-jatos": ["amenity=car_wash"],
-    }
-    
-    categoria_lower = categoria.lower()
-    for key in mapeamento:
-        if key in categoria_lower:
-            return mapeamento[key]
+def formatar_diagnostico(row):
+    """Resumo das medições detalhadas da auditoria para o relatório"""
+    def ms(valor):
+        return f"{valor:.0f} ms" if pd.notna(valor) else "N/A"
     
-    return None
-
-
-def buscar_leads_overpass(cidade, estado, max_leads, nicho, categoria):
-    try:
-        lat, lon = geocodificar_cidade(cidade, estado)
-        
-        # Tenta mapear categoria específica primeiro
-        if categoria != "Todas":
-            tags = mapear_categoria_para_tags(categoria)
-            if not tags:
-                # Se não encontrou mapeamento, usa tags do nicho
-                tags = obter_tags_osm_nicho(nicho)
-        else:
-            tags = obter_tags_osm_nicho(nicho)
-        
-        if not tags:
-            tags = ["shop"]
-        
-        raio_metros = 20000
-        
-        query = f"[out:json][timeout:30];("
-        for tag in tags:
-            key, value = tag.split("=")
-            query += f'node["{key}"="{value}"](around:{raio_metros},{lat},{lon});'
-            query += f'way["{key}"="{value}"](around:{raio_metros},{lat},{lon});'
-        query += ");out center;"
-        
-        url = "https://overpass-api.de/api/interpreter"
-        
-        with st.spinner(f"🔍 Buscando em {cidade}/{estado}..."):
-            time.sleep(2)
-            response = requests.post(url, data={"data": query}, timeout=40)
-            data = response.json()
-        
-        elements = data.get("elements", [])[:max_leads]
-        
-        leads = []
-        for i, element in enumerate(elements, 1):
-            tags = element.get("tags", {})
-            
-            nome = tags.get("name", f"Estabelecimento {i}")
-            telefone = tags.get("phone", tags.get("contact:phone", ""))
-            whatsapp = "".join([c for c in telefone if c.isdigit()])
-            website = tags.get("website", tags.get("contact:website", ""))
-            
-            rua = tags.get("addr:street", "")
-            numero = tags.get("addr:housenumber", "")
-            bairro = tags.get("addr:suburb", "")
-            endereco_completo = f"{rua}, {numero}" if rua and numero else ""
-            if bairro:
-                endereco_completo += f", {bairro}"
-            endereco_completo += f" - {cidade}/{estado}"
-            
-            facebook = tags.get("contact:facebook", "")
-            instagram = tags.get("contact:instagram", "")
-            email = tags.get("email", tags.get("contact:email", ""))
-            
-            lead_data = {
-                "id": i,
-                "key": f"{nome}_{cidade}_{i}",
-                "empresa": nome,
-                "nicho": nicho,
-                "categoria": tags.get("amenity", tags.get("shop", tags.get("office", categoria))),
-                "estado": estado,
-                "cidade": cidade,
-                "endereco": endereco_completo,
-                "site": website,
-                "whatsapp": whatsapp,
-                "telefone": telefone,
-                "email": email,
-                "facebook": facebook,
-                "instagram": instagram,
-            }
-            
-            analise = analisar_site(website)
-            prioridade_data = calcular_prioridade_score(lead_data, analise)
-            
-            lead_data.update({
-                "prioridade": prioridade_data["prioridade"],
-                "score": prioridade_data["score"],
-                "sugestoes": prioridade_data["sugestoes"],
-            })
-            
-            leads.append(lead_data)
-        
-        return pd.DataFrame(leads)
-        
-    except Exception as e:
-        st.error(f"❌ Erro: {str(e)}")
-        return pd.DataFrame()
+    linhas = [
+        f"Plataforma: {row.get('cms') or 'Não identificada'} {row.get('cms_versao') or ''}".rstrip(),
+        f"DNS {ms(row.get('dns_ms'))} | Conexão {ms(row.get('conexao_ms'))} | TLS {ms(row.get('tls_ms'))} | TTFB {ms(row.get('ttfb_ms'))}",
+        f"HTTP/2: {'Sim' if row.get('http2') else 'Não'} | Compressão: {row.get('compressao') or 'Nenhuma'}",
+    ]
+    if pd.notna(row.get("tamanho_bytes")):
+        linhas.append(f"Página: {row['tamanho_bytes'] / 1024:.0f} KB{'' if row.get('tamanho_exato') else '+ (parcial)'}")
+    certificado_valido = row.get("certificado_valido")
+    if pd.notna(certificado_valido) and not certificado_valido:
+        linhas.append("Certificado SSL: inválido")
+    elif pd.notna(row.get("certificado_dias_restantes")):
+        linhas.append(f"Certificado SSL: expira em {row['certificado_dias_restantes']:.0f} dias")
+    if row.get("redirecionamentos"):
+        linhas.append(f"Redirecionamentos: {row['redirecionamentos']:.0f} → {row.get('url_final', '')}")
+    return "\n".join(linhas)
 
 
 def montar_link_whatsapp(numero, mensagem):
@@ -283,59 +98,180 @@ def montar_link_whatsapp(numero, mensagem):
     return f"https://wa.me/{num_final}?text={quote(mensagem)}"
 
 
-def exportar_para_excel(leads_dict, cidade, nicho):
-    """Exporta leads para Excel formatado"""
-    import io
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Leads"
-    
-    # Cabeçalhos
-    headers = ["Empresa", "Prioridade", "Score", "Telefone", "WhatsApp", "Site", "Endereço", "Cidade", "Estado", "Sugestões"]
-    ws.append(headers)
+def origens_exportacao(uf):
+    """Conjuntos de leads exportáveis; cada um só é carregado quando o arquivo é gerado"""
+    origens = {}
+    if st.session_state.selecionados:
+        origens[f"📌 Selecionados ({len(st.session_state.selecionados)})"] = (
+            lambda: pd.DataFrame(list(st.session_state.selecionados.values()))
+        )
+    if not st.session_state.df_leads.empty:
+        origens[f"📊 Resultado atual ({len(st.session_state.df_leads)})"] = lambda: st.session_state.df_leads
+    for job in listar_jobs(limite=10):
+        if job["status"] == CONCLUIDO:
+            origens[f"🗂️ {job['descricao']} — {job['mensagem']}"] = (
+                lambda job_id=job["id"]: repontuar(carregar_resultado(job_id)[0])
+            )
+    origens[f"📦 Armazém: todos os leads de {uf}"] = lambda: pd.DataFrame(carregar_leads(uf))
+    return origens
+
+
+def painel_exportacao(uf, cidade):
+    """Gera o arquivo só quando pedido e oferece o download do último gerado"""
+    origens = origens_exportacao(uf)
+    col_e1, col_e2 = st.columns([3, 2])
+    with col_e1:
+        origem = st.selectbox("Exportar", list(origens))
+    with col_e2:
+        formato = st.selectbox("Formato", list(FORMATOS), format_func=lambda f: FORMATOS[f][0])
     
-    # Formatar cabeçalho
-    for cell in ws[1]:
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.fill = PatternFill(start_color="FF6B35", end_color="FF6B35", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center", vertical="center")
+    if st.button("📦 Gerar arquivo", use_container_width=True):
+        df_exportar = origens[origem]()
+        if df_exportar.empty:
+            st.warning("Nenhum lead para exportar.")
+        else:
+            try:
+                caminho = exportar_leads(df_exportar, formato, f"leads_{cidade}")
+                st.session_state.arquivo_exportacao = (caminho, formato, len(df_exportar))
+            except ImportError:
+                st.error(f"Instale {FORMATOS[formato][2]}: pip install {FORMATOS[formato][2]}")
     
-    # Dados
-    for lead in leads_dict.values():
-        sugestoes_texto = ", ".join(lead.get("sugestoes", []))
-        ws.append([
-            lead.get("empresa", ""),
-            lead.get("prioridade", ""),
-            lead.get("score", 0),
-            lead.get("telefone", ""),
-            lead.get("whatsapp", ""),
-            lead.get("site", ""),
-            lead.get("endereco", ""),
-            lead.get("cidade", ""),
-            lead.get("estado", ""),
-            sugestoes_texto
-        ])
+    arquivo = st.session_state.get("arquivo_exportacao")
+    if arquivo and os.path.exists(arquivo[0]):
+        caminho, formato_arquivo, total = arquivo
+        # Com `data` chamável o arquivo só é lido no clique, não a cada rerun
+        st.download_button(
+            f"⬇️ Baixar {FORMATOS[formato_arquivo][0]} ({total} leads)",
+            data=lambda: ler_arquivo(caminho),
+            file_name=os.path.basename(caminho),
+            mime=FORMATOS[formato_arquivo][1],
+            type="primary",
+            use_container_width=True,
+        )
+
+
+TAMANHOS_PAGINA = [10, 20, 50, 100]
+COLUNAS_TABELA = ["empresa", "prioridade", "score", "cidade", "telefone", "site", "sugestoes"]
+ORDENACOES = {
+    "Maior score": ("score", False),
+    "Menor score": ("score", True),
+    "Empresa (A-Z)": ("empresa", True),
+    "Cidade (A-Z)": ("cidade", True),
+}
+
+COLUNAS_PREVIA = ["empresa", "prioridade", "score", "site", "telefone", "endereco"]
+
+ARQUIVO_METRICAS_JSONL = os.path.join(PASTA_CACHE, "metricas.jsonl")
+ARQUIVO_METRICAS_PROMETHEUS = os.path.join(PASTA_CACHE, "metricas.prom")
+
+
+def painel_diagnostico():
+    """Tempo, bytes e falhas por etapa e por host desde o início do processo (ou da última limpeza)"""
+    resumo = pd.DataFrame(resumir())
+    if resumo.empty:
+        st.caption("Nenhuma etapa medida ainda. Faça uma busca.")
+        return
+    st.dataframe(
+        resumo,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "total_ms": st.column_config.NumberColumn("Total (ms)"),
+            "media_ms": st.column_config.NumberColumn("Média (ms)"),
+            "p95_ms": st.column_config.NumberColumn("p95 (ms)"),
+            "max_ms": st.column_config.NumberColumn("Máx. (ms)"),
+            "ultimo_erro": st.column_config.TextColumn("Último erro"),
+        },
+    )
+    col_d1, col_d2, col_d3 = st.columns(3)
+    if col_d1.button("💾 Gravar JSONL", use_container_width=True):
+        total = gravar_jsonl(ARQUIVO_METRICAS_JSONL)
+        st.caption(f"{total} medições gravadas em {ARQUIVO_METRICAS_JSONL}")
+    if col_d2.button("📈 Gravar Prometheus", use_container_width=True):
+        gravar_prometheus(ARQUIVO_METRICAS_PROMETHEUS)
+        st.caption(f"Métricas gravadas em {ARQUIVO_METRICAS_PROMETHEUS}")
+    if col_d3.button("🧹 Zerar medições", use_container_width=True):
+        limpar_metricas()
+        st.rerun()
+
+
+def avisar_servicos_degradados():
+    """Mostra os serviços externos que estão falhando e quando serão testados de novo"""
+    for servico in situacao_servicos(somente_degradados=True):
+        texto = f"{ROTULOS_ESTADO[servico['estado']]} — **{servico['servico']}**: {servico['ultimo_erro']}"
+        if servico["estado"] == ABERTO:
+            st.warning(f"{texto} (chamadas falham na hora; nova tentativa em {servico['nova_tentativa_em']} s)")
+        else:
+            st.caption(f"{texto} ({servico['falhas_seguidas']} falhas seguidas)")
+
+
+PREFIXOS_SELECAO = ("sel_", "sel_lista_")
+
+
+def alternar_selecao(lead_key, lead, chave_widget):
+    if st.session_state[chave_widget]:
+        st.session_state.selecionados[lead_key] = lead
+    else:
+        st.session_state.selecionados.pop(lead_key, None)
+
+
+def caixa_selecao(rotulo, lead_key, row, prefixo):
+    """Checkbox que sempre espelha st.session_state.selecionados, mesmo após remoções na outra aba"""
+    chave = f"{prefixo}{lead_key}"
+    # O callback roda antes do script: aqui selecionados já reflete o último clique
+    st.session_state[chave] = lead_key in st.session_state.selecionados
+    st.checkbox(rotulo, key=chave, on_change=alternar_selecao, args=(lead_key, row.to_dict(), chave))
+
+
+def chave_tabela(pagina):
+    """Chave do widget da tabela derivada das linhas exibidas: a seleção guarda posições,
+    então filtro, ordem ou dados diferentes precisam de um widget novo"""
+    return "tabela_leads_" + hashlib.md5("|".join(pagina["key"]).encode("utf-8")).hexdigest()[:12]
+
+
+def carregar_job(job_id):
+    df_job, st.session_state.stats_lote = carregar_resultado(job_id)
+    # Resultados guardados são repontuados com os pesos atuais
+    st.session_state.df_leads = repontuar(df_job)
+    st.session_state.selecionados = {}
+    # Estado de seleção dos widgets pertence ao resultado anterior
+    for chave in [k for k in st.session_state if str(k).startswith(("sel_", "tabela_"))]:
+        del st.session_state[chave]
+
+
+@st.fragment(run_every=2)
+def acompanhar_job():
+    """Consulta o job em andamento sem rerodar a página inteira"""
+    job_id = st.session_state.job_atual
+    job = obter_job(job_id) if job_id else None
+    if job is None:
+        return
     
-    # Ajustar larguras
-    ws.column_dimensions['A'].width = 30
-    ws.column_dimensions['B'].width = 12
-    ws.column_dimensions['C'].width = 8
-    ws.column_dimensions['D'].width = 18
-    ws.column_dimensions['E'].width = 18
-    ws.column_dimensions['F'].width = 35
-    ws.column_dimensions['G'].width = 50
-    ws.column_dimensions['H'].width = 15
-    ws.column_dimensions['I'].width = 8
-    ws.column_dimensions['J'].width = 50
+    if job["status"] in FINALIZADOS:
+        st.session_state.job_atual = None
+        if job["status"] == CONCLUIDO:
+            carregar_job(job_id)
+            st.session_state.aviso_job = ("success", f"✅ {job['mensagem']}!")
+        else:
+            st.session_state.aviso_job = ("error", f"{ROTULOS_STATUS[job['status']]}: {job['mensagem']}")
+        st.rerun()
     
-    # Salvar em buffer
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    return buffer.getvalue()
+    with st.container(border=True):
+        st.markdown(f"**{ROTULOS_STATUS[job['status']]}** — {job['descricao']}")
+        st.progress(job["progresso"], text=job["mensagem"] or "Aguardando na fila...")
+        avisar_servicos_degradados()
+        
+        # Prévia ao vivo: cada lead aparece assim que a auditoria do site termina
+        parcial = carregar_parcial(job_id)
+        if not parcial.empty:
+            st.dataframe(
+                parcial.sort_values("score", ascending=False)[COLUNAS_PREVIA],
+                hide_index=True,
+                use_container_width=True,
+            )
+        
+        if st.button("⛔ Cancelar busca", key=f"cancelar_{job_id}"):
+            cancelar_job(job_id)
 
 
 # ========== STATE ==========
@@ -343,6 +279,10 @@ if "df_leads" not in st.session_state:
     st.session_state.df_leads = pd.DataFrame()
 if "selecionados" not in st.session_state:
     st.session_state.selecionados = {}
+if "stats_lote" not in st.session_state:
+    st.session_state.stats_lote = pd.DataFrame()
+if "job_atual" not in st.session_state:
+    st.session_state.job_atual = None
 
 
 # ========== SIDEBAR ==========
@@ -359,9 +299,23 @@ with st.sidebar:
     uf = estado_sel.split(" - ")[0]
     
     cidades = buscar_cidades_por_estado(uf)
-    cidade_sel = st.selectbox("Cidade", cidades, index=0)
+    modo_busca = st.radio("Abrangência", ["Cidade única", "Várias cidades", "Estado inteiro"], index=0)
     
-    max_leads = st.slider("Quantidade de leads", 5, 50, 20, 5)
+    if modo_busca == "Cidade única":
+        cidade_sel = st.selectbox("Cidade", cidades, index=0)
+        cidades_lote = [cidade_sel]
+    elif modo_busca == "Várias cidades":
+        cidades_lote = st.multiselect("Cidades", cidades)
+        cidade_sel = cidades_lote[0] if len(cidades_lote) == 1 else uf
+    else:
+        cidades_lote = cidades
+        cidade_sel = uf
+        st.caption(f"🏙️ {len(cidades)} municípios serão prospectados")
+    
+    max_leads = st.slider(
+        "Quantidade de leads" if modo_busca == "Cidade única" else "Leads por cidade",
+        5, 50, 20, 5,
+    )
     
     st.markdown("---")
     
@@ -372,22 +326,74 @@ with st.sidebar:
     categorias = obter_categorias_nicho(nicho_sel)
     categoria_sel = st.selectbox("Categoria específica", ["Todas"] + categorias, index=0)
     
+    atualizar_dados = st.checkbox(
+        "🔄 Atualizar dados já minerados",
+        help="Cidades já buscadas vêm do armazém local; marque para trazer só o que mudou no OSM desde então",
+    )
+    
+    cobertura_completa = st.checkbox(
+        "🧩 Cobertura completa da cidade",
+        help="Divide a área em ladrilhos consultados em paralelo: nada fica de fora por timeout do Overpass "
+             "e os leads mais próximos do centro vêm primeiro",
+    )
+    
     st.markdown("---")
     
     buscar_btn = st.button("🔍 Buscar Leads", type="primary", use_container_width=True)
     
+    jobs_recentes = listar_jobs(limite=10)
+    if jobs_recentes:
+        with st.expander(f"🗂️ Fila de buscas ({len(jobs_recentes)})"):
+            for job in jobs_recentes:
+                st.caption(f"{ROTULOS_STATUS[job['status']]} — {job['descricao']}")
+                if job["status"] == CONCLUIDO and st.button("📂 Carregar", key=f"carregar_{job['id']}", use_container_width=True):
+                    carregar_job(job["id"])
+                    st.rerun()
+                elif job["status"] not in FINALIZADOS and st.button("⛔ Cancelar", key=f"cancelar_fila_{job['id']}", use_container_width=True):
+                    cancelar_job(job["id"])
+    
     st.markdown("---")
     st.success("✅ 100% Gratuito")
     st.caption(f"🗺️ {len(estados_ibge)} estados")
+    
+    stats_cache = cache_auditorias.estatisticas()
+    st.caption(
+        f"🗄️ Cache de sites: {stats_cache['hits']} acertos | "
+        f"{stats_cache['misses']} consultas à rede | {stats_cache['entradas']} guardados"
+    )
+    armazem = resumo_armazem()
+    st.caption(f"📦 Armazém: {armazem['leads']} leads em {armazem['particoes']} buscas")
+    if st.button("🧹 Limpar cache de sites", use_container_width=True):
+        cache_auditorias.invalidar()
+        st.rerun()
+    if st.button("🧮 Recalcular scores", use_container_width=True, help="Aplica os pesos de config_pontuacao.json"):
+        st.session_state.df_leads = repontuar(st.session_state.df_leads)
+        st.rerun()
 
 
 # Buscar
 if buscar_btn:
-    st.session_state.df_leads = buscar_leads_overpass(cidade_sel, uf, max_leads, nicho_sel, categoria_sel)
-    
-    if not st.session_state.df_leads.empty:
-        st.success(f"✅ {len(st.session_state.df_leads)} leads encontrados!")
-        st.session_state.selecionados = {}
+    parametros = {"estado": uf, "max_leads": max_leads, "nicho": nicho_sel, "categoria": categoria_sel,
+                  "atualizar": atualizar_dados, "ladrilhos": cobertura_completa}
+    if modo_busca == "Cidade única":
+        st.session_state.job_atual = enviar_job(
+            "cidade", f"{nicho_sel} em {cidade_sel}/{uf}", {**parametros, "cidade": cidade_sel}
+        )
+    elif not cidades_lote:
+        st.warning("Selecione ao menos uma cidade.")
+    else:
+        st.session_state.job_atual = enviar_job(
+            "lote", f"{nicho_sel} em {len(cidades_lote)} cidades de {uf}", {**parametros, "cidades": cidades_lote}
+        )
+
+if "aviso_job" in st.session_state:
+    tipo_aviso, texto_aviso = st.session_state.pop("aviso_job")
+    getattr(st, tipo_aviso)(texto_aviso)
+
+if not st.session_state.job_atual:
+    avisar_servicos_degradados()
+
+acompanhar_job()
 
 df = st.session_state.df_leads.copy()
 
@@ -398,10 +404,13 @@ st.title("🧭 Agente de Prospecção LP Design")
 if not df.empty:
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Total", len(df))
-    col2.metric("Alta Prioridade", len(df[df["prioridade"].str.contains("Alta")]))
+    col2.metric("Alta Prioridade", int((df["prioridade_nivel"] == NIVEL_ALTA).sum()))
     col3.metric("Selecionados", len(st.session_state.selecionados))
     col4.metric("Score Médio", f"{df['score'].mean():.0f}")
 
+with st.expander("🩺 Diagnóstico das buscas"):
+    painel_diagnostico()
+
 st.markdown("---")
 
 
@@ -413,16 +422,73 @@ with tab_results:
     if df.empty:
         st.info("👆 Configure os filtros e clique em **Buscar Leads**")
     else:
+        if not st.session_state.stats_lote.empty:
+            with st.expander(f"🏙️ Resultado por cidade ({len(st.session_state.stats_lote)})"):
+                st.dataframe(st.session_state.stats_lote, hide_index=True, use_container_width=True)
+        
         # Modo de visualização
-        modo = st.radio("Visualização", ["Cards", "Lista Detalhada"], horizontal=True)
+        modo = st.radio("Visualização", ["Cards", "Lista Detalhada", "Tabela Compacta"], horizontal=True)
+        
+        # Filtro e ordenação antes de paginar
+        col_f1, col_f2, col_f3 = st.columns([3, 3, 2])
+        with col_f1:
+            busca_texto = st.text_input("Buscar empresa", placeholder="Nome da empresa...")
+        with col_f2:
+            prioridades_filtro = st.multiselect("Prioridade", sorted(df["prioridade"].unique()))
+        with col_f3:
+            ordem = st.selectbox("Ordenar por", list(ORDENACOES.keys()))
+        
+        if busca_texto:
+            df = df[df["empresa"].str.contains(busca_texto, case=False, regex=False)]
+        if prioridades_filtro:
+            df = df[df["prioridade"].isin(prioridades_filtro)]
+        coluna_ordem, crescente = ORDENACOES[ordem]
+        df = df.sort_values(coluna_ordem, ascending=crescente, kind="stable")
+        
+        if modo == "Tabela Compacta":
+            pagina = df
+        else:
+            col_p1, col_p2, col_p3 = st.columns([2, 2, 4])
+            with col_p1:
+                por_pagina = st.selectbox("Leads por página", TAMANHOS_PAGINA, index=1)
+            total_paginas = max(1, math.ceil(len(df) / por_pagina))
+            with col_p2:
+                num_pagina = st.number_input("Página", min_value=1, max_value=total_paginas, value=1, step=1)
+            with col_p3:
+                st.caption(f"{len(df)} leads | página {num_pagina} de {total_paginas}")
+            pagina = df.iloc[(num_pagina - 1) * por_pagina:num_pagina * por_pagina]
         
         st.markdown("---")
         
-        df = df.sort_values("score", ascending=False)
+        if modo == "Tabela Compacta":
+            # MODO TABELA: um único componente, seleção pelas linhas
+            evento = st.dataframe(
+                pagina[COLUNAS_TABELA].assign(sugestoes=pagina["sugestoes"].str.join(", ")),
+                hide_index=True,
+                use_container_width=True,
+                on_select="rerun",
+                selection_mode="multi-row",
+                key=chave_tabela(pagina),
+                column_config={
+                    "score": st.column_config.ProgressColumn("Score", min_value=0, max_value=100, format="%d"),
+                    "site": st.column_config.LinkColumn("Site"),
+                },
+            )
+            # Aplica só o que mudou na tabela, sem desfazer seleções feitas nos outros modos;
+            # as marcações anteriores só valem para o mesmo widget (mesmas linhas na mesma ordem)
+            marcadas = {pagina.iloc[i]["key"] for i in evento.selection.rows}
+            tabela_anterior, anteriores = st.session_state.get("tabela_marcadas", (None, set()))
+            if tabela_anterior != chave_tabela(pagina):
+                anteriores = set()
+            for _, row in pagina[pagina["key"].isin(marcadas - anteriores)].iterrows():
+                st.session_state.selecionados[row["key"]] = row.to_dict()
+            for lead_key in anteriores - marcadas:
+                st.session_state.selecionados.pop(lead_key, None)
+            st.session_state.tabela_marcadas = (chave_tabela(pagina), marcadas)
         
-        if modo == "Cards":
+        elif modo == "Cards":
             # MODO CARDS (3 colunas)
-            for _, row in df.iterrows():
+            for _, row in pagina.iterrows():
                 lead_key = row["key"]
                 
                 with st.container(border=True):
@@ -442,6 +508,8 @@ with tab_results:
                         with subcol_nome:
                             st.markdown(f"### {row['empresa']}")
                             st.caption(f"📍 {row['endereco']}")
+                            if pd.notna(row.get("visto_em")):
+                                st.caption(f"🔁 Já visto em {datetime.fromtimestamp(row['visto_em']).strftime('%d/%m/%Y')}")
                         
                         # Contatos
                         if row.get("telefone"):
@@ -476,14 +544,10 @@ with tab_results:
                     # === COLUNA 3: AÇÕES ===
                     with col3:
                         # Checkbox
-                        sel = st.checkbox("📌 Selecionar", key=f"sel_{lead_key}")
-                        if sel:
-                            st.session_state.selecionados[lead_key] = row.to_dict()
-                        else:
-                            st.session_state.selecionados.pop(lead_key, None)
+                        caixa_selecao("📌 Selecionar", lead_key, row, "sel_")
                         
                         # WhatsApp
-                        msg = gerar_mensagem_whatsapp(row["empresa"], cidade_sel)
+                        msg = gerar_mensagem_whatsapp(row["empresa"], row["cidade"])
                         link = montar_link_whatsapp(row["whatsapp"], msg)
                         st.link_button("📲 Enviar WhatsApp", link, type="primary", use_container_width=True)
                         
@@ -522,10 +586,14 @@ with tab_results:
                         st.text(f"Prioridade: {row['prioridade']}")
                         st.text(f"Score: {row['score']}/100")
                         st.text(f"Categoria: {row.get('categoria', 'N/A')}")
+                        
+                        if row.get("responde"):
+                            st.markdown("**⚙️ Diagnóstico do Site:**")
+                            st.text(formatar_diagnostico(row))
         
         else:
             # MODO LISTA DETALHADA
-            for _, row in df.iterrows():
+            for _, row in pagina.iterrows():
                 lead_key = row["key"]
                 
                 with st.container(border=True):
@@ -534,6 +602,8 @@ with tab_results:
                     with col1:
                         st.markdown(f"**{row['empresa']}**")
                         st.caption(f"📍 {row['endereco']}")
+                        if pd.notna(row.get("visto_em")):
+                            st.caption(f"🔁 Já visto em {datetime.fromtimestamp(row['visto_em']).strftime('%d/%m/%Y')}")
                         if row.get("telefone"):
                             st.caption(f"📞 {row['telefone']}")
                     
@@ -548,13 +618,9 @@ with tab_results:
                             st.caption(f"• {sug}")
                     
                     with col4:
-                        sel = st.checkbox("Selecionar", key=f"sel_lista_{lead_key}")
-                        if sel:
-                            st.session_state.selecionados[lead_key] = row.to_dict()
-                        else:
-                            st.session_state.selecionados.pop(lead_key, None)
+                        caixa_selecao("Selecionar", lead_key, row, "sel_lista_")
                         
-                        msg = gerar_mensagem_whatsapp(row["empresa"], cidade_sel)
+                        msg = gerar_mensagem_whatsapp(row["empresa"], row["cidade"])
                         link = montar_link_whatsapp(row["whatsapp"], msg)
                         st.link_button("📲 WhatsApp", link, use_container_width=True)
                         
@@ -587,25 +653,14 @@ with tab_results:
 with tab_pipeline:
     st.markdown("## 📌 Leads Selecionados")
     
+    with st.expander("⬇️ Exportar leads"):
+        painel_exportacao(uf, cidade_sel)
+    
     if not st.session_state.selecionados:
         st.info("Nenhum lead selecionado. Marque leads na aba Resultados.")
     else:
         st.success(f"✅ {len(st.session_state.selecionados)} leads selecionados")
         
-        # Botão export
-        try:
-            excel_data = exportar_para_excel(st.session_state.selecionados, cidade_sel, nicho_sel)
-            st.download_button(
-                "⬇️ Baixar Excel Formatado",
-                data=excel_data,
-                file_name=f"leads_{cidade_sel}_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                type="primary",
-                use_container_width=True
-            )
-        except:
-            st.error("Instale openpyxl: pip install openpyxl")
-        
         st.markdown("---")
         
         # Lista de selecionados
@@ -623,10 +678,12 @@ with tab_pipeline:
                     st.caption(f"**Vender:** {sugs_texto}")
                 
                 with col2:
-                    msg = gerar_mensagem_whatsapp(lead["empresa"], cidade_sel)
+                    msg = gerar_mensagem_whatsapp(lead["empresa"], lead["cidade"])
                     link = montar_link_whatsapp(lead["whatsapp"], msg)
                     st.link_button("📲 WhatsApp", link, type="primary", use_container_width=True)
                     
                     if st.button("🗑️ Remover", key=f"rem_{lead_key}", use_container_width=True):
                         del st.session_state.selecionados[lead_key]
+                        for prefixo in PREFIXOS_SELECAO:
+                            st.session_state.pop(f"{prefixo}{lead_key}", None)
                         st.rerun()
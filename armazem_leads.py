@@ -0,0 +1,130 @@
+"""
+Armazém local de leads, particionado por UF/cidade/nicho/categoria
+Guarda os elementos OSM da última busca (para atualizações incrementais) e os leads já auditados e pontuados
+"""
+
+import json
+import time
+from typing import Dict, List, Optional
+
+from cache_local import comprimir_json, conectar, descomprimir_json
+from identidade_leads import id_osm
+
+# Os dados do Overpass chegam com alguns minutos de atraso; a janela incremental recua essa margem
+MARGEM_ATUALIZACAO = 3600
+
+
+def _criar_tabelas() -> None:
+    with conectar() as conexao:
+        conexao.execute("""
+            CREATE TABLE IF NOT EXISTS particoes (
+                uf TEXT NOT NULL,
+                cidade TEXT NOT NULL,
+                nicho TEXT NOT NULL,
+                categoria TEXT NOT NULL,
+                lat REAL NOT NULL,
+                lon REAL NOT NULL,
+                raio INTEGER NOT NULL,
+                tags TEXT NOT NULL,
+                elementos BLOB NOT NULL,
+                atualizado_em REAL NOT NULL,
+                PRIMARY KEY (uf, cidade, nicho, categoria)
+            )
+        """)
+        conexao.execute("""
+            CREATE TABLE IF NOT EXISTS leads_armazenados (
+                uf TEXT NOT NULL,
+                cidade TEXT NOT NULL,
+                nicho TEXT NOT NULL,
+                categoria TEXT NOT NULL,
+                osm_id TEXT NOT NULL,
+                dados TEXT NOT NULL,
+                atualizado_em REAL NOT NULL,
+                PRIMARY KEY (uf, cidade, nicho, categoria, osm_id)
+            )
+        """)
+
+
+def carregar_particao(uf: str, cidade: str, nicho: str, categoria: str) -> Optional[Dict]:
+    """Retorna centro, raio, tags, elementos e data da última busca da partição, se existir"""
+    with conectar() as conexao:
+        linha = conexao.execute(
+            "SELECT lat, lon, raio, tags, elementos, atualizado_em FROM particoes "
+            "WHERE uf = ? AND cidade = ? AND nicho = ? AND categoria = ?",
+            (uf, cidade, nicho, categoria),
+        ).fetchone()
+    if linha is None:
+        return None
+    lat, lon, raio, tags, elementos, atualizado_em = linha
+    return {
+        "centro": (lat, lon),
+        "raio": raio,
+        "tags": json.loads(tags),
+        "elementos": descomprimir_json(elementos),
+        "atualizado_em": atualizado_em,
+    }
+
+
+def salvar_particao(
+    uf: str, cidade: str, nicho: str, categoria: str,
+    centro, raio: int, tags: List[str], elementos: List[Dict], atualizado_em: float,
+) -> None:
+    """Grava (ou substitui) os elementos OSM da partição"""
+    with conectar() as conexao:
+        conexao.execute(
+            "INSERT OR REPLACE INTO particoes (uf, cidade, nicho, categoria, lat, lon, raio, tags, elementos, atualizado_em) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (uf, cidade, nicho, categoria, centro[0], centro[1], raio, json.dumps(tags), comprimir_json(elementos), atualizado_em),
+        )
+
+
+def mesclar_elementos(antigos: List[Dict], novos: List[Dict]) -> List[Dict]:
+    """Substitui os elementos alterados e acrescenta os novos, mantendo a ordem original"""
+    por_id = {id_osm(e): e for e in antigos}
+    por_id.update({id_osm(e): e for e in novos})
+    return list(por_id.values())
+
+
+def data_overpass(momento: float) -> str:
+    """Data no formato aceito pelo filtro newer do Overpass, já com a margem de atraso"""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(momento - MARGEM_ATUALIZACAO))
+
+
+def salvar_leads(leads: List[Dict], nicho: str, categoria: str) -> None:
+    """Grava leads auditados e pontuados na partição de cada um"""
+    agora = time.time()
+    with conectar() as conexao:
+        conexao.executemany(
+            "INSERT OR REPLACE INTO leads_armazenados (uf, cidade, nicho, categoria, osm_id, dados, atualizado_em) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (lead["estado"], lead["cidade"], nicho, categoria, lead["osm_id"],
+                 json.dumps(lead, ensure_ascii=False, default=str), agora)
+                for lead in leads
+            ],
+        )
+
+
+def carregar_leads(uf: str, cidade: Optional[str] = None, nicho: Optional[str] = None) -> List[Dict]:
+    """Leads armazenados de uma UF, opcionalmente filtrados por cidade e nicho"""
+    consulta = "SELECT dados FROM leads_armazenados WHERE uf = ?"
+    parametros: list = [uf]
+    if cidade:
+        consulta += " AND cidade = ?"
+        parametros.append(cidade)
+    if nicho:
+        consulta += " AND nicho = ?"
+        parametros.append(nicho)
+    with conectar() as conexao:
+        return [json.loads(linha[0]) for linha in conexao.execute(consulta, parametros)]
+
+
+def resumo_armazem() -> Dict:
+    """Quantidade de partições e de leads guardados"""
+    with conectar() as conexao:
+        particoes = conexao.execute("SELECT COUNT(*) FROM particoes").fetchone()[0]
+        leads = conexao.execute("SELECT COUNT(*) FROM leads_armazenados").fetchone()[0]
+    return {"particoes": particoes, "leads": leads}
+
+
+_criar_tabelas()
@@ -0,0 +1,129 @@
+"""
+Medições detalhadas da auditoria de sites
+Sondagem de conexão (DNS, TCP, TLS, certificado, HTTP/2 via ALPN) e identificação de CMS/construtores de site
+"""
+
+import re
+import socket
+import ssl
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+# Nome: (regex no HTML, cabeçalho HTTP que denuncia a plataforma)
+ASSINATURAS_CMS = {
+    "WordPress": (rb"wp-content|wp-includes", None),
+    "Wix": (rb"static\.wixstatic\.com|wix-image|_wixCssImports", "x-wix-request-id"),
+    "Shopify": (rb"cdn\.shopify\.com|Shopify\.theme", "x-shopid"),
+    "Squarespace": (rb"static1\.squarespace\.com|squarespace-cdn", None),
+    "Webflow": (rb"assets\.website-files\.com|data-wf-site", None),
+    "Joomla": (rb"/media/jui/|com_content|Joomla!", None),
+    "Drupal": (rb"/sites/default/files|Drupal\.settings|drupal\.js", "x-drupal-cache"),
+    "Nuvemshop": (rb"nuvemshop|tiendanube", None),
+    "Loja Integrada": (rb"lojaintegrada", None),
+    "VTEX": (rb"vteximg\.com\.br|vtexassets", None),
+    "Google Sites": (rb"sites\.google\.com|gstatic\.com/_/atari", None),
+    "Blogger": (rb"blogger\.com|blogspot\.com", None),
+}
+_REGEX_CMS = {nome: re.compile(padrao, re.IGNORECASE) for nome, (padrao, _) in ASSINATURAS_CMS.items()}
+_REGEX_GERADOR = re.compile(rb"<meta[^>]+name=[\"']generator[\"'][^>]+content=[\"']([^\"']{1,80})[\"']", re.IGNORECASE)
+_REGEX_VIEWPORT = re.compile(rb"viewport", re.IGNORECASE)
+_SOBREPOSICAO = 200  # Bytes repetidos entre pedaços para não partir assinaturas ao meio
+
+
+def varrer_html(pedacos: Iterable[bytes], limite_bytes: int) -> Dict:
+    """Lê no máximo limite_bytes e procura viewport, gerador e assinaturas de CMS pedaço a pedaço"""
+    achados = {"viewport": False, "gerador": "", "cms": set()}
+    resto = b""
+    lidos = 0
+    for pedaco in pedacos:
+        pedaco = pedaco[:limite_bytes - lidos]
+        lidos += len(pedaco)
+        janela = resto + pedaco
+        achados["viewport"] = achados["viewport"] or bool(_REGEX_VIEWPORT.search(janela))
+        if not achados["gerador"]:
+            gerador = _REGEX_GERADOR.search(janela)
+            if gerador:
+                achados["gerador"] = gerador.group(1).decode("utf-8", "ignore").strip()
+        achados["cms"].update(nome for nome, regex in _REGEX_CMS.items() if regex.search(janela))
+        resto = janela[-_SOBREPOSICAO:]
+        if lidos >= limite_bytes:
+            break
+    achados["bytes_lidos"] = lidos
+    return achados
+
+
+def identificar_cms(achados: Dict, headers) -> Tuple[str, str]:
+    """Retorna (plataforma, versão) a partir do HTML varrido e dos cabeçalhos"""
+    gerador = achados.get("gerador", "")
+    for nome, (_, cabecalho) in ASSINATURAS_CMS.items():
+        if nome.lower() in gerador.lower():
+            versao = re.search(r"\d+(\.\d+)*", gerador)
+            return nome, versao.group(0) if versao else ""
+        if cabecalho and cabecalho in {h.lower() for h in headers}:
+            return nome, ""
+    for nome in ASSINATURAS_CMS:
+        if nome in achados.get("cms", ()):
+            return nome, ""
+    return "", ""
+
+
+def conexao_vazia() -> Dict:
+    """Campos de conexão sem medição (host inacessível ou sondagem que não terminou)"""
+    return {
+        "dns_ms": None, "conexao_ms": None, "tls_ms": None,
+        "http2": False, "certificado_valido": None, "certificado_dias_restantes": None,
+    }
+
+
+def sondar_conexao(host: str, porta: int, usar_tls: bool, timeout: float) -> Dict:
+    """Mede DNS, conexão TCP e handshake TLS separadamente; lê validade do certificado e ALPN"""
+    resultado = conexao_vazia()
+    inicio = time.perf_counter()
+    try:
+        enderecos = socket.getaddrinfo(host, porta, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        return resultado
+    resultado["dns_ms"] = round((time.perf_counter() - inicio) * 1000)
+
+    familia, tipo, proto, _, endereco = enderecos[0]
+    inicio = time.perf_counter()
+    conexao = socket.socket(familia, tipo, proto)
+    conexao.settimeout(timeout)
+    try:
+        conexao.connect(endereco)
+    except OSError:
+        conexao.close()
+        return resultado
+    resultado["conexao_ms"] = round((time.perf_counter() - inicio) * 1000)
+
+    try:
+        if not usar_tls:
+            return resultado
+        contexto = ssl.create_default_context()
+        contexto.set_alpn_protocols(["h2", "http/1.1"])
+        inicio = time.perf_counter()
+        try:
+            conexao = contexto.wrap_socket(conexao, server_hostname=host)
+        except ssl.SSLCertVerificationError:
+            resultado["certificado_valido"] = False
+            return resultado
+        except (ssl.SSLError, OSError):
+            return resultado
+        resultado["tls_ms"] = round((time.perf_counter() - inicio) * 1000)
+        resultado["certificado_valido"] = True
+        resultado["http2"] = conexao.selected_alpn_protocol() == "h2"
+        certificado = conexao.getpeercert()
+        if certificado and certificado.get("notAfter"):
+            expira = ssl.cert_time_to_seconds(certificado["notAfter"])
+            resultado["certificado_dias_restantes"] = int((expira - time.time()) // 86400)
+        return resultado
+    finally:
+        conexao.close()
+
+
+def tamanho_pagina(headers, bytes_lidos: int) -> Tuple[int, bool]:
+    """Retorna (bytes transferidos, se o valor é exato) usando Content-Length quando existir"""
+    comprimento: Optional[str] = headers.get("Content-Length")
+    if comprimento and comprimento.isdigit():
+        return int(comprimento), True
+    return bytes_lidos, False
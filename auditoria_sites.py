@@ -0,0 +1,198 @@
+"""
+Módulo de auditoria dos sites dos leads
+Executa as análises em paralelo, com limite de concorrência, limite por host e prazo total
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from typing import Dict, Iterator, List, Tuple
+from urllib.parse import urlparse, urlunparse
+
+from auditoria_detalhada import conexao_vazia, identificar_cms, sondar_conexao, tamanho_pagina, varrer_html
+from cache_local import CachePersistente
+from instrumentacao import medir
+
+MAX_AUDITORIAS_SIMULTANEAS = 10  # Sites auditados ao mesmo tempo
+MAX_AUDITORIAS_POR_HOST = 2      # Cortesia com o mesmo servidor
+PRAZO_TOTAL_AUDITORIA = 30       # Segundos para o lote inteiro
+
+TTL_AUDITORIA = 7 * 86400          # Auditorias de sites que responderam valem 7 dias
+TTL_AUDITORIA_NEGATIVA = 6 * 3600  # Sites fora do ar são testados de novo após 6 horas
+MAX_AUDITORIAS_CACHE = 20000
+
+# Viewport, gerador e assinaturas de CMS ficam no início da página: não é preciso baixá-la inteira
+LIMITE_BYTES_AUDITORIA = 64 * 1024
+TAMANHO_PEDACO = 8 * 1024
+TIMEOUT_SONDAGEM = 3
+
+cache_auditorias = CachePersistente(
+    "auditoria_sites_v2",
+    ttl=TTL_AUDITORIA,
+    ttl_negativo=TTL_AUDITORIA_NEGATIVA,
+    max_entradas=MAX_AUDITORIAS_CACHE,
+    idade_maxima=30 * 86400,
+)
+
+
+def analise_vazia() -> Dict:
+    """Retorna o resultado de auditoria de um site ausente ou fora do ar"""
+    return {
+        "responde": False, "tem_https": False, "tem_mobile": False, "wordpress": False, "tempo": 0,
+        "url_final": "", "redirecionamentos": 0,
+        "dns_ms": None, "conexao_ms": None, "tls_ms": None, "ttfb_ms": None,
+        "tamanho_bytes": None, "tamanho_exato": False, "compressao": "", "http2": False,
+        "certificado_valido": None, "certificado_dias_restantes": None,
+        "cms": "", "cms_versao": "",
+    }
+
+
+def analisar_site(url):
+    if not url:
+        return analise_vazia()
+    with medir("auditoria_site", _host_do_site(url)) as span:
+        return _analisar_site(url, span)
+
+
+def _sondar_em_paralelo(host: str, porta: int) -> Future:
+    """Sondagem de conexão numa thread própria, ao mesmo tempo que o GET do site; como cada auditoria tem
+    a sua, ela nunca espera na fila atrás das sondagens de outras auditorias, jobs ou sessões"""
+    futuro: Future = Future()
+
+    def sondar():
+        if not futuro.set_running_or_notify_cancel():
+            return
+        try:
+            futuro.set_result(sondar_conexao(host, porta, True, TIMEOUT_SONDAGEM))
+        except Exception as e:
+            futuro.set_exception(e)
+
+    threading.Thread(target=sondar, name="sondagem", daemon=True).start()
+    return futuro
+
+
+def _analisar_site(url, span):
+    from cliente_http import requisitar
+
+    sondagem = None
+    try:
+        if not url.startswith('http'):
+            url = 'https://' + url
+
+        # DNS/TCP/TLS medidos à parte, em paralelo com o download: HTTPS é testado mesmo em URLs http://
+        parsed = urlparse(url)
+        porta = parsed.port if parsed.port and parsed.scheme == "https" else 443
+        sondagem = _sondar_em_paralelo(parsed.hostname, porta)
+
+        start = time.time()
+        with requisitar("sites", "GET", url, allow_redirects=True, stream=True) as response:
+            achados = varrer_html(response.iter_content(chunk_size=TAMANHO_PEDACO), LIMITE_BYTES_AUDITORIA)
+            bytes_transferidos = response.raw.tell()
+        tempo = time.time() - start
+
+        try:
+            conexao = sondagem.result(timeout=TIMEOUT_SONDAGEM * 3)
+        except Exception:
+            # O site respondeu ao GET: sem a sondagem só os tempos de conexão e o certificado ficam sem valor
+            sondagem.cancel()
+            conexao = conexao_vazia()
+        cms, cms_versao = identificar_cms(achados, response.headers)
+        tamanho, exato = tamanho_pagina(response.headers, bytes_transferidos)
+        tem_https = response.url.startswith("https") and conexao["certificado_valido"] is not False
+        span.bytes = bytes_transferidos
+        if response.status_code != 200:
+            span.falhar(f"HTTP {response.status_code}")
+
+        return {
+            "responde": response.status_code == 200,
+            "tem_https": tem_https,
+            "tem_mobile": achados["viewport"],
+            "wordpress": cms == "WordPress",
+            "tempo": round(tempo, 2),
+            "url_final": response.url,
+            "redirecionamentos": len(response.history),
+            **conexao,
+            "ttfb_ms": round(response.elapsed.total_seconds() * 1000),
+            "tamanho_bytes": tamanho,
+            "tamanho_exato": exato,
+            "compressao": response.headers.get("Content-Encoding", ""),
+            "cms": cms,
+            "cms_versao": cms_versao,
+        }
+    except Exception as e:
+        span.falhar(type(e).__name__)
+        if sondagem is not None:
+            sondagem.cancel()
+        return analise_vazia()
+
+
+def normalizar_url(url: str) -> str:
+    """Normaliza a URL usada como chave do cache (esquema e host minúsculos, sem fragmento)"""
+    url = url.strip()
+    parsed = urlparse(url if url.startswith('http') else 'https://' + url)
+    esquema = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    if parsed.port and parsed.port != {"http": 80, "https": 443}.get(esquema):
+        host = f"{host}:{parsed.port}"
+    caminho = parsed.path.rstrip("/")
+    return urlunparse((esquema, host, caminho, "", parsed.query, ""))
+
+
+def _host_do_site(url: str) -> str:
+    """Extrai o host de uma URL, aceitando endereços sem esquema"""
+    parsed = urlparse(url if url.startswith('http') else 'https://' + url)
+    return (parsed.netloc or parsed.path).lower()
+
+
+def auditar_sites(
+    urls: List[str],
+    max_simultaneas: int = MAX_AUDITORIAS_SIMULTANEAS,
+    max_por_host: int = MAX_AUDITORIAS_POR_HOST,
+    prazo_total: float = PRAZO_TOTAL_AUDITORIA,
+) -> Iterator[Tuple[int, Dict]]:
+    """Audita vários sites em paralelo, entregando (índice, análise) conforme cada um termina"""
+    semaforos_host: Dict[str, threading.Semaphore] = {}
+    trava = threading.Lock()
+
+    def auditar_com_cortesia(url):
+        host = _host_do_site(url)
+        with trava:
+            semaforo = semaforos_host.setdefault(host, threading.Semaphore(max_por_host))
+        with semaforo:
+            analise = analisar_site(url)
+        cache_auditorias.salvar(normalizar_url(url), analise, negativo=not analise["responde"])
+        return analise
+
+    # Leads sem site ou já auditados recentemente não precisam de rede
+    pendentes = {}
+    for indice, url in enumerate(urls):
+        if not url:
+            yield indice, analise_vazia()
+            continue
+        analise = cache_auditorias.obter(normalizar_url(url))
+        if analise is not None:
+            yield indice, analise
+        else:
+            pendentes[indice] = url
+
+    if not pendentes:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_simultaneas, len(pendentes))))
+    futuros = {executor.submit(auditar_com_cortesia, url): indice for indice, url in pendentes.items()}
+    concluidos = set()
+    try:
+        for futuro in as_completed(futuros, timeout=prazo_total):
+            indice = futuros[futuro]
+            concluidos.add(indice)
+            try:
+                yield indice, futuro.result()
+            except Exception:
+                yield indice, analise_vazia()
+    except FuturesTimeoutError:
+        # Prazo estourado: o que não terminou conta como site fora do ar
+        for indice in pendentes:
+            if indice not in concluidos:
+                yield indice, analise_vazia()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
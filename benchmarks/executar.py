@@ -0,0 +1,241 @@
+"""
+Benchmark do pipeline de busca, inteiramente offline
+Sobe o servidor stub com as fixtures, aponta Nominatim, Overpass e sites para ele e mede, por cidade e
+quantidade de leads: tempo de cada etapa, ponta a ponta com cache frio e quente, vazão e pico de memória.
+Cada medição roda num processo novo, com cache vazio, para que os resultados sejam comparáveis entre commits.
+
+    python benchmarks/executar.py --saida antes.json
+    python benchmarks/executar.py --saida depois.json --comparar antes.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(PASTA_BENCHMARKS)
+sys.path.insert(0, RAIZ)
+
+from servidor_stub import ServidorStub, carregar_fixtures  # noqa: E402
+
+SERVICOS = ("nominatim", "overpass", "sites")
+LEADS_PADRAO = (10, 20, 50)
+
+
+def _cronometrar(etapas: Dict[str, float], nome: str, funcao, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = funcao(*args, **kwargs)
+    etapas[nome] = round(time.perf_counter() - inicio, 4)
+    return resultado
+
+
+def medir_etapas(cidade: str, uf: str, nicho: str, categoria: str, max_leads: int) -> Dict:
+    """Executa as etapas do pipeline uma a uma, com cache frio, cronometrando cada uma"""
+    from auditoria_sites import auditar_sites
+    from geocodificacao import geocodificar_cidade
+    from overpass import buscar_com_raio_adaptativo
+    from pipeline_leads import montar_lead, resolver_tags, selecionar_leads
+    from pontuacao import calcular_prioridade_score
+
+    etapas: Dict[str, float] = {}
+    lat, lon = _cronometrar(etapas, "geocodificacao", geocodificar_cidade, cidade, uf)
+    elementos, _ = _cronometrar(
+        etapas, "overpass", buscar_com_raio_adaptativo, lat, lon, resolver_tags(nicho, categoria), max_leads
+    )
+    leads = _cronometrar(
+        etapas, "montagem", lambda: selecionar_leads(
+            [montar_lead(e, i, cidade, uf, nicho, categoria) for i, e in enumerate(elementos, 1)], max_leads
+        ),
+    )
+    analises = dict(_cronometrar(etapas, "auditoria", lambda: list(auditar_sites([lead["site"] for lead in leads]))))
+    _cronometrar(
+        etapas, "pontuacao",
+        lambda: [calcular_prioridade_score(lead, analises[i]) for i, lead in enumerate(leads) if i in analises],
+    )
+    etapas["total"] = round(sum(etapas.values()), 4)
+    return {"etapas": etapas, "leads": len(leads), "elementos": len(elementos)}
+
+
+def medir_ponta_a_ponta(cidade: str, uf: str, nicho: str, categoria: str, max_leads: int) -> Dict:
+    """Roda gerar_leads duas vezes: a primeira com cache frio (e pico de memória), a segunda já aquecida"""
+    from pipeline_leads import gerar_leads
+
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    leads = list(gerar_leads(cidade, uf, max_leads, nicho, categoria))
+    frio = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    inicio = time.perf_counter()
+    list(gerar_leads(cidade, uf, max_leads, nicho, categoria))
+    quente = time.perf_counter() - inicio
+    return {
+        "leads": len(leads),
+        "frio_s": round(frio, 4),
+        "quente_s": round(quente, 4),
+        "leads_por_s": round(len(leads) / frio, 2) if frio else None,
+        "pico_memoria_mb": round(pico / 2**20, 2),
+    }
+
+
+def _executar_filho(args) -> None:
+    """Processo isolado de uma medição: imprime o resultado em JSON na última linha"""
+    if args.sem_limite_taxa:
+        import limitador_taxa
+
+        for servico in list(limitador_taxa.LIMITES_PADRAO):
+            limitador_taxa.LIMITES_PADRAO[servico] = (1000.0, 1000)
+    medir = medir_etapas if args.modo == "etapas" else medir_ponta_a_ponta
+    try:
+        resultado = medir(args.cidade, args.uf, args.nicho, args.categoria, args.leads)
+    except Exception as e:
+        resultado = {"erro": f"{type(e).__name__}: {e}"}
+    print(json.dumps(resultado))
+
+
+def _rodar_processo(stub: ServidorStub, modo: str, cenario: Dict, leads: int, sem_limite_taxa: bool) -> Dict:
+    with tempfile.TemporaryDirectory(prefix="prospector-bench-") as pasta_cache:
+        ambiente = {
+            **os.environ,
+            "PROSPECTOR_CACHE_DIR": pasta_cache,
+            "PROSPECTOR_URL_NOMINATIM": stub.url("/nominatim/search"),
+            "PROSPECTOR_URL_OVERPASS": stub.url("/overpass/interpreter"),
+            "PROSPECTOR_BACKEND_OSM": "overpass",
+            "PROSPECTOR_CONTORNOS": "0",
+        }
+        comando = [
+            sys.executable, os.path.abspath(__file__), "--filho", modo,
+            "--cidade", cenario["cidade"], "--uf", cenario["estado"],
+            "--nicho", cenario["nicho"], "--categoria", cenario["categoria"], "--leads", str(leads),
+        ]
+        if sem_limite_taxa:
+            comando.append("--sem-limite-taxa")
+        saida = subprocess.run(comando, env=ambiente, cwd=RAIZ, capture_output=True, text=True)
+    linhas = saida.stdout.strip().splitlines()
+    if saida.returncode != 0 or not linhas:
+        return {"erro": saida.stderr.strip().splitlines()[-1] if saida.stderr.strip() else "sem saída"}
+    return json.loads(linhas[-1])
+
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def executar(args) -> Dict:
+    fixtures = carregar_fixtures()
+    latencias = {s: getattr(args, f"latencia_{s}") for s in SERVICOS}
+    falhas = {s: getattr(args, f"falhas_{s}") for s in SERVICOS}
+    stub = ServidorStub(fixtures, latencias, falhas, semente=args.semente).iniciar()
+
+    cenarios: List[Dict] = []
+    try:
+        for cenario in fixtures["cidades"]:
+            if args.cidades and cenario["cidade"] not in args.cidades:
+                continue
+            for leads in args.leads:
+                antes = dict(stub.requisicoes)
+                resultado = {"cidade": cenario["cidade"], "uf": cenario["estado"], "max_leads": leads}
+                resultado.update(_rodar_processo(stub, "etapas", cenario, leads, args.sem_limite_taxa))
+                resultado["ponta_a_ponta"] = _rodar_processo(stub, "ponta_a_ponta", cenario, leads, args.sem_limite_taxa)
+                resultado["requisicoes"] = {s: stub.requisicoes.get(s, 0) - antes.get(s, 0) for s in SERVICOS}
+                cenarios.append(resultado)
+                print(_linha_resumo(resultado), file=sys.stderr)
+    finally:
+        stub.parar()
+
+    return {
+        "commit": _commit_atual(),
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "parametros": {
+            "latencias": latencias, "falhas": falhas, "semente": args.semente,
+            "sem_limite_taxa": args.sem_limite_taxa,
+        },
+        "cenarios": cenarios,
+    }
+
+
+def _linha_resumo(resultado: Dict) -> str:
+    nome = f"{resultado['cidade']}/{resultado['uf']} x{resultado['max_leads']}"
+    if "erro" in resultado:
+        return f"{nome}: erro {resultado['erro']}"
+    etapas = " ".join(f"{k}={v:.2f}s" for k, v in resultado["etapas"].items())
+    ponta = resultado["ponta_a_ponta"]
+    if "erro" in ponta:
+        return f"{nome}: {etapas} | ponta a ponta: erro {ponta['erro']}"
+    return (
+        f"{nome}: {etapas} | frio={ponta['frio_s']:.2f}s quente={ponta['quente_s']:.2f}s "
+        f"{ponta['leads_por_s']} leads/s pico={ponta['pico_memoria_mb']} MB"
+    )
+
+
+def comparar(atual: Dict, base: Dict) -> str:
+    """Tabela de variação percentual entre dois resultados, cenário a cenário"""
+    def chave(c):
+        return c["cidade"], c["uf"], c["max_leads"]
+
+    anteriores = {chave(c): c for c in base["cenarios"]}
+    linhas = [f"Comparação {base.get('commit') or 'base'} → {atual.get('commit') or 'atual'}"]
+    for cenario in atual["cenarios"]:
+        anterior = anteriores.get(chave(cenario))
+        if not anterior or "erro" in cenario or "erro" in anterior:
+            continue
+        metricas = {f"etapa {k}": (anterior["etapas"].get(k), v) for k, v in cenario["etapas"].items()}
+        for campo in ("frio_s", "quente_s", "pico_memoria_mb"):
+            metricas[campo] = (anterior["ponta_a_ponta"].get(campo), cenario["ponta_a_ponta"].get(campo))
+        linhas.append(f"{cenario['cidade']}/{cenario['uf']} x{cenario['max_leads']}")
+        for nome, (antes, depois) in metricas.items():
+            if antes and depois is not None:
+                linhas.append(f"  {nome:<22} {antes:>9.3f} → {depois:>9.3f}  ({(depois - antes) / antes:+.1%})")
+    return "\n".join(linhas)
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cidades", nargs="*", help="nomes das cidades das fixtures (padrão: todas)")
+    parser.add_argument("--leads", nargs="+", type=int, default=list(LEADS_PADRAO))
+    for servico, latencia in (("nominatim", 0.2), ("overpass", 0.8), ("sites", 0.3)):
+        parser.add_argument(f"--latencia-{servico}", type=float, default=latencia, help="segundos (média)")
+        parser.add_argument(f"--falhas-{servico}", type=float, default=0.0, help="fração de respostas 503")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--sem-limite-taxa", action="store_true", help="desliga os limites de Nominatim/Overpass")
+    parser.add_argument("--saida", help="grava o resultado em JSON")
+    parser.add_argument("--comparar", help="resultado JSON anterior para comparar")
+    # Uso interno: medição isolada num processo filho
+    parser.add_argument("--filho", choices=("etapas", "ponta_a_ponta"), dest="modo", help=argparse.SUPPRESS)
+    parser.add_argument("--cidade", help=argparse.SUPPRESS)
+    parser.add_argument("--uf", help=argparse.SUPPRESS)
+    parser.add_argument("--nicho", help=argparse.SUPPRESS)
+    parser.add_argument("--categoria", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _argumentos()
+    if args.modo:
+        args.leads = args.leads[0]
+        _executar_filho(args)
+        sys.exit(0)
+
+    resultado = executar(args)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            print(comparar(resultado, json.load(arquivo)))
+    elif not args.saida:
+        print(json.dumps(resultado, ensure_ascii=False, indent=2))
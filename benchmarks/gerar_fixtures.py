@@ -0,0 +1,125 @@
+"""
+Gera as fixtures do benchmark
+Por padrão são sintéticas e determinísticas; com --gravar, as respostas reais do Nominatim e do Overpass
+são gravadas no mesmo formato (exige rede)
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servidor_stub import PASTA_FIXTURES  # noqa: E402
+
+# Cidade, UF, centro e quantos estabelecimentos existem no raio máximo: uma capital, uma cidade média e uma pequena
+CIDADES = [
+    ("São Paulo", "SP", (-23.5505, -46.6333), 400),
+    ("Campinas", "SP", (-22.9099, -47.0626), 150),
+    ("Ouro Preto", "MG", (-20.3856, -43.5035), 25),
+]
+NICHO, CATEGORIA = "Alimentação", "Restaurantes"
+RAIO_MAXIMO = 20000
+
+PAGINA_MODERNA = """<!DOCTYPE html><html lang="pt-BR"><head><meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1"><title>{nome}</title></head>
+<body><header><h1>{nome}</h1></header><main>{conteudo}</main></body></html>"""
+PAGINA_WORDPRESS = """<!DOCTYPE html><html><head><meta name="generator" content="WordPress 5.2.4">
+<meta name="viewport" content="width=device-width"><link rel="stylesheet" href="/wp-content/themes/tema/style.css">
+<script src="/wp-includes/js/jquery/jquery.js"></script><title>{nome}</title></head><body>{conteudo}</body></html>"""
+PAGINA_ANTIGA = """<html><head><title>{nome}</title></head><body><table width="800"><tr><td>
+<font face="Arial">{conteudo}</font></td></tr></table></body></html>"""
+
+
+def _paginas(aleatorio: random.Random) -> dict:
+    paragrafo = "<p>Cardápio, horários de funcionamento e formas de pagamento.</p>"
+    return {
+        "moderno.html": PAGINA_MODERNA.format(nome="Restaurante", conteudo=paragrafo * 20),
+        "wordpress.html": PAGINA_WORDPRESS.format(nome="Restaurante", conteudo=paragrafo * 40),
+        "antigo.html": PAGINA_ANTIGA.format(nome="Restaurante", conteudo=paragrafo * 10),
+        # Maior que o limite de leitura da auditoria: mede o download limitado
+        "pesado.html": PAGINA_MODERNA.format(
+            nome="Restaurante",
+            conteudo="".join(f'<img src="/foto-{i}.jpg" alt="{aleatorio.random()}">' for i in range(2500)),
+        ),
+    }
+
+
+def _elementos_sinteticos(aleatorio: random.Random, cidade: str, centro, quantidade: int, primeiro_id: int):
+    elementos = []
+    for i in range(quantidade):
+        # Densidade maior perto do centro, como numa cidade real
+        distancia = RAIO_MAXIMO * aleatorio.random() ** 2
+        angulo = aleatorio.uniform(0, 2 * math.pi)
+        lat = centro[0] + distancia * math.cos(angulo) / 111320
+        lon = centro[1] + distancia * math.sin(angulo) / (111320 * math.cos(math.radians(centro[0])))
+        tags = {"amenity": "restaurant", "name": f"Restaurante {cidade} {i + 1}"}
+        if aleatorio.random() < 0.7:
+            tags["phone"] = f"+55 11 9{aleatorio.randint(1000, 9999)}-{aleatorio.randint(1000, 9999)}"
+        if aleatorio.random() < 0.6:
+            tags["website"] = f"https://restaurante-{primeiro_id + i}.com.br/"
+        if aleatorio.random() < 0.5:
+            tags.update({"addr:street": "Rua das Flores", "addr:housenumber": str(aleatorio.randint(1, 2000))})
+        tipo = "node" if aleatorio.random() < 0.8 else "way"
+        element = {"type": tipo, "id": primeiro_id + i, "tags": tags}
+        if tipo == "node":
+            element.update(lat=round(lat, 7), lon=round(lon, 7))
+        else:
+            element["center"] = {"lat": round(lat, 7), "lon": round(lon, 7)}
+        elementos.append(element)
+    return elementos
+
+
+def gerar_sinteticas(semente: int = 42) -> list:
+    aleatorio = random.Random(semente)
+    cidades = []
+    for indice, (cidade, uf, centro, quantidade) in enumerate(CIDADES):
+        cidades.append({
+            "cidade": cidade,
+            "estado": uf,
+            "nicho": NICHO,
+            "categoria": CATEGORIA,
+            "nominatim": [{"lat": str(centro[0]), "lon": str(centro[1]), "display_name": f"{cidade}, {uf}, Brasil"}],
+            "overpass": {"elements": _elementos_sinteticos(aleatorio, cidade, centro, quantidade, 10**6 * (indice + 1))},
+        })
+    return cidades
+
+
+def gravar_reais() -> list:
+    """Grava as respostas reais para as mesmas cidades, no raio máximo e sem corte"""
+    from cliente_http import requisitar
+    from geocodificacao import URL_NOMINATIM
+    from nichos_comerciais import mapear_categoria_para_tags
+    from overpass import URL_OVERPASS, montar_query_overpass
+
+    cidades = []
+    for cidade, uf, _, _ in CIDADES:
+        params = {"q": f"{cidade}, {uf}, Brasil", "format": "json", "limit": 1, "countrycodes": "br"}
+        nominatim = requisitar("nominatim", "GET", URL_NOMINATIM, params=params).json()
+        lat, lon = float(nominatim[0]["lat"]), float(nominatim[0]["lon"])
+        query = montar_query_overpass(lat, lon, RAIO_MAXIMO, mapear_categoria_para_tags(CATEGORIA), limite=10000)
+        overpass = requisitar("overpass", "POST", URL_OVERPASS, data={"data": query}).json()
+        cidades.append({
+            "cidade": cidade, "estado": uf, "nicho": NICHO, "categoria": CATEGORIA,
+            "nominatim": nominatim, "overpass": {"elements": overpass.get("elements", [])},
+        })
+    return cidades
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--gravar", action="store_true", help="grava respostas reais em vez de sintéticas")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    cidades = gravar_reais() if args.gravar else gerar_sinteticas(args.semente)
+    os.makedirs(os.path.join(PASTA_FIXTURES, "sites"), exist_ok=True)
+    with open(os.path.join(PASTA_FIXTURES, "cidades.json"), "w", encoding="utf-8") as arquivo:
+        json.dump(cidades, arquivo, ensure_ascii=False, separators=(",", ":"))
+    for nome, conteudo in _paginas(random.Random(args.semente)).items():
+        with open(os.path.join(PASTA_FIXTURES, "sites", nome), "w", encoding="utf-8") as arquivo:
+            arquivo.write(conteudo)
+    print(f"{sum(len(c['overpass']['elements']) for c in cidades)} elementos em {len(cidades)} cidades gravados em {PASTA_FIXTURES}")
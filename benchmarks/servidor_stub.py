@@ -0,0 +1,176 @@
+"""
+Servidor local que reproduz Nominatim, Overpass e os sites dos leads a partir das fixtures
+Latência e taxa de falhas simuladas são configuráveis por serviço
+"""
+
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, unquote_plus, urlparse
+
+PASTA_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+_REGEX_AROUND = re.compile(r"around:(\d+),(-?[\d.]+),(-?[\d.]+)")
+_REGEX_LIMITE = re.compile(r"out qt (\d+)")
+
+
+def carregar_fixtures(pasta: str = PASTA_FIXTURES) -> Dict:
+    """Lê as cidades gravadas e os modelos de página dos sites"""
+    with open(os.path.join(pasta, "cidades.json"), encoding="utf-8") as arquivo:
+        cidades = json.load(arquivo)
+    paginas = {}
+    pasta_sites = os.path.join(pasta, "sites")
+    for nome in sorted(os.listdir(pasta_sites)):
+        with open(os.path.join(pasta_sites, nome), "rb") as arquivo:
+            paginas[os.path.splitext(nome)[0]] = arquivo.read()
+    return {"cidades": cidades, "paginas": paginas}
+
+
+def _distancia_metros(a, b) -> float:
+    dlat = math.radians(b[0] - a[0])
+    dlon = math.radians(b[1] - a[1]) * math.cos(math.radians((a[0] + b[0]) / 2))
+    return 6371000 * math.hypot(dlat, dlon)
+
+
+def _posicao(element: Dict):
+    if "lat" in element:
+        return element["lat"], element["lon"]
+    return element["center"]["lat"], element["center"]["lon"]
+
+
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # A auditoria fecha a conexão ao atingir o limite de bytes; isso não é erro do stub
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class ServidorStub:
+    """Sobe o servidor numa thread; `latencias` e `falhas` são por serviço (nominatim, overpass, sites)"""
+
+    def __init__(
+        self,
+        fixtures: Dict,
+        latencias: Optional[Dict[str, float]] = None,
+        falhas: Optional[Dict[str, float]] = None,
+        semente: int = 42,
+        endereco: str = "0.0.0.0",
+    ):
+        self.fixtures = fixtures
+        self.latencias = latencias or {}
+        self.falhas = falhas or {}
+        self._aleatorio = random.Random(semente)
+        self._trava = threading.Lock()
+        self.requisicoes: Dict[str, int] = {}
+        self._servidor = _Servidor((endereco, 0), self._criar_manipulador())
+        self.porta = self._servidor.server_address[1]
+
+    def url(self, caminho: str, host: str = "127.0.0.1") -> str:
+        return f"http://{host}:{self.porta}{caminho}"
+
+    def iniciar(self) -> "ServidorStub":
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return self
+
+    def parar(self) -> None:
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def _simular(self, servico: str) -> bool:
+        """Aplica a latência do serviço e sorteia uma falha; True se a resposta deve falhar"""
+        with self._trava:
+            self.requisicoes[servico] = self.requisicoes.get(servico, 0) + 1
+            fator = self._aleatorio.uniform(0.5, 1.5)
+            falhar = self._aleatorio.random() < self.falhas.get(servico, 0.0)
+        time.sleep(self.latencias.get(servico, 0.0) * fator)
+        return falhar
+
+    def _nominatim(self, consulta: Dict) -> List[Dict]:
+        texto = unquote_plus(consulta.get("q", [""])[0]).lower()
+        for cidade in self.fixtures["cidades"]:
+            if texto.startswith(f"{cidade['cidade']}, {cidade['estado']}".lower()):
+                return cidade["nominatim"]
+        return []
+
+    def _overpass(self, query: str) -> Dict:
+        encontrado = _REGEX_AROUND.search(query)
+        if not encontrado:
+            return {"elements": []}
+        raio, lat, lon = int(encontrado.group(1)), float(encontrado.group(2)), float(encontrado.group(3))
+        limite = int(_REGEX_LIMITE.search(query).group(1)) if _REGEX_LIMITE.search(query) else None
+        nodes, outros = [], []
+        for cidade in self.fixtures["cidades"]:
+            for element in cidade["overpass"]["elements"]:
+                if _distancia_metros((lat, lon), _posicao(element)) <= raio:
+                    (nodes if element["type"] == "node" else outros).append(self._redirecionar_site(element))
+        # Como no Overpass: o corte vale separadamente para nodes e para ways/relations
+        return {"elements": nodes[:limite] + outros[:limite]}
+
+    def _redirecionar_site(self, element: Dict) -> Dict:
+        """Troca o site gravado por um endereço do stub; cada site ganha um host de loopback próprio
+        (127.0.y.x) e um modelo de página fixo, ambos derivados do endereço original"""
+        tags = element.get("tags", {})
+        site = tags.get("website") or tags.get("contact:website")
+        if not site:
+            return element
+        resumo = zlib.crc32(site.encode("utf-8"))
+        modelos = sorted(self.fixtures["paginas"])
+        local = self.url(f"/site/{modelos[resumo % len(modelos)]}", host=f"127.0.{resumo // 250 % 250}.{2 + resumo % 250}")
+        return {**element, "tags": {**tags, "website": local, "contact:website": local}}
+
+    def _criar_manipulador(self):
+        stub = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, status: int, corpo: bytes, tipo: str) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def _falha(self) -> None:
+                self._responder(503, b"indisponivel", "text/plain")
+
+            def do_GET(self):
+                caminho = urlparse(self.path)
+                if caminho.path == "/nominatim/search":
+                    if stub._simular("nominatim"):
+                        return self._falha()
+                    corpo = json.dumps(stub._nominatim(parse_qs(caminho.query))).encode("utf-8")
+                    return self._responder(200, corpo, "application/json")
+                if caminho.path.startswith("/site/"):
+                    if stub._simular("sites"):
+                        return self._falha()
+                    nome = caminho.path.rsplit("/", 1)[-1]
+                    pagina = stub.fixtures["paginas"].get(nome)
+                    if pagina is None:
+                        return self._responder(404, b"", "text/html")
+                    return self._responder(200, pagina, "text/html; charset=utf-8")
+                self._responder(404, b"", "text/plain")
+
+            def do_POST(self):
+                if urlparse(self.path).path != "/overpass/interpreter":
+                    return self._responder(404, b"", "text/plain")
+                tamanho = int(self.headers.get("Content-Length") or 0)
+                dados = parse_qs(self.rfile.read(tamanho).decode("utf-8"))
+                if stub._simular("overpass"):
+                    return self._falha()
+                corpo = json.dumps(stub._overpass(dados.get("data", [""])[0])).encode("utf-8")
+                self._responder(200, corpo, "application/json")
+
+        return Manipulador
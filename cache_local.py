@@ -0,0 +1,169 @@
+"""
+Cache persistente em disco (SQLite) com validade, cache negativo e descarte automático
+Usado para evitar repetir chamadas de rede entre buscas e entre sessões
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+PASTA_CACHE = os.environ.get(
+    "PROSPECTOR_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"),
+)
+ARQUIVO_CACHE = os.path.join(PASTA_CACHE, "prospector.sqlite3")
+# Arquivos versionados junto com o código (snapshots do IBGE, extrato OSM local)
+PASTA_DADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados")
+
+_DESCARTE_A_CADA = 200  # Gravações entre cada rodada de descarte
+
+
+def comprimir_json(valor) -> bytes:
+    """JSON comprimido para colunas BLOB; valores não serializáveis (datas, numpy) viram texto"""
+    return zlib.compress(json.dumps(valor, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def descomprimir_json(conteudo: Optional[bytes]):
+    if conteudo is None:
+        return None
+    return json.loads(zlib.decompress(conteudo).decode("utf-8"))
+
+
+@contextmanager
+def conectar(caminho: str = ARQUIVO_CACHE) -> Iterator[sqlite3.Connection]:
+    """Abre uma conexão SQLite preparada para uso concorrente, com commit e fechamento automáticos"""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    conexao = sqlite3.connect(caminho, timeout=30)
+    try:
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute("PRAGMA synchronous=NORMAL")
+        with conexao:
+            yield conexao
+    finally:
+        conexao.close()
+
+
+class CachePersistente:
+    """Cache chave/valor de um namespace, com TTL separado para resultados negativos"""
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float,
+        ttl_negativo: Optional[float] = None,
+        max_entradas: int = 5000,
+        idade_maxima: Optional[float] = None,
+        comprimir: bool = False,
+        caminho: str = ARQUIVO_CACHE,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.ttl_negativo = ttl if ttl_negativo is None else ttl_negativo
+        self.max_entradas = max_entradas
+        self.idade_maxima = idade_maxima
+        self.comprimir = comprimir
+        self.caminho = caminho
+        self.hits = 0
+        self.misses = 0
+        self._gravacoes = 0
+        self._trava = threading.Lock()
+        with self._conexao() as conexao:
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    namespace TEXT NOT NULL,
+                    chave TEXT NOT NULL,
+                    valor TEXT NOT NULL,
+                    criado_em REAL NOT NULL,
+                    expira_em REAL NOT NULL,
+                    PRIMARY KEY (namespace, chave)
+                )
+            """)
+            conexao.execute("CREATE INDEX IF NOT EXISTS idx_cache_criado ON cache (namespace, criado_em)")
+
+    def _conexao(self):
+        return conectar(self.caminho)
+
+    def obter(self, chave: str) -> Optional[Any]:
+        """Retorna o valor ainda válido da chave, ou None"""
+        try:
+            with self._conexao() as conexao:
+                linha = conexao.execute(
+                    "SELECT valor FROM cache WHERE namespace = ? AND chave = ? AND expira_em > ?",
+                    (self.namespace, chave, time.time()),
+                ).fetchone()
+        except sqlite3.Error:
+            linha = None
+
+        with self._trava:
+            if linha is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        valor = linha[0]
+        if isinstance(valor, bytes):
+            valor = zlib.decompress(valor).decode("utf-8")
+        return json.loads(valor)
+
+    def salvar(self, chave: str, valor: Any, negativo: bool = False) -> None:
+        """Grava o valor; resultados negativos expiram antes"""
+        agora = time.time()
+        ttl = self.ttl_negativo if negativo else self.ttl
+        texto = json.dumps(valor, ensure_ascii=False)
+        conteudo = zlib.compress(texto.encode("utf-8")) if self.comprimir else texto
+        try:
+            with self._conexao() as conexao:
+                conexao.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, chave, valor, criado_em, expira_em) VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, chave, conteudo, agora, agora + ttl),
+                )
+        except sqlite3.Error:
+            return
+
+        with self._trava:
+            self._gravacoes += 1
+            descartar = self._gravacoes % _DESCARTE_A_CADA == 0
+        if descartar:
+            self.descartar()
+
+    def invalidar(self, chave: Optional[str] = None) -> None:
+        """Remove uma chave, ou o namespace inteiro se nenhuma chave for informada"""
+        with self._conexao() as conexao:
+            if chave is None:
+                conexao.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+            else:
+                conexao.execute("DELETE FROM cache WHERE namespace = ? AND chave = ?", (self.namespace, chave))
+
+    def descartar(self) -> None:
+        """Remove entradas expiradas, antigas demais e o excesso além de max_entradas"""
+        agora = time.time()
+        with self._conexao() as conexao:
+            conexao.execute("DELETE FROM cache WHERE namespace = ? AND expira_em <= ?", (self.namespace, agora))
+            if self.idade_maxima is not None:
+                conexao.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND criado_em <= ?",
+                    (self.namespace, agora - self.idade_maxima),
+                )
+            conexao.execute(
+                """
+                DELETE FROM cache WHERE namespace = ? AND chave NOT IN (
+                    SELECT chave FROM cache WHERE namespace = ? ORDER BY criado_em DESC LIMIT ?
+                )
+                """,
+                (self.namespace, self.namespace, self.max_entradas),
+            )
+
+    def estatisticas(self) -> Dict:
+        """Retorna acertos, falhas e quantidade de entradas guardadas"""
+        try:
+            with self._conexao() as conexao:
+                entradas = conexao.execute(
+                    "SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)
+                ).fetchone()[0]
+        except sqlite3.Error:
+            entradas = 0
+        return {"hits": self.hits, "misses": self.misses, "entradas": entradas}
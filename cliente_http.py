@@ -0,0 +1,71 @@
+"""
+Cliente HTTP compartilhado por todo o processo
+Uma sessão por serviço, com keep-alive, limite de conexões por host, retentativas com backoff,
+timeouts unificados e um único User-Agent
+"""
+
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USER_AGENT = "LP-Design-Prospector/2.0"
+
+# Serviço: timeout (conexão, leitura), conexões por host, hosts mantidos no pool e retentativas
+PERFIS = {
+    "nominatim": {"timeout": (5, 10), "conexoes_por_host": 2, "hosts": 2, "retentativas": 2},
+    "overpass": {"timeout": (5, 40), "conexoes_por_host": 4, "hosts": 4, "retentativas": 1},
+    "ibge": {"timeout": (5, 15), "conexoes_por_host": 8, "hosts": 2, "retentativas": 3},
+    # Sites auditados: muitos hosts diferentes, poucas conexões em cada, nenhuma retentativa e nenhum cookie
+    # guardado (cada auditoria é uma primeira visita; cookies de um redirecionamento valem só naquela requisição)
+    "sites": {"timeout": (3, 5), "conexoes_por_host": 2, "hosts": 200, "retentativas": 0, "cookies": False},
+}
+BACKOFF_RETENTATIVAS = 0.5  # Segundos, dobrando a cada tentativa
+STATUS_RETENTATIVA = (500, 502)  # 429, 503 e 504 ficam com o limitador de taxa, que respeita Retry-After
+
+_sessoes: Dict[str, requests.Session] = {}
+_trava = threading.Lock()
+
+
+def _criar_sessao(perfil: Dict) -> requests.Session:
+    retentativas = Retry(
+        total=perfil["retentativas"],
+        connect=perfil["retentativas"],
+        read=0,  # Não repete leituras: um POST lento no Overpass não deve ser reenviado às cegas
+        status=perfil["retentativas"],
+        status_forcelist=STATUS_RETENTATIVA,
+        allowed_methods=frozenset({"GET", "HEAD", "POST"}),
+        backoff_factor=BACKOFF_RETENTATIVAS,
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adaptador = HTTPAdapter(
+        pool_connections=perfil["hosts"],
+        pool_maxsize=perfil["conexoes_por_host"],
+        pool_block=True,
+        max_retries=retentativas,
+    )
+    sessao = requests.Session()
+    sessao.headers["User-Agent"] = USER_AGENT
+    if not perfil.get("cookies", True):
+        sessao.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    sessao.mount("http://", adaptador)
+    sessao.mount("https://", adaptador)
+    return sessao
+
+
+def obter_sessao(servico: str) -> requests.Session:
+    """Retorna a sessão única do processo para o serviço"""
+    with _trava:
+        if servico not in _sessoes:
+            _sessoes[servico] = _criar_sessao(PERFIS[servico])
+        return _sessoes[servico]
+
+
+def requisitar(servico: str, metodo: str, url: str, **kwargs) -> requests.Response:
+    """Faz a requisição pela sessão do serviço, com o timeout padrão do perfil"""
+    kwargs.setdefault("timeout", PERFIS[servico]["timeout"])
+    return obter_sessao(servico).request(metodo, url, **kwargs)
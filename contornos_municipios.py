@@ -0,0 +1,194 @@
+"""
+Contornos oficiais dos municípios (malhas do IBGE) para restringir as buscas à área da cidade
+O polígono é baixado uma vez por município e guardado no cache persistente;
+o teste de ponto no polígono descarta antes os pontos fora da caixa de cada parte do contorno
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from cache_local import CachePersistente
+from disjuntor import ServicoIndisponivel, chamar
+from identidade_leads import coordenadas_elemento
+from ladrilhos import Caixa, raio_envolvente
+from overpass import RAIO_MAXIMO_ADAPTATIVO, RAIOS_ADAPTATIVOS
+from texto import normalizar_texto
+
+URL_MALHA_MUNICIPIO = (
+    "https://servicodados.ibge.gov.br/api/v3/malhas/municipios/{id}"
+    "?formato=application/vnd.geo+json&qualidade=intermediaria"
+)
+# "0" desliga os contornos e volta ao raio fixo ao redor do centro (ex.: benchmarks offline)
+USAR_CONTORNOS = os.environ.get("PROSPECTOR_CONTORNOS", "1") != "0"
+
+cache_contornos = CachePersistente(
+    "contornos_municipios",
+    ttl=365 * 86400,       # Limites municipais quase nunca mudam
+    ttl_negativo=86400,
+    max_entradas=6000,     # Cabe o Brasil inteiro (5570 municípios)
+    comprimir=True,
+)
+
+Anel = List[Tuple[float, float]]  # Vértices (lon, lat), como no GeoJSON
+
+
+def _caixa_anel(anel: Anel) -> Caixa:
+    lons = [ponto[0] for ponto in anel]
+    lats = [ponto[1] for ponto in anel]
+    return (min(lats), min(lons), max(lats), max(lons))
+
+
+def _cruzamentos(lat: float, lon: float, anel: Anel) -> int:
+    """Quantas arestas do anel o raio horizontal a partir do ponto cruza (ray casting)"""
+    cruzamentos = 0
+    lon_ant, lat_ant = anel[-1]
+    for lon_atual, lat_atual in anel:
+        if (lat_atual > lat) != (lat_ant > lat):
+            lon_cruzamento = lon_atual + (lat - lat_atual) * (lon_ant - lon_atual) / (lat_ant - lat_atual)
+            if lon < lon_cruzamento:
+                cruzamentos += 1
+        lon_ant, lat_ant = lon_atual, lat_atual
+    return cruzamentos
+
+
+def _orientacao(a: Tuple[float, float], b: Tuple[float, float], c: Tuple[float, float]) -> float:
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+
+def _segmentos_cruzam(p1, p2, q1, q2) -> bool:
+    """Teste de cruzamento por orientação; segmentos colineares contam como cruzando (erra para o lado seguro)"""
+    return (
+        _orientacao(q1, q2, p1) * _orientacao(q1, q2, p2) <= 0
+        and _orientacao(p1, p2, q1) * _orientacao(p1, p2, q2) <= 0
+    )
+
+
+class Contorno:
+    """Contorno de um município: um ou mais polígonos, cada um com o anel externo e eventuais buracos"""
+
+    def __init__(self, poligonos: Sequence[Sequence[Anel]]):
+        self.poligonos = [(_caixa_anel(aneis[0]), aneis) for aneis in poligonos if aneis and aneis[0]]
+        caixas = [caixa for caixa, _ in self.poligonos]
+        self.caixa: Caixa = (
+            min(c[0] for c in caixas), min(c[1] for c in caixas),
+            max(c[2] for c in caixas), max(c[3] for c in caixas),
+        )
+
+    def contem(self, lat: float, lon: float) -> bool:
+        """Ponto no polígono (regra par-ímpar: buracos ficam de fora)"""
+        for (sul, oeste, norte, leste), aneis in self.poligonos:
+            if not (sul <= lat <= norte and oeste <= lon <= leste):
+                continue
+            if sum(_cruzamentos(lat, lon, anel) for anel in aneis) % 2:
+                return True
+        return False
+
+    def cruza(self, caixa: Caixa) -> bool:
+        """Indica se a caixa tem alguma parte dentro do município (ladrilhos de fora não precisam de busca)"""
+        sul, oeste, norte, leste = caixa
+        cantos = [(oeste, sul), (leste, sul), (leste, norte), (oeste, norte)]  # (lon, lat), como os anéis
+        if any(self.contem(lat, lon) for lon, lat in cantos):
+            return True
+        bordas = list(zip(cantos, cantos[1:] + cantos[:1]))
+        for (p_sul, p_oeste, p_norte, p_leste), aneis in self.poligonos:
+            if p_sul > norte or p_norte < sul or p_oeste > leste or p_leste < oeste:
+                continue
+            for anel in aneis:
+                # Um polígono inteiro dentro da caixa (ilha) não cruza as bordas: basta um vértice dentro
+                lon, lat = anel[0]
+                if oeste <= lon <= leste and sul <= lat <= norte:
+                    return True
+                anterior = anel[-1]
+                for atual in anel:
+                    # Só as arestas que chegam perto da caixa passam pelo teste de cruzamento
+                    if (
+                        max(anterior[0], atual[0]) >= oeste and min(anterior[0], atual[0]) <= leste
+                        and max(anterior[1], atual[1]) >= sul and min(anterior[1], atual[1]) <= norte
+                        and any(_segmentos_cruzam(anterior, atual, c1, c2) for c1, c2 in bordas)
+                    ):
+                        return True
+                    anterior = atual
+        return False
+
+    def filtrar(self, elementos: List[Dict]) -> List[Dict]:
+        """Mantém só os elementos dentro do município, na mesma ordem"""
+        dentro = []
+        for element in elementos:
+            posicao = coordenadas_elemento(element)
+            if posicao is not None and self.contem(*posicao):
+                dentro.append(element)
+        return dentro
+
+    def raios_adaptativos(self, centro: Tuple[float, float]) -> Tuple[int, ...]:
+        """Raios crescentes até o que cobre o município inteiro, em vez de parar em 20 km
+        (limitados a RAIO_MAXIMO_ADAPTATIVO; municípios maiores só ficam completos na busca em ladrilhos)"""
+        envolvente = min(raio_envolvente(centro, self.caixa), RAIO_MAXIMO_ADAPTATIVO)
+        return tuple(sorted({raio for raio in RAIOS_ADAPTATIVOS if raio < envolvente} | {envolvente}))
+
+
+ESPERA_CODIGOS = 300  # Segundos sem tentar de novo a lista de municípios depois de uma falha
+
+_codigos: Dict[Tuple[str, str], int] = {}
+_codigos_falharam_em: Optional[float] = None
+_trava_codigos = threading.Lock()
+
+
+def codigo_municipio(cidade: str, uf: str) -> Optional[int]:
+    """Código IBGE do município, pelo snapshot local de municípios (ou pela API, uma vez por processo);
+    uma lista vazia (IBGE fora do ar e sem snapshot) só é pedida de novo depois de ESPERA_CODIGOS"""
+    global _codigos_falharam_em
+    with _trava_codigos:
+        if not _codigos and (
+            _codigos_falharam_em is None or time.monotonic() - _codigos_falharam_em >= ESPERA_CODIGOS
+        ):
+            from ibge_localidades import buscar_todas_cidades
+
+            _codigos.update({(m["uf"].upper(), normalizar_texto(m["nome"])): m["id"] for m in buscar_todas_cidades()})
+            _codigos_falharam_em = None if _codigos else time.monotonic()
+    return _codigos.get((uf.upper(), normalizar_texto(cidade)))
+
+
+def _poligonos_geojson(geojson: Dict) -> List[List[Anel]]:
+    poligonos = []
+    for feature in geojson.get("features", []):
+        geometria = feature.get("geometry") or {}
+        if geometria.get("type") == "Polygon":
+            poligonos.append(geometria["coordinates"])
+        elif geometria.get("type") == "MultiPolygon":
+            poligonos.extend(geometria["coordinates"])
+    return [[[(lon, lat) for lon, lat, *_ in anel] for anel in aneis] for aneis in poligonos]
+
+
+def _baixar_contorno(municipio_id: int) -> List[List[Anel]]:
+    from cliente_http import requisitar
+
+    response = chamar("ibge", lambda: requisitar("ibge", "GET", URL_MALHA_MUNICIPIO.format(id=municipio_id)))
+    if response.status_code == 404:
+        return []
+    response.raise_for_status()
+    return _poligonos_geojson(response.json())
+
+
+def obter_contorno(cidade: str, uf: str) -> Optional[Contorno]:
+    """Contorno do município, do cache ou da API de malhas do IBGE;
+    None se desligado, desconhecido ou inacessível (a busca volta ao raio ao redor do centro)"""
+    if not USAR_CONTORNOS:
+        return None
+    municipio_id = codigo_municipio(cidade, uf)
+    if municipio_id is None:
+        return None
+
+    chave = str(municipio_id)
+    poligonos = cache_contornos.obter(chave)
+    if poligonos is None:
+        import requests
+
+        try:
+            poligonos = _baixar_contorno(municipio_id)
+        except (ServicoIndisponivel, requests.RequestException, ValueError, KeyError):
+            # Falha de rede não é guardada: a próxima busca tenta de novo
+            return None
+        cache_contornos.salvar(chave, poligonos, negativo=not poligonos)
+    return Contorno(poligonos) if poligonos else None
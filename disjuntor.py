@@ -0,0 +1,169 @@
+"""
+Disjuntores (circuit breakers) por serviço externo
+Depois de falhas seguidas o serviço é dado como fora do ar e as chamadas falham na hora, sem esperar o timeout;
+passado o tempo de espera, uma única chamada de teste decide se ele voltou
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+FECHADO = "fechado"          # Serviço saudável, chamadas normais
+ABERTO = "aberto"            # Fora do ar: chamadas falham na hora
+MEIO_ABERTO = "meio_aberto"  # Espera vencida: uma chamada de teste em andamento
+
+ROTULOS_ESTADO = {
+    FECHADO: "🟢 Normal",
+    ABERTO: "🔴 Fora do ar",
+    MEIO_ABERTO: "🟡 Testando",
+}
+
+# Serviço: falhas seguidas até abrir; endpoints como "overpass:host" usam o valor do serviço base
+LIMITES_FALHAS = {
+    "nominatim": 3,
+    "overpass": 2,
+}
+TEMPO_ABERTO = 60.0          # Segundos até a chamada de teste
+TEMPO_ABERTO_MAXIMO = 600.0  # A espera dobra a cada teste que falha, até esse limite
+
+
+class ServicoIndisponivel(Exception):
+    """O serviço externo está fora do ar (ou o disjuntor dele está aberto)"""
+
+    def __init__(self, servico: str, motivo: str):
+        super().__init__(f"{servico} indisponível: {motivo}")
+        self.servico = servico
+        self.motivo = motivo
+
+
+def resposta_com_falha(response) -> bool:
+    """Erros do servidor e sobrecarga contam como falha; 4xx é problema da requisição, não do serviço"""
+    return response.status_code >= 500 or response.status_code == 429
+
+
+class Disjuntor:
+    """Estado de saúde de um serviço, compartilhado por todas as threads do processo"""
+
+    def __init__(self, servico: str, limite_falhas: int, tempo_aberto: float = TEMPO_ABERTO):
+        self.servico = servico
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self.estado = FECHADO
+        self.falhas_seguidas = 0
+        self.falhas_total = 0
+        self.sucessos_total = 0
+        self.ultimo_erro = ""
+        self._espera = tempo_aberto
+        self._reabre_em = 0.0
+        self._trava = threading.Lock()
+
+    def permitir(self) -> bool:
+        """Diz se a chamada pode seguir; com o disjuntor aberto só a chamada de teste passa"""
+        with self._trava:
+            if self.estado == FECHADO:
+                return True
+            if self.estado == ABERTO and time.monotonic() >= self._reabre_em:
+                self.estado = MEIO_ABERTO
+                return True
+            return False
+
+    def registrar_sucesso(self) -> None:
+        with self._trava:
+            self.estado = FECHADO
+            self.falhas_seguidas = 0
+            self.sucessos_total += 1
+            self._espera = self.tempo_aberto
+
+    def registrar_falha(self, motivo: str) -> None:
+        with self._trava:
+            self.falhas_seguidas += 1
+            self.falhas_total += 1
+            self.ultimo_erro = motivo
+            if self.estado == MEIO_ABERTO:
+                # O teste falhou: volta a abrir, esperando mais desta vez
+                self._espera = min(TEMPO_ABERTO_MAXIMO, self._espera * 2)
+                self._abrir()
+            elif self.falhas_seguidas >= self.limite_falhas:
+                self._abrir()
+
+    def verificar(self) -> None:
+        """ServicoIndisponivel se a chamada não puder seguir"""
+        if not self.permitir():
+            raise ServicoIndisponivel(
+                self.servico,
+                f"{self.ultimo_erro or 'falhas seguidas'} (nova tentativa em {self.segundos_para_teste():.0f} s)",
+            )
+
+    def registrar_resposta(self, response) -> None:
+        """Conta a resposta de uma tentativa: 5xx e 429 são falha, o resto é sucesso"""
+        if resposta_com_falha(response):
+            self.registrar_falha(f"HTTP {response.status_code}")
+        else:
+            self.registrar_sucesso()
+
+    def _abrir(self) -> None:
+        self.estado = ABERTO
+        self._reabre_em = time.monotonic() + self._espera
+
+    def segundos_para_teste(self) -> float:
+        with self._trava:
+            return max(0.0, self._reabre_em - time.monotonic()) if self.estado == ABERTO else 0.0
+
+    def situacao(self) -> Dict:
+        """Estado atual para exibição"""
+        return {
+            "servico": self.servico,
+            "estado": self.estado,
+            "falhas_seguidas": self.falhas_seguidas,
+            "falhas_total": self.falhas_total,
+            "sucessos_total": self.sucessos_total,
+            "ultimo_erro": self.ultimo_erro,
+            "nova_tentativa_em": round(self.segundos_para_teste()),
+        }
+
+
+_disjuntores: Dict[str, Disjuntor] = {}
+_trava_disjuntores = threading.Lock()
+
+
+def obter_disjuntor(servico: str) -> Disjuntor:
+    """Retorna o disjuntor único do processo para o serviço (ou endpoint "servico:host")"""
+    with _trava_disjuntores:
+        if servico not in _disjuntores:
+            limite = LIMITES_FALHAS.get(servico.split(":")[0], 3)
+            _disjuntores[servico] = Disjuntor(servico, limite)
+        return _disjuntores[servico]
+
+
+def chamar(servico: str, fazer_requisicao: Callable):
+    """Executa uma única tentativa pelo disjuntor do serviço: falha na hora se ele estiver aberto,
+    e registra como falha exceções de rede, erros 5xx e 429.
+    Para chamadas com retentativas, use requisitar_com_limite(..., disjuntor=...), que conta cada tentativa"""
+    disjuntor = obter_disjuntor(servico)
+    disjuntor.verificar()
+    try:
+        response = fazer_requisicao()
+    except Exception as e:
+        disjuntor.registrar_falha(type(e).__name__)
+        raise
+    disjuntor.registrar_resposta(response)
+    return response
+
+
+def situacao_servicos(somente_degradados: bool = False) -> List[Dict]:
+    """Saúde de todos os serviços já chamados; opcionalmente só os que estão falhando"""
+    with _trava_disjuntores:
+        disjuntores = list(_disjuntores.values())
+    situacoes = [d.situacao() for d in disjuntores]
+    if somente_degradados:
+        situacoes = [s for s in situacoes if s["estado"] != FECHADO or s["falhas_seguidas"]]
+    return sorted(situacoes, key=lambda s: s["servico"])
+
+
+def reiniciar(servico: Optional[str] = None) -> None:
+    """Esquece o histórico de um serviço, ou de todos"""
+    with _trava_disjuntores:
+        if servico is None:
+            _disjuntores.clear()
+        else:
+            _disjuntores.pop(servico, None)
@@ -0,0 +1,144 @@
+"""
+Exportação de leads para Excel, CSV e Parquet
+Os arquivos só são gerados quando pedidos, direto do DataFrame de leads, e gravados em disco;
+o Excel usa o modo write-only do openpyxl, que escreve linha a linha com memória constante
+"""
+
+import os
+import re
+import time
+import uuid
+from typing import Dict, Tuple
+
+import pandas as pd
+
+from cache_local import PASTA_CACHE
+
+PASTA_EXPORTACOES = os.path.join(PASTA_CACHE, "exportacoes")
+IDADE_MAXIMA_EXPORTACAO = 86400  # Arquivos gerados são apagados depois de 1 dia
+LINHAS_POR_LOTE_CSV = 5000
+
+# Coluna do lead: (cabeçalho, largura no Excel)
+COLUNAS_EXPORTACAO: Dict[str, Tuple[str, int]] = {
+    "empresa": ("Empresa", 30),
+    "prioridade": ("Prioridade", 12),
+    "score": ("Score", 8),
+    "telefone": ("Telefone", 18),
+    "whatsapp": ("WhatsApp", 18),
+    "site": ("Site", 35),
+    "endereco": ("Endereço", 50),
+    "cidade": ("Cidade", 15),
+    "estado": ("Estado", 8),
+    "sugestoes": ("Sugestões", 50),
+}
+
+# Formato: (rótulo, tipo MIME, pacote opcional necessário)
+FORMATOS = {
+    "xlsx": ("Excel formatado", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "openpyxl"),
+    "csv": ("CSV", "text/csv", None),
+    "parquet": ("Parquet", "application/vnd.apache.parquet", "pyarrow"),
+}
+
+
+def _juntar_sugestoes(sugestoes) -> str:
+    if isinstance(sugestoes, (list, tuple)):
+        return ", ".join(sugestoes)
+    return sugestoes if isinstance(sugestoes, str) else ""
+
+
+def preparar_tabela(df_leads: pd.DataFrame) -> pd.DataFrame:
+    """Recorta as colunas do relatório, com sugestões em texto e sem valores ausentes"""
+    tabela = df_leads.reindex(columns=list(COLUNAS_EXPORTACAO))
+    tabela["score"] = pd.to_numeric(tabela["score"], errors="coerce").fillna(0).astype(int)
+    tabela["sugestoes"] = tabela["sugestoes"].map(_juntar_sugestoes)
+    texto = [coluna for coluna in COLUNAS_EXPORTACAO if coluna not in ("score", "sugestoes")]
+    tabela[texto] = tabela[texto].fillna("").astype(str)
+    return tabela
+
+
+def _gravar_excel(tabela: pd.DataFrame, caminho: str) -> None:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Leads")
+
+    # No modo write-only as larguras precisam ser definidas antes da primeira linha
+    for i, (_, largura) in enumerate(COLUNAS_EXPORTACAO.values(), 1):
+        ws.column_dimensions[get_column_letter(i)].width = largura
+
+    cabecalho = []
+    for titulo, _ in COLUNAS_EXPORTACAO.values():
+        celula = WriteOnlyCell(ws, value=titulo)
+        celula.font = Font(bold=True, color="FFFFFF")
+        celula.fill = PatternFill(start_color="FF6B35", end_color="FF6B35", fill_type="solid")
+        celula.alignment = Alignment(horizontal="center", vertical="center")
+        cabecalho.append(celula)
+    ws.append(cabecalho)
+
+    for linha in tabela.itertuples(index=False, name=None):
+        ws.append(linha)
+    wb.save(caminho)
+
+
+def _gravar_csv(tabela: pd.DataFrame, caminho: str) -> None:
+    # Ponto e vírgula e BOM: o Excel em português abre o arquivo direto, com acentos
+    tabela.rename(columns={coluna: titulo for coluna, (titulo, _) in COLUNAS_EXPORTACAO.items()}).to_csv(
+        caminho, sep=";", index=False, encoding="utf-8-sig", chunksize=LINHAS_POR_LOTE_CSV
+    )
+
+
+def _gravar_parquet(tabela: pd.DataFrame, caminho: str) -> None:
+    tabela.to_parquet(caminho, index=False)
+
+
+GRAVADORES = {
+    "xlsx": _gravar_excel,
+    "csv": _gravar_csv,
+    "parquet": _gravar_parquet,
+}
+
+
+def nome_arquivo(prefixo: str, formato: str) -> str:
+    """Nome de arquivo seguro e único, como leads_Sao_Paulo_20240101_120000_1a2b3c4d.xlsx;
+    o sufixo evita que duas sessões exportando no mesmo segundo gravem no mesmo arquivo"""
+    base = re.sub(r"[^\w-]+", "_", prefixo).strip("_") or "leads"
+    return f"{base}_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.{formato}"
+
+
+def limpar_exportacoes(idade_maxima: float = IDADE_MAXIMA_EXPORTACAO) -> None:
+    """Apaga os arquivos gerados há mais tempo que a idade máxima"""
+    if not os.path.isdir(PASTA_EXPORTACOES):
+        return
+    limite = time.time() - idade_maxima
+    for nome in os.listdir(PASTA_EXPORTACOES):
+        caminho = os.path.join(PASTA_EXPORTACOES, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+        except OSError:
+            pass
+
+
+def ler_arquivo(caminho: str) -> bytes:
+    """Conteúdo de um arquivo gerado, lido só no momento do download"""
+    with open(caminho, "rb") as arquivo:
+        return arquivo.read()
+
+
+def exportar_leads(df_leads: pd.DataFrame, formato: str, prefixo: str = "leads") -> str:
+    """Grava os leads no formato pedido e retorna o caminho do arquivo;
+    ImportError se o pacote opcional do formato não estiver instalado"""
+    limpar_exportacoes()
+    os.makedirs(PASTA_EXPORTACOES, exist_ok=True)
+    caminho = os.path.join(PASTA_EXPORTACOES, nome_arquivo(prefixo, formato))
+    temporario = f"{caminho}.tmp"
+    try:
+        GRAVADORES[formato](preparar_tabela(df_leads), temporario)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return caminho
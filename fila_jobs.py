@@ -0,0 +1,239 @@
+"""
+Fila de buscas em segundo plano
+Os jobs rodam em um pool de threads do processo (compartilhado entre sessões) e o estado fica no SQLite,
+então uma busca longa sobrevive aos reruns do Streamlit e pode ser acompanhada ou cancelada
+"""
+
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from cache_local import comprimir_json, conectar, descomprimir_json
+
+MAX_JOBS_SIMULTANEOS = 2
+IDADE_MAXIMA_JOBS = 7 * 86400  # Jobs finalizados (e seus resultados) são apagados depois de 7 dias
+MAX_JOBS_GUARDADOS = 100       # ou quando passam dos 100 mais recentes
+
+NA_FILA = "na_fila"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+CANCELADO = "cancelado"
+FINALIZADOS = {CONCLUIDO, ERRO, CANCELADO}
+
+ROTULOS_STATUS = {
+    NA_FILA: "⏳ Na fila",
+    EXECUTANDO: "🔄 Executando",
+    CONCLUIDO: "✅ Concluído",
+    ERRO: "❌ Erro",
+    CANCELADO: "⛔ Cancelado",
+}
+
+
+class JobCancelado(Exception):
+    """O usuário pediu o cancelamento do job"""
+
+
+_executor = ThreadPoolExecutor(max_workers=MAX_JOBS_SIMULTANEOS, thread_name_prefix="job")
+_cancelamentos: Dict[str, threading.Event] = {}
+_trava = threading.Lock()
+
+
+def _criar_tabela() -> None:
+    with conectar() as conexao:
+        conexao.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                descricao TEXT NOT NULL,
+                parametros TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progresso REAL NOT NULL DEFAULT 0,
+                mensagem TEXT NOT NULL DEFAULT '',
+                parcial BLOB,
+                resultado BLOB,
+                stats BLOB,
+                criado_em REAL NOT NULL,
+                atualizado_em REAL NOT NULL
+            )
+        """)
+        # Jobs de um processo anterior não têm mais thread executando
+        conexao.execute(
+            "UPDATE jobs SET status = ?, mensagem = 'Interrompido pelo reinício do servidor' WHERE status IN (?, ?)",
+            (ERRO, NA_FILA, EXECUTANDO),
+        )
+    descartar_jobs_antigos()
+
+
+def descartar_jobs_antigos(
+    idade_maxima: float = IDADE_MAXIMA_JOBS, max_jobs: int = MAX_JOBS_GUARDADOS
+) -> None:
+    """Apaga os jobs finalizados antigos ou além dos mais recentes; jobs em andamento nunca são apagados"""
+    finalizados = tuple(FINALIZADOS)
+    marcadores = ", ".join("?" * len(finalizados))
+    with conectar() as conexao:
+        conexao.execute(
+            f"DELETE FROM jobs WHERE status IN ({marcadores}) AND "
+            "(atualizado_em < ? OR id NOT IN (SELECT id FROM jobs ORDER BY criado_em DESC LIMIT ?))",
+            (*finalizados, time.time() - idade_maxima, max_jobs),
+        )
+
+
+def _atualizar(job_id: str, **campos) -> None:
+    campos["atualizado_em"] = time.time()
+    colunas = ", ".join(f"{nome} = ?" for nome in campos)
+    with conectar() as conexao:
+        conexao.execute(f"UPDATE jobs SET {colunas} WHERE id = ?", (*campos.values(), job_id))
+
+
+def _verificar_cancelamento(job_id: str) -> None:
+    evento = _cancelamentos.get(job_id)
+    if evento is not None and evento.is_set():
+        raise JobCancelado()
+
+
+def _executar_cidade(job_id: str, p: Dict) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    # O pipeline (requests, sockets, SSL) só é carregado quando o primeiro job roda
+    from pipeline_leads import gerar_leads
+
+    def ao_buscar_ladrilho(concluidos, total):
+        _verificar_cancelamento(job_id)
+        _atualizar(job_id, mensagem=f"🧩 Buscando ladrilhos... {concluidos}/{total}")
+
+    leads = []
+    _atualizar(job_id, mensagem=f"🔍 Buscando em {p['cidade']}/{p['estado']}...")
+    for lead, concluidos, total in gerar_leads(
+        p["cidade"], p["estado"], p["max_leads"], p["nicho"], p["categoria"], p.get("atualizar", False),
+        p.get("ladrilhos", False), ao_buscar_ladrilho,
+    ):
+        _verificar_cancelamento(job_id)
+        leads.append(lead)
+        _atualizar(
+            job_id,
+            progresso=concluidos / total,
+            mensagem=f"🔎 Analisando sites... {concluidos}/{total}",
+            parcial=comprimir_json(leads),
+        )
+    # Mesma ordem do resultado do Overpass
+    return pd.DataFrame(sorted(leads, key=lambda lead: lead["id"])), pd.DataFrame()
+
+
+ETAPAS_LOTE = {"busca": "🗺️ Buscando cidades", "auditoria": "🔎 Analisando sites"}
+
+
+def _executar_lote(job_id: str, p: Dict) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    from prospeccao_lote import prospectar_cidades
+
+    def ao_progredir(etapa, concluidos, total):
+        _verificar_cancelamento(job_id)
+        # A busca vale a primeira metade da barra; a auditoria, a segunda
+        base = 0.0 if etapa == "busca" else 0.5
+        _atualizar(
+            job_id,
+            progresso=base + 0.5 * concluidos / total,
+            mensagem=f"{ETAPAS_LOTE[etapa]}... {concluidos}/{total}",
+        )
+
+    return prospectar_cidades(
+        p["cidades"], p["estado"], p["max_leads"], p["nicho"], p["categoria"],
+        atualizar=p.get("atualizar", False), ladrilhos=p.get("ladrilhos", False), ao_progredir=ao_progredir
+    )
+
+
+EXECUTORES = {
+    "cidade": _executar_cidade,
+    "lote": _executar_lote,
+}
+
+
+def _rodar(job_id: str, tipo: str, parametros: Dict) -> None:
+    try:
+        _verificar_cancelamento(job_id)
+        _atualizar(job_id, status=EXECUTANDO)
+        df, stats = EXECUTORES[tipo](job_id, parametros)
+        _atualizar(
+            job_id,
+            status=CONCLUIDO,
+            progresso=1.0,
+            mensagem=f"{len(df)} leads encontrados",
+            resultado=comprimir_json(df.to_dict("records")),
+            stats=comprimir_json(stats.to_dict("records")),
+            parcial=None,  # O resultado completo substitui o parcial
+        )
+    except JobCancelado:
+        _atualizar(job_id, status=CANCELADO, mensagem="Cancelado pelo usuário")
+    except Exception as e:
+        _atualizar(job_id, status=ERRO, mensagem=str(e))
+    finally:
+        with _trava:
+            _cancelamentos.pop(job_id, None)
+        descartar_jobs_antigos()
+
+
+def enviar_job(tipo: str, descricao: str, parametros: Dict) -> str:
+    """Coloca uma busca na fila e retorna o id do job"""
+    job_id = uuid.uuid4().hex[:12]
+    agora = time.time()
+    with conectar() as conexao:
+        conexao.execute(
+            "INSERT INTO jobs (id, tipo, descricao, parametros, status, criado_em, atualizado_em) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, tipo, descricao, json.dumps(parametros, ensure_ascii=False), NA_FILA, agora, agora),
+        )
+    with _trava:
+        _cancelamentos[job_id] = threading.Event()
+    _executor.submit(_rodar, job_id, tipo, parametros)
+    return job_id
+
+
+def cancelar_job(job_id: str) -> None:
+    """Pede o cancelamento; o job para no próximo ponto de verificação"""
+    with _trava:
+        evento = _cancelamentos.get(job_id)
+    if evento is not None:
+        evento.set()
+
+
+def obter_job(job_id: str) -> Optional[Dict]:
+    """Retorna status, progresso e mensagem do job (sem os resultados)"""
+    with conectar() as conexao:
+        linha = conexao.execute(
+            "SELECT id, tipo, descricao, status, progresso, mensagem, criado_em, atualizado_em FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+    if linha is None:
+        return None
+    campos = ["id", "tipo", "descricao", "status", "progresso", "mensagem", "criado_em", "atualizado_em"]
+    return dict(zip(campos, linha))
+
+
+def listar_jobs(limite: int = 20) -> List[Dict]:
+    """Retorna os jobs mais recentes, do mais novo para o mais antigo"""
+    with conectar() as conexao:
+        ids = [linha[0] for linha in conexao.execute(
+            "SELECT id FROM jobs ORDER BY criado_em DESC LIMIT ?", (limite,)
+        )]
+    return [job for job in map(obter_job, ids) if job]
+
+
+def carregar_parcial(job_id: str) -> pd.DataFrame:
+    """Leads já prontos de um job em andamento"""
+    with conectar() as conexao:
+        linha = conexao.execute("SELECT parcial FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return pd.DataFrame(descomprimir_json(linha[0]) if linha else None)
+
+
+def carregar_resultado(job_id: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Retorna (leads, estatísticas por cidade) de um job concluído"""
+    with conectar() as conexao:
+        linha = conexao.execute("SELECT resultado, stats FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if linha is None:
+        return pd.DataFrame(), pd.DataFrame()
+    return pd.DataFrame(descomprimir_json(linha[0])), pd.DataFrame(descomprimir_json(linha[1]))
+
+
+_criar_tabela()
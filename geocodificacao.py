@@ -0,0 +1,154 @@
+"""
+Geocodificação de municípios brasileiros
+Ordem de consulta: tabela local de centroides do IBGE, cache persistente e, por último, o Nominatim
+"""
+
+import csv
+import gzip
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from cache_local import PASTA_DADOS, CachePersistente
+from disjuntor import ServicoIndisponivel, obter_disjuntor, resposta_com_falha
+from instrumentacao import medido, medir
+from texto import normalizar_texto
+
+ARQUIVO_COORDENADAS = os.path.join(PASTA_DADOS, "municipios_coordenadas.csv.gz")
+TENTATIVAS_CENTROIDE = 3  # Por município, ao gerar a tabela; falhas isoladas não derrubam a geração inteira
+
+URL_NOMINATIM = os.environ.get("PROSPECTOR_URL_NOMINATIM", "https://nominatim.openstreetmap.org/search")
+URL_METADADOS_MALHA = "https://servicodados.ibge.gov.br/api/v3/malhas/municipios/{id}/metadados"
+
+cache_geocodificacao = CachePersistente(
+    "geocodificacao",
+    ttl=180 * 86400,
+    ttl_negativo=86400,
+)
+
+
+@lru_cache(maxsize=1)
+def carregar_tabela_municipios() -> Dict[Tuple[str, str], Tuple[float, float]]:
+    """Carrega a tabela local de centroides, indexada por (UF, nome normalizado)"""
+    if not os.path.exists(ARQUIVO_COORDENADAS):
+        return {}
+    tabela = {}
+    with gzip.open(ARQUIVO_COORDENADAS, "rt", encoding="utf-8", newline="") as arquivo:
+        for linha in csv.DictReader(arquivo):
+            chave = (linha["uf"].upper(), normalizar_texto(linha["nome"]))
+            tabela[chave] = (float(linha["latitude"]), float(linha["longitude"]))
+    return tabela
+
+
+def _consultar_nominatim(cidade: str, estado: str) -> Optional[Tuple[float, float]]:
+    """Consulta o Nominatim dentro da cota compartilhada do processo e do disjuntor do serviço"""
+    from cliente_http import requisitar
+    from limitador_taxa import requisitar_com_limite
+
+    params = {"q": f"{cidade}, {estado}, Brasil", "format": "json", "limit": 1, "countrycodes": "br"}
+    with medir("nominatim", urlparse(URL_NOMINATIM).hostname) as span:
+        response = requisitar_com_limite(
+            "nominatim",
+            lambda: requisitar("nominatim", "GET", URL_NOMINATIM, params=params),
+            disjuntor=obter_disjuntor("nominatim"),
+        )
+        span.bytes = len(response.content)
+        if resposta_com_falha(response):
+            raise ServicoIndisponivel("nominatim", f"HTTP {response.status_code}")
+        response.raise_for_status()
+        data = response.json()
+    if data:
+        return float(data[0]["lat"]), float(data[0]["lon"])
+    return None
+
+
+@medido("geocodificacao")
+def geocodificar_cidade(cidade: str, estado: str) -> Optional[Tuple[float, float]]:
+    """Retorna (lat, lon) do município, ou None se o Nominatim não o encontrar;
+    ServicoIndisponivel se o Nominatim estiver fora do ar"""
+    chave = (estado.upper(), normalizar_texto(cidade))
+
+    coordenadas = carregar_tabela_municipios().get(chave)
+    if coordenadas:
+        return coordenadas
+
+    chave_cache = "|".join(chave)
+    em_cache = cache_geocodificacao.obter(chave_cache)
+    if em_cache is not None:
+        return tuple(em_cache) if em_cache else None
+
+    import requests
+
+    try:
+        coordenadas = _consultar_nominatim(cidade, estado)
+    except ServicoIndisponivel:
+        # Falha de rede não é guardada: a próxima busca tenta de novo
+        raise
+    except (requests.RequestException, ValueError, KeyError) as e:
+        raise ServicoIndisponivel("nominatim", type(e).__name__) from e
+
+    cache_geocodificacao.salvar(chave_cache, list(coordenadas) if coordenadas else [], negativo=coordenadas is None)
+    return coordenadas
+
+
+def _centroide_ibge(municipio_id: int) -> Optional[Tuple[float, float]]:
+    """Busca o centroide oficial de um município na API de malhas do IBGE"""
+    from cliente_http import requisitar
+
+    response = requisitar("ibge", "GET", URL_METADADOS_MALHA.format(id=municipio_id))
+    response.raise_for_status()
+    metadados = response.json()
+    if not metadados:
+        return None
+    centroide = metadados[0]["centroide"]
+    return float(centroide["latitude"]), float(centroide["longitude"])
+
+
+def _centroide_com_retentativas(
+    municipio_id: int, tentativas: int = TENTATIVAS_CENTROIDE
+) -> Optional[Tuple[float, float]]:
+    """Centroide do município; None se todas as tentativas falharem (ele fica de fora da tabela)"""
+    import requests
+
+    for tentativa in range(tentativas):
+        try:
+            return _centroide_ibge(municipio_id)
+        except (requests.RequestException, ValueError, KeyError):
+            time.sleep(2 ** tentativa)
+    return None
+
+
+def gerar_tabela_municipios(caminho: str = ARQUIVO_COORDENADAS, max_workers: int = 8) -> int:
+    """Gera o arquivo local de centroides a partir dos municípios do IBGE; retorna quantos foram gravados.
+    Municípios cujo centroide não pôde ser obtido ficam de fora e continuam sendo geocodificados pelo Nominatim"""
+    from ibge_localidades import buscar_todas_cidades
+
+    municipios = buscar_todas_cidades()
+    if not municipios:
+        # Sem a lista do IBGE o arquivo sairia vazio e substituiria uma tabela boa
+        raise RuntimeError("lista de municípios do IBGE indisponível")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        centroides = list(executor.map(lambda m: _centroide_com_retentativas(m["id"]), municipios))
+
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    gravados = 0
+    temporario = f"{caminho}.tmp"
+    with gzip.open(temporario, "wt", encoding="utf-8", newline="") as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(["codigo_ibge", "nome", "uf", "latitude", "longitude"])
+        for municipio, centroide in zip(municipios, centroides):
+            if centroide:
+                escritor.writerow([municipio["id"], municipio["nome"], municipio["uf"], f"{centroide[0]:.5f}", f"{centroide[1]:.5f}"])
+                gravados += 1
+    os.replace(temporario, caminho)
+
+    carregar_tabela_municipios.cache_clear()
+    return gravados
+
+
+if __name__ == "__main__":
+    total = gerar_tabela_municipios()
+    print(f"{total} municípios gravados em {ARQUIVO_COORDENADAS}")
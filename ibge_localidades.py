@@ -1,67 +1,165 @@
 """
 Módulo para buscar dados de localidades do IBGE
 API pública e gratuita: https://servicodados.ibge.gov.br/api/docs/localidades
+Estados são fixos no código; municípios vêm de um snapshot local versionado, atualizado em segundo plano
 """
 
-import requests
+import gzip
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import List, Dict, Optional
+
 import streamlit as st
-from typing import List, Dict
 
-@st.cache_data(ttl=86400)  # Cache por 24 horas
+from cache_local import PASTA_DADOS
+
+ARQUIVO_SNAPSHOT = os.path.join(PASTA_DADOS, "ibge_municipios.json.gz")
+VERSAO_SNAPSHOT = 1
+IDADE_MAXIMA_SNAPSHOT = 30 * 86400  # Depois disso o snapshot é renovado em segundo plano
+
+URL_MUNICIPIOS = "https://servicodados.ibge.gov.br/api/v1/localidades/municipios"
+URL_MUNICIPIOS_UF = "https://servicodados.ibge.gov.br/api/v1/localidades/estados/{uf}/municipios"
+
+# Divisão territorial estável: (código IBGE, sigla, nome)
+ESTADOS_IBGE = [
+    (12, "AC", "Acre"), (27, "AL", "Alagoas"), (16, "AP", "Amapá"), (13, "AM", "Amazonas"),
+    (29, "BA", "Bahia"), (23, "CE", "Ceará"), (53, "DF", "Distrito Federal"), (32, "ES", "Espírito Santo"),
+    (52, "GO", "Goiás"), (21, "MA", "Maranhão"), (51, "MT", "Mato Grosso"), (50, "MS", "Mato Grosso do Sul"),
+    (31, "MG", "Minas Gerais"), (15, "PA", "Pará"), (25, "PB", "Paraíba"), (41, "PR", "Paraná"),
+    (26, "PE", "Pernambuco"), (22, "PI", "Piauí"), (33, "RJ", "Rio de Janeiro"), (24, "RN", "Rio Grande do Norte"),
+    (43, "RS", "Rio Grande do Sul"), (11, "RO", "Rondônia"), (14, "RR", "Roraima"), (42, "SC", "Santa Catarina"),
+    (35, "SP", "São Paulo"), (28, "SE", "Sergipe"), (17, "TO", "Tocantins"),
+]
+
+_atualizacao_iniciada = threading.Event()
+
+
+@lru_cache(maxsize=1)
+def carregar_snapshot(caminho: str = ARQUIVO_SNAPSHOT) -> Optional[Dict]:
+    """Lê o snapshot de municípios; None se não existir ou for de outra versão"""
+    if not os.path.exists(caminho):
+        return None
+    with gzip.open(caminho, "rt", encoding="utf-8") as arquivo:
+        snapshot = json.load(arquivo)
+    if snapshot.get("versao") != VERSAO_SNAPSHOT:
+        return None
+    por_uf: Dict[str, List[str]] = {}
+    for municipio in snapshot["municipios"]:
+        por_uf.setdefault(municipio["uf"], []).append(municipio["nome"])
+    snapshot["por_uf"] = {uf: sorted(nomes) for uf, nomes in por_uf.items()}
+    return snapshot
+
+
+# Caminhos até a UF no JSON do IBGE; municípios recentes podem vir sem microrregião, só com a região imediata
+CAMINHOS_UF = (
+    ("microrregiao", "mesorregiao", "UF"),
+    ("regiao-imediata", "regiao-intermediaria", "UF"),
+)
+
+
+def _uf_municipio(municipio: Dict) -> Optional[str]:
+    for caminho in CAMINHOS_UF:
+        no = municipio
+        for chave in caminho:
+            no = no.get(chave) if isinstance(no, dict) else None
+        if no:
+            return no["sigla"]
+    return None
+
+
+def _baixar_municipios() -> List[Dict]:
+    """Todos os municípios do IBGE; os que vierem sem UF em nenhum dos caminhos conhecidos ficam de fora"""
+    from cliente_http import requisitar
+    from disjuntor import chamar
+
+    # Pelo disjuntor: com o IBGE fora do ar as chamadas seguintes falham na hora, sem esperar as retentativas
+    response = chamar("ibge", lambda: requisitar("ibge", "GET", URL_MUNICIPIOS))
+    response.raise_for_status()
+    municipios = [{'id': m['id'], 'nome': m['nome'], 'uf': _uf_municipio(m)} for m in response.json()]
+    return [m for m in municipios if m['uf']]
+
+
+def gerar_snapshot(caminho: str = ARQUIVO_SNAPSHOT) -> int:
+    """Baixa todos os municípios do IBGE e grava o snapshot local; retorna quantos foram gravados"""
+    municipios = _baixar_municipios()
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f"{caminho}.tmp"
+    with gzip.open(temporario, "wt", encoding="utf-8") as arquivo:
+        json.dump({"versao": VERSAO_SNAPSHOT, "atualizado_em": time.time(), "municipios": municipios}, arquivo, ensure_ascii=False)
+    os.replace(temporario, caminho)
+    carregar_snapshot.cache_clear()
+    return len(municipios)
+
+
+_trava_atualizacao = threading.Lock()
+
+
+def _atualizar_em_segundo_plano() -> None:
+    """Renova o snapshot numa thread, no máximo uma vez por processo; falhas mantêm o snapshot atual"""
+    with _trava_atualizacao:
+        if _atualizacao_iniciada.is_set():
+            return
+        _atualizacao_iniciada.set()
+
+    def atualizar():
+        try:
+            gerar_snapshot()
+        except Exception:
+            pass
+
+    threading.Thread(target=atualizar, daemon=True).start()
+
+
+def _snapshot_atual() -> Optional[Dict]:
+    snapshot = carregar_snapshot()
+    if snapshot is None or time.time() - snapshot["atualizado_em"] > IDADE_MAXIMA_SNAPSHOT:
+        _atualizar_em_segundo_plano()
+    return snapshot
+
+
 def buscar_estados() -> List[Dict]:
     """Retorna lista de todos os estados brasileiros"""
-    try:
-        url = "https://servicodados.ibge.gov.br/api/v1/localidades/estados"
-        response = requests.get(url, timeout=10)
-        estados = response.json()
-        
-        # Ordena por sigla
-        estados_ordenados = sorted(estados, key=lambda x: x['sigla'])
-        
-        return [
-            {
-                'id': estado['id'],
-                'sigla': estado['sigla'],
-                'nome': estado['nome']
-            }
-            for estado in estados_ordenados
-        ]
-    except Exception as e:
-        st.error(f"Erro ao buscar estados: {e}")
-        return []
+    return [{'id': codigo, 'sigla': sigla, 'nome': nome} for codigo, sigla, nome in sorted(ESTADOS_IBGE, key=lambda e: e[1])]
 
 
 @st.cache_data(ttl=86400)
+def _buscar_cidades_na_api(uf: str) -> List[str]:
+    """Nomes das cidades da UF, ordenados; erros sobem sem ficar no cache"""
+    from cliente_http import requisitar
+
+    response = requisitar("ibge", "GET", URL_MUNICIPIOS_UF.format(uf=uf))
+    response.raise_for_status()
+    return sorted([m['nome'] for m in response.json()])
+
+
 def buscar_cidades_por_estado(uf: str) -> List[str]:
-    """Retorna lista de cidades de um estado específico"""
+    """Retorna lista de cidades de um estado específico, do snapshot local quando disponível"""
+    snapshot = _snapshot_atual()
+    if snapshot is not None and uf in snapshot["por_uf"]:
+        return snapshot["por_uf"][uf]
     try:
-        url = f"https://servicodados.ibge.gov.br/api/v1/localidades/estados/{uf}/municipios"
-        response = requests.get(url, timeout=10)
-        municipios = response.json()
-        
-        # Retorna apenas os nomes, ordenados
-        cidades = sorted([m['nome'] for m in municipios])
-        return cidades
+        return _buscar_cidades_na_api(uf)
     except Exception as e:
+        # Fora do cache: o próximo rerun tenta de novo
         st.error(f"Erro ao buscar cidades: {e}")
         return []
 
 
-@st.cache_data(ttl=86400)
 def buscar_todas_cidades() -> List[Dict]:
     """Retorna todas as cidades do Brasil com suas UFs"""
+    snapshot = _snapshot_atual()
+    if snapshot is not None:
+        return snapshot["municipios"]
     try:
-        url = "https://servicodados.ibge.gov.br/api/v1/localidades/municipios"
-        response = requests.get(url, timeout=15)
-        municipios = response.json()
-        
-        return [
-            {
-                'nome': m['nome'],
-                'uf': m['microrregiao']['mesorregiao']['UF']['sigla']
-            }
-            for m in municipios
-        ]
+        return _baixar_municipios()
     except Exception as e:
         st.error(f"Erro ao buscar todas as cidades: {e}")
         return []
+
+
+if __name__ == "__main__":
+    total = gerar_snapshot()
+    print(f"{total} municípios gravados em {ARQUIVO_SNAPSHOT}")
@@ -0,0 +1,149 @@
+"""
+Identidade estável dos leads e índice de entidades entre buscas
+A identidade parte do tipo+id do OSM; nome, telefone e proximidade unem o node e o way do mesmo lugar
+"""
+
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from cache_local import conectar
+from texto import normalizar_texto
+
+METROS_POR_GRAU = 111320  # Um grau de latitude
+DISTANCIA_MESMO_LUGAR = 150  # Metros entre node e way com o mesmo nome
+CAMPOS_INFORMACAO = ("site", "telefone", "email", "facebook", "instagram", "endereco")
+PALAVRAS_IGNORADAS = {"ltda", "me", "eireli", "epp", "sa", "s/a", "de", "da", "do", "das", "dos", "e"}
+
+
+def coordenadas_elemento(element: Dict) -> Optional[Tuple[float, float]]:
+    """Retorna (lat, lon) de um node ou o centro de um way/relation"""
+    if "lat" in element and "lon" in element:
+        return element["lat"], element["lon"]
+    centro = element.get("center")
+    if centro:
+        return centro["lat"], centro["lon"]
+    return None
+
+
+def id_osm(element: Dict) -> str:
+    """Identificador estável do elemento, como "node/123" ou "way/456" """
+    return f"{element.get('type', 'node')}/{element.get('id')}"
+
+
+def normalizar_nome(nome: str) -> str:
+    """Nome sem acentos, pontuação e sufixos societários"""
+    texto = "".join(c if c.isalnum() else " " for c in normalizar_texto(nome or ""))
+    return " ".join(p for p in texto.split() if p not in PALAVRAS_IGNORADAS)
+
+
+def normalizar_telefone(telefone: str) -> str:
+    """Últimos 8 dígitos, ignorando DDI, DDD e o nono dígito"""
+    return "".join(c for c in telefone or "" if c.isdigit())[-8:]
+
+
+def distancia_metros(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    """Distância aproximada em metros (equiretangular), precisa o bastante para poucos km"""
+    dlat = math.radians(b[0] - a[0])
+    dlon = math.radians(b[1] - a[1]) * math.cos(math.radians((a[0] + b[0]) / 2))
+    return 6371000 * math.hypot(dlat, dlon)
+
+
+def _mesmo_negocio(a: Dict, b: Dict) -> bool:
+    if a["osm_id"] == b["osm_id"]:
+        return True
+    nome_a, nome_b = normalizar_nome(a["empresa"]), normalizar_nome(b["empresa"])
+    if not nome_a or nome_a != nome_b:
+        return False
+    tel_a, tel_b = normalizar_telefone(a["telefone"]), normalizar_telefone(b["telefone"])
+    if tel_a and tel_a == tel_b:
+        return True
+    if a.get("lat") is not None and b.get("lat") is not None:
+        return distancia_metros((a["lat"], a["lon"]), (b["lat"], b["lon"])) <= DISTANCIA_MESMO_LUGAR
+    return False
+
+
+def _informacao(lead: Dict) -> int:
+    return sum(1 for campo in CAMPOS_INFORMACAO if lead.get(campo))
+
+
+def deduplicar_leads(leads: List[Dict]) -> List[Dict]:
+    """Remove duplicados do mesmo negócio, mantendo a versão com mais dados e a ordem original"""
+    unicos: List[Dict] = []
+    por_nome: Dict[str, List[int]] = {}
+    por_osm: Dict[str, int] = {}
+    for lead in leads:
+        candidatos = por_nome.get(normalizar_nome(lead["empresa"]), [])
+        if lead["osm_id"] in por_osm:
+            candidatos = [por_osm[lead["osm_id"]]]
+        posicao = next((i for i in candidatos if _mesmo_negocio(unicos[i], lead)), None)
+        if posicao is None:
+            por_osm[lead["osm_id"]] = len(unicos)
+            por_nome.setdefault(normalizar_nome(lead["empresa"]), []).append(len(unicos))
+            unicos.append(lead)
+        elif _informacao(lead) > _informacao(unicos[posicao]):
+            por_osm[lead["osm_id"]] = posicao
+            unicos[posicao] = {**lead, "key": unicos[posicao]["key"]}
+    return unicos
+
+
+def _criar_tabela() -> None:
+    with conectar() as conexao:
+        conexao.execute("""
+            CREATE TABLE IF NOT EXISTS entidades (
+                osm_id TEXT PRIMARY KEY,
+                chave TEXT NOT NULL,
+                nome TEXT NOT NULL,
+                telefone TEXT NOT NULL,
+                cidade TEXT NOT NULL,
+                primeira_vez REAL NOT NULL,
+                ultima_vez REAL NOT NULL,
+                buscas INTEGER NOT NULL DEFAULT 1
+            )
+        """)
+        conexao.execute("CREATE INDEX IF NOT EXISTS idx_entidades_nome ON entidades (nome, cidade)")
+
+
+def registrar_entidades(leads: List[Dict]) -> List[Dict]:
+    """Associa cada lead à entidade já conhecida (mesmo OSM ou mesmo nome+telefone na cidade)
+    e marca desde quando ele aparece nas buscas; leads do mesmo lote nunca recebem a mesma chave"""
+    agora = time.time()
+    usadas = set()
+    with conectar() as conexao:
+        for lead in leads:
+            nome = normalizar_nome(lead["empresa"])
+            telefone = normalizar_telefone(lead["telefone"])
+            linha = conexao.execute(
+                "SELECT chave, primeira_vez, buscas FROM entidades WHERE osm_id = ?", (lead["osm_id"],)
+            ).fetchone()
+            if linha is None and nome and telefone:
+                linha = conexao.execute(
+                    "SELECT chave, primeira_vez, buscas FROM entidades WHERE nome = ? AND telefone = ? AND cidade = ?",
+                    (nome, telefone, lead["cidade"]),
+                ).fetchone()
+
+            if linha is None or linha[0] in usadas:
+                # Outro lead do lote já ficou com essa entidade (ex.: filiais com o mesmo telefone): entidade nova
+                chave, primeira_vez, buscas = lead["key"], agora, 0
+                sufixo = 1
+                while chave in usadas:
+                    sufixo += 1
+                    chave = f"{lead['key']}#{sufixo}"
+            else:
+                chave, primeira_vez, buscas = linha
+            usadas.add(chave)
+            lead["key"] = chave
+            lead["visto_em"] = primeira_vez if buscas else None
+
+            conexao.execute(
+                """
+                INSERT INTO entidades (osm_id, chave, nome, telefone, cidade, primeira_vez, ultima_vez, buscas)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 1)
+                ON CONFLICT (osm_id) DO UPDATE SET ultima_vez = excluded.ultima_vez, buscas = buscas + 1
+                """,
+                (lead["osm_id"], chave, nome, telefone, lead["cidade"], primeira_vez, agora),
+            )
+    return leads
+
+
+_criar_tabela()
@@ -0,0 +1,166 @@
+"""
+Instrumentação das buscas: duração, bytes e resultado de cada etapa, por host de origem
+Os spans ficam em memória (os mais recentes do processo), resumidos no painel de diagnóstico
+e exportáveis em JSONL ou no formato texto do Prometheus
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Iterator, List, Optional
+
+MAX_SPANS = 10000
+# Se definido, cada span também é anexado a esse arquivo JSONL assim que termina
+ARQUIVO_JSONL = os.environ.get("PROSPECTOR_METRICAS_JSONL")
+
+OK = "ok"
+ERRO = "erro"
+
+
+class Span:
+    """Medição de uma execução de etapa; bytes, resultado e detalhe podem ser preenchidos dentro do bloco"""
+
+    __slots__ = ("etapa", "host", "inicio", "duracao_ms", "bytes", "resultado", "detalhe")
+
+    def __init__(self, etapa: str, host: str = ""):
+        self.etapa = etapa
+        self.host = host
+        self.inicio = time.time()
+        self.duracao_ms = 0.0
+        self.bytes = 0
+        self.resultado = OK
+        self.detalhe = ""
+
+    def falhar(self, detalhe: str) -> None:
+        self.resultado = ERRO
+        self.detalhe = detalhe
+
+    def como_dict(self) -> Dict:
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+
+_spans: deque = deque(maxlen=MAX_SPANS)
+_trava = threading.Lock()
+
+
+def registrar(span: Span) -> None:
+    with _trava:
+        _spans.append(span)
+        if ARQUIVO_JSONL:
+            with open(ARQUIVO_JSONL, "a", encoding="utf-8") as arquivo:
+                arquivo.write(json.dumps(span.como_dict(), ensure_ascii=False) + "\n")
+
+
+@contextmanager
+def medir(etapa: str, host: str = "") -> Iterator[Span]:
+    """Mede o bloco; uma exceção marca o span como erro e segue adiante"""
+    span = Span(etapa, host)
+    inicio = time.perf_counter()
+    try:
+        yield span
+    except Exception as e:
+        span.falhar(type(e).__name__)
+        raise
+    finally:
+        span.duracao_ms = (time.perf_counter() - inicio) * 1000
+        registrar(span)
+
+
+def medido(etapa: str):
+    """Decorador equivalente a `with medir(etapa)` em volta da função"""
+    def decorador(funcao):
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with medir(etapa):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+def listar_spans(desde: Optional[float] = None) -> List[Dict]:
+    """Spans guardados, opcionalmente só os iniciados a partir de `desde` (epoch)"""
+    with _trava:
+        spans = list(_spans)
+    return [span.como_dict() for span in spans if desde is None or span.inicio >= desde]
+
+
+def _percentil(valores: List[float], fracao: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))]
+
+
+def resumir(desde: Optional[float] = None) -> List[Dict]:
+    """Agrega os spans por (etapa, host): chamadas, erros, tempos e bytes, do mais demorado ao mais rápido"""
+    grupos: Dict[tuple, List[Dict]] = {}
+    for span in listar_spans(desde):
+        grupos.setdefault((span["etapa"], span["host"]), []).append(span)
+
+    resumo = []
+    for (etapa, host), spans in grupos.items():
+        duracoes = [span["duracao_ms"] for span in spans]
+        erros = [span["detalhe"] for span in spans if span["resultado"] == ERRO]
+        resumo.append({
+            "etapa": etapa,
+            "host": host,
+            "chamadas": len(spans),
+            "erros": len(erros),
+            "total_ms": round(sum(duracoes)),
+            "media_ms": round(sum(duracoes) / len(duracoes)),
+            "p95_ms": round(_percentil(duracoes, 0.95)),
+            "max_ms": round(max(duracoes)),
+            "bytes": sum(span["bytes"] for span in spans),
+            "ultimo_erro": erros[-1] if erros else "",
+        })
+    return sorted(resumo, key=lambda linha: linha["total_ms"], reverse=True)
+
+
+def limpar() -> None:
+    """Descarta os spans guardados em memória"""
+    with _trava:
+        _spans.clear()
+
+
+def gravar_jsonl(caminho: str, desde: Optional[float] = None) -> int:
+    """Grava os spans em JSONL (um por linha); retorna quantos foram gravados"""
+    spans = listar_spans(desde)
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        for span in spans:
+            arquivo.write(json.dumps(span, ensure_ascii=False) + "\n")
+    return len(spans)
+
+
+def _rotulos(**rotulos) -> str:
+    return ",".join(f'{nome}="{str(valor).replace(chr(34), chr(39))}"' for nome, valor in rotulos.items())
+
+
+def texto_prometheus(desde: Optional[float] = None) -> str:
+    """Resumo no formato de exposição texto do Prometheus"""
+    resumo = resumir(desde)
+    linhas = []
+    metricas = [
+        ("prospector_etapa_chamadas_total", "counter", "Execuções da etapa", lambda r: r["chamadas"]),
+        ("prospector_etapa_erros_total", "counter", "Execuções da etapa que falharam", lambda r: r["erros"]),
+        ("prospector_etapa_duracao_segundos_total", "counter", "Tempo gasto na etapa", lambda r: r["total_ms"] / 1000),
+        ("prospector_etapa_duracao_p95_segundos", "gauge", "Percentil 95 da duração", lambda r: r["p95_ms"] / 1000),
+        ("prospector_etapa_bytes_total", "counter", "Bytes recebidos na etapa", lambda r: r["bytes"]),
+    ]
+    for nome, tipo, ajuda, valor in metricas:
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        for linha in resumo:
+            linhas.append(f"{nome}{{{_rotulos(etapa=linha['etapa'], host=linha['host'])}}} {valor(linha)}")
+    return "\n".join(linhas) + "\n"
+
+
+def gravar_prometheus(caminho: str, desde: Optional[float] = None) -> None:
+    """Grava o resumo em um arquivo texto do Prometheus (lido pelo textfile collector do node_exporter)"""
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        arquivo.write(texto_prometheus(desde))
+    os.replace(temporario, caminho)
@@ -0,0 +1,141 @@
+"""
+Busca em ladrilhos para áreas grandes
+A área da cidade é coberta por uma grade global fixa; cada ladrilho vira uma query pequena, longe do timeout,
+com cache próprio (pelo texto da query) e reaproveitado entre buscas e cidades vizinhas.
+Ladrilhos que atingem o corte do servidor são subdivididos em quatro, então a cobertura é completa
+"""
+
+import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+from identidade_leads import METROS_POR_GRAU, coordenadas_elemento, distancia_metros, id_osm
+from overpass import (
+    RAIOS_ADAPTATIVOS, buscar_no_backend, consultar_overpass, montar_query_caixa, saturado, usar_osm_local,
+)
+
+Caixa = Tuple[float, float, float, float]  # (sul, oeste, norte, leste)
+
+
+class AreaGrandeDemais(Exception):
+    """A área exigiria mais ladrilhos do que MAX_LADRILHOS"""
+
+
+TAMANHO_LADRILHO = 0.1          # Graus (~11 km de lado)
+LIMITE_POR_LADRILHO = 200       # Nodes e ways por ladrilho; quem chega ao limite é subdividido
+MAX_SUBDIVISOES = 2             # Ladrilho mais fino: 1/16 do lado (~700 m)
+MAX_LADRILHOS_SIMULTANEOS = 4   # Queries em paralelo; a cota do limitador de taxa continua valendo
+MAX_LADRILHOS = 400             # Ladrilhos por busca (~45 mil km²); acima disso a busca é recusada
+
+# Sem contorno do município, a área é o quadrado circunscrito ao maior raio adaptativo
+MEIO_LADO_PADRAO = RAIOS_ADAPTATIVOS[-1]
+# Raio do círculo que contém esse quadrado; é o raio gravado no armazém para buscas em ladrilhos
+RAIO_LADRILHADO = math.ceil(MEIO_LADO_PADRAO * math.sqrt(2))
+
+
+def caixa_ao_redor(lat: float, lon: float, meio_lado_metros: float = MEIO_LADO_PADRAO) -> Caixa:
+    """Quadrado centrado no ponto, com o meio lado em metros"""
+    delta_lat = meio_lado_metros / METROS_POR_GRAU
+    delta_lon = delta_lat / max(0.01, math.cos(math.radians(lat)))
+    return (lat - delta_lat, lon - delta_lon, lat + delta_lat, lon + delta_lon)
+
+
+def gerar_ladrilhos(caixa: Caixa, tamanho: float = TAMANHO_LADRILHO) -> List[Caixa]:
+    """Ladrilhos da grade global que cobrem a caixa; os mesmos limites para qualquer busca que os toque"""
+    sul, oeste, norte, leste = caixa
+    return [
+        (round(i * tamanho, 5), round(j * tamanho, 5), round((i + 1) * tamanho, 5), round((j + 1) * tamanho, 5))
+        for i in range(math.floor(sul / tamanho), math.ceil(norte / tamanho))
+        for j in range(math.floor(oeste / tamanho), math.ceil(leste / tamanho))
+    ]
+
+
+def subdividir(caixa: Caixa) -> List[Caixa]:
+    """Quatro quadrantes da caixa"""
+    sul, oeste, norte, leste = caixa
+    meio_lat = round((sul + norte) / 2, 6)
+    meio_lon = round((oeste + leste) / 2, 6)
+    return [
+        (sul, oeste, meio_lat, meio_lon), (sul, meio_lon, meio_lat, leste),
+        (meio_lat, oeste, norte, meio_lon), (meio_lat, meio_lon, norte, leste),
+    ]
+
+
+def buscar_ladrilho(
+    caixa: Caixa,
+    tags: List[str],
+    nivel: int = 0,
+    renovar: bool = False,
+    manter: Optional[Callable[[Caixa], bool]] = None,
+) -> List[Dict]:
+    """Elementos do ladrilho, subdividindo enquanto o corte do servidor for atingido;
+    partes recusadas por `manter` (ex.: fora do município) não são consultadas"""
+    elementos = consultar_overpass(montar_query_caixa(caixa, tags, LIMITE_POR_LADRILHO), renovar=renovar)
+    if nivel < MAX_SUBDIVISOES and saturado(elementos, LIMITE_POR_LADRILHO):
+        return [
+            element
+            for parte in subdividir(caixa) if manter is None or manter(parte)
+            for element in buscar_ladrilho(parte, tags, nivel + 1, renovar, manter)
+        ]
+    return elementos
+
+
+def _dentro(posicao: Optional[Tuple[float, float]], caixa: Caixa) -> bool:
+    sul, oeste, norte, leste = caixa
+    return posicao is not None and sul <= posicao[0] <= norte and oeste <= posicao[1] <= leste
+
+
+def raio_envolvente(centro: Tuple[float, float], caixa: Caixa) -> int:
+    """Menor raio ao redor do centro que contém a caixa inteira"""
+    sul, oeste, norte, leste = caixa
+    cantos = [(sul, oeste), (sul, leste), (norte, oeste), (norte, leste)]
+    return math.ceil(max(distancia_metros(centro, canto) for canto in cantos))
+
+
+def buscar_em_ladrilhos(
+    centro: Tuple[float, float],
+    tags: List[str],
+    caixa: Optional[Caixa] = None,
+    max_simultaneos: int = MAX_LADRILHOS_SIMULTANEOS,
+    renovar: bool = False,
+    manter: Optional[Callable[[Caixa], bool]] = None,
+    ao_progredir: Optional[Callable[[int, int], None]] = None,
+) -> List[Dict]:
+    """Todos os elementos das tags dentro da caixa (padrão: quadrado ao redor do centro),
+    sem repetições e do mais próximo ao mais distante do centro; `renovar` ignora os ladrilhos em cache.
+    Só são consultados os ladrilhos aceitos por `manter`; `ao_progredir(concluidos, total)` é chamado
+    a cada ladrilho e pode interromper a busca levantando uma exceção (os ladrilhos pendentes são cancelados)"""
+    caixa = caixa or caixa_ao_redor(*centro)
+
+    if usar_osm_local():
+        # O extrato local não tem timeout nem corte: uma única busca pelo círculo que contém a caixa
+        elementos = buscar_no_backend(centro[0], centro[1], raio_envolvente(centro, caixa), tags, limite=1_000_000)
+    else:
+        ladrilhos = [ladrilho for ladrilho in gerar_ladrilhos(caixa) if manter is None or manter(ladrilho)]
+        if len(ladrilhos) > MAX_LADRILHOS:
+            raise AreaGrandeDemais(
+                f"A área exigiria {len(ladrilhos)} ladrilhos (máximo {MAX_LADRILHOS}); "
+                "desmarque a cobertura completa para buscar ao redor do centro"
+            )
+        with ThreadPoolExecutor(max_workers=max(1, min(max_simultaneos, len(ladrilhos)))) as executor:
+            futuros = [
+                executor.submit(buscar_ladrilho, ladrilho, tags, 0, renovar, manter) for ladrilho in ladrilhos
+            ]
+            try:
+                for concluidos, futuro in enumerate(as_completed(futuros), 1):
+                    futuro.result()
+                    if ao_progredir:
+                        ao_progredir(concluidos, len(ladrilhos))
+            except BaseException:
+                for futuro in futuros:
+                    futuro.cancel()
+                raise
+            elementos = [element for futuro in futuros for element in futuro.result()]
+
+    # Ways que cruzam a borda aparecem em mais de um ladrilho
+    unicos: Dict[str, Dict] = {}
+    for element in elementos:
+        unicos.setdefault(id_osm(element), element)
+
+    dentro = [element for element in unicos.values() if _dentro(coordenadas_elemento(element), caixa)]
+    return sorted(dentro, key=lambda element: distancia_metros(centro, coordenadas_elemento(element)))
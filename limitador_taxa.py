@@ -0,0 +1,126 @@
+"""
+Limitador de taxa por serviço externo (token bucket)
+Compartilhado por todas as sessões e threads do processo, com respeito a Retry-After e 429
+"""
+
+import email.utils
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import requests
+
+from disjuntor import ABERTO, Disjuntor
+
+# Serviço: (requisições por segundo, rajada máxima)
+LIMITES_PADRAO = {
+    "nominatim": (1.0, 1),
+    "overpass": (0.5, 2),
+}
+
+STATUS_SOBRECARGA = {429, 503, 504}
+MAX_TENTATIVAS = 3
+BACKOFF_INICIAL = 2.0   # Segundos
+BACKOFF_MAXIMO = 60.0
+
+
+class BaldeTokens:
+    """Token bucket thread-safe: só espera quando a cota está de fato esgotada"""
+
+    def __init__(self, taxa: float, capacidade: int):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self._tokens = float(capacidade)
+        self._atualizado_em = time.monotonic()
+        self._bloqueado_ate = 0.0
+        self._trava = threading.Lock()
+
+    def _repor(self, agora: float) -> None:
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._atualizado_em) * self.taxa)
+        self._atualizado_em = agora
+
+    def adquirir(self) -> float:
+        """Consome um token, esperando o necessário; retorna quantos segundos esperou"""
+        esperado = 0.0
+        while True:
+            with self._trava:
+                agora = time.monotonic()
+                self._repor(agora)
+                espera = self._bloqueado_ate - agora
+                if espera <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return esperado
+                    espera = (1 - self._tokens) / self.taxa
+            time.sleep(espera)
+            esperado += espera
+
+    def bloquear(self, segundos: float) -> None:
+        """Suspende o serviço para todos por alguns segundos (Retry-After ou backoff)"""
+        with self._trava:
+            agora = time.monotonic()
+            self._bloqueado_ate = max(self._bloqueado_ate, agora + segundos)
+            self._tokens = 0.0
+            self._atualizado_em = agora
+
+
+_baldes: Dict[str, BaldeTokens] = {}
+_trava_baldes = threading.Lock()
+
+
+def obter_limitador(servico: str) -> BaldeTokens:
+    """Retorna o limitador único do processo para o serviço; cada endpoint "servico:host" tem sua própria cota,
+    com os limites do serviço base"""
+    with _trava_baldes:
+        if servico not in _baldes:
+            taxa, capacidade = LIMITES_PADRAO.get(servico.split(":")[0], (1.0, 1))
+            _baldes[servico] = BaldeTokens(taxa, capacidade)
+        return _baldes[servico]
+
+
+def ler_retry_after(response: requests.Response) -> Optional[float]:
+    """Interpreta o cabeçalho Retry-After (segundos ou data HTTP)"""
+    valor = response.headers.get("Retry-After")
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        data = email.utils.parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, data.timestamp() - time.time())
+
+
+def requisitar_com_limite(
+    servico: str,
+    fazer_requisicao: Callable[[], requests.Response],
+    max_tentativas: int = MAX_TENTATIVAS,
+    disjuntor: Optional[Disjuntor] = None,
+) -> requests.Response:
+    """Executa a requisição dentro da cota do serviço, repetindo com backoff em caso de sobrecarga;
+    com um disjuntor, cada tentativa é contada nele e as retentativas param assim que ele abre"""
+    limitador = obter_limitador(servico)
+    backoff = BACKOFF_INICIAL
+    for tentativa in range(1, max_tentativas + 1):
+        if disjuntor is not None:
+            disjuntor.verificar()
+        limitador.adquirir()
+        try:
+            response = fazer_requisicao()
+        except Exception as e:
+            if disjuntor is not None:
+                disjuntor.registrar_falha(type(e).__name__)
+            raise
+        if disjuntor is not None:
+            disjuntor.registrar_resposta(response)
+        if response.status_code not in STATUS_SOBRECARGA or tentativa == max_tentativas:
+            return response
+        if disjuntor is not None and disjuntor.estado == ABERTO:
+            return response
+        espera = ler_retry_after(response)
+        limitador.bloquear(min(BACKOFF_MAXIMO, espera if espera is not None else backoff))
+        backoff = min(BACKOFF_MAXIMO, backoff * 2)
+    return response
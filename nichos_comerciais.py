@@ -3,6 +3,8 @@ Nichos comerciais baseados em categorias do Google Business
 e classificações comerciais padrão
 """
 
+from texto import normalizar_texto
+
 # Mapeamento de nichos para tags OSM
 NICHOS_COMERCIAIS = {
     "Saúde e Bem-estar": {
@@ -190,24 +192,159 @@ NICHOS_COMERCIAIS = {
 }
 
 
+# Índices montados uma vez na importação; as consultas da interface não percorrem o dicionário
+NICHOS = list(NICHOS_COMERCIAIS)
+CATEGORIAS_POR_NICHO = {nicho: dados["categorias"] for nicho, dados in NICHOS_COMERCIAIS.items()}
+TAGS_POR_NICHO = {nicho: dados["tags_osm"] for nicho, dados in NICHOS_COMERCIAIS.items()}
+TODAS_CATEGORIAS = sorted(categoria for categorias in CATEGORIAS_POR_NICHO.values() for categoria in categorias)
+
+
+# Tags OSM de cada categoria; mais estreitas que as do nicho, para buscas menores e mais certeiras
+TAGS_POR_CATEGORIA = {
+    # Saúde e Bem-estar
+    "Clínicas médicas": ["amenity=clinic", "amenity=doctors"],
+    "Consultórios odontológicos": ["amenity=dentist"],
+    "Farmácias": ["amenity=pharmacy"],
+    "Laboratórios": ["healthcare=laboratory"],
+    "Hospitais": ["amenity=hospital"],
+    "Fisioterapia": ["healthcare=physiotherapist"],
+    "Psicologia": ["healthcare=psychotherapist"],
+    "Nutrição": ["healthcare=nutrition_counselling"],
+    "Academias": ["leisure=fitness_centre", "leisure=sports_centre"],
+    "Pilates e yoga": ["sport=yoga", "sport=pilates"],
+    "Estética e spa": ["shop=beauty", "shop=massage"],
+    "Clínicas veterinárias": ["amenity=veterinary"],
+
+    # Alimentação
+    "Restaurantes": ["amenity=restaurant"],
+    "Cafeterias": ["amenity=cafe"],
+    "Lanchonetes e fast-food": ["amenity=fast_food"],
+    "Pizzarias": ["cuisine=pizza"],
+    "Padarias": ["shop=bakery"],
+    "Bares e pubs": ["amenity=bar", "amenity=pub"],
+    "Sorveterias": ["shop=ice_cream", "amenity=ice_cream"],
+    "Confeitarias": ["shop=confectionery", "shop=pastry"],
+    "Açougues": ["shop=butcher"],
+    "Hortifruti": ["shop=greengrocer"],
+    "Distribuidoras de alimentos": ["shop=wholesale"],
+
+    # Educação
+    "Escolas": ["amenity=school"],
+    "Cursos profissionalizantes": ["amenity=college"],
+    "Escolas de idiomas": ["amenity=language_school"],
+    "Cursos preparatórios": ["amenity=prep_school"],
+    "Universidades": ["amenity=university"],
+    "Escolas de música": ["amenity=music_school"],
+    "Escolas de dança": ["amenity=dancing_school", "leisure=dance"],
+    "Auto escolas": ["amenity=driving_school"],
+
+    # Serviços Profissionais
+    "Escritórios de advocacia": ["office=lawyer"],
+    "Contabilidade": ["office=accountant"],
+    "Arquitetura": ["office=architect"],
+    "Engenharia": ["office=engineer"],
+    "Imobiliárias": ["office=estate_agent"],
+    "Seguros": ["office=insurance"],
+    "Consultorias": ["office=consulting"],
+    "Marketing e publicidade": ["office=advertising_agency"],
+    "Design e criação": ["office=graphic_design", "craft=graphic_design"],
+    "TI e desenvolvimento": ["office=it"],
+
+    # Beleza e Estética
+    "Salões de beleza": ["shop=beauty", "shop=hairdresser"],
+    "Barbearias": ["hairdresser=barber", "shop=barber"],
+    "Clínicas de estética": ["shop=beauty"],
+    "Manicure e pedicure": ["beauty=nails"],
+    "Depilação": ["beauty=waxing"],
+    "Sobrancelhas": ["shop=beauty"],
+    "Clínicas de emagrecimento": ["healthcare=nutrition_counselling", "beauty=spa"],
+
+    # Varejo e Comércio
+    "Lojas de roupas": ["shop=clothes"],
+    "Calçados": ["shop=shoes"],
+    "Joias e acessórios": ["shop=jewelry"],
+    "Eletrônicos": ["shop=electronics"],
+    "Móveis e decoração": ["shop=furniture", "shop=interior_decoration"],
+    "Materiais de construção": ["shop=hardware", "shop=doityourself"],
+    "Autopeças": ["shop=car_parts"],
+    "Livrarias": ["shop=books"],
+    "Pet shops": ["shop=pet"],
+    "Lojas de presentes": ["shop=gift"],
+
+    # Automotivo
+    "Oficinas mecânicas": ["shop=car_repair"],
+    "Concessionárias": ["shop=car"],
+    "Lava-jatos": ["amenity=car_wash"],
+    "Funilaria e pintura": ["craft=car_painter", "car_repair=bodywork"],
+    "Auto elétricas": ["car_repair=electrical"],
+    "Borracharias": ["shop=tyres"],
+
+    # Entretenimento e Lazer
+    "Cinemas": ["amenity=cinema"],
+    "Teatros": ["amenity=theatre"],
+    "Eventos e festas": ["amenity=events_venue"],
+    "Parques e recreação": ["leisure=park", "leisure=playground"],
+    "Clubes": ["club", "leisure=sports_centre"],
+    "Casas de show": ["amenity=music_venue"],
+    "Boates": ["amenity=nightclub"],
+
+    # Hotelaria e Turismo
+    "Hotéis": ["tourism=hotel", "tourism=motel"],
+    "Pousadas": ["tourism=guest_house"],
+    "Hostels": ["tourism=hostel"],
+    "Agências de viagem": ["shop=travel_agency", "office=travel_agent"],
+    "Aluguel de veículos": ["amenity=car_rental"],
+    "Guias turísticos": ["office=guide"],
+
+    # Casa e Construção
+    "Móveis planejados": ["craft=cabinet_maker", "shop=furniture"],
+    "Marcenarias": ["craft=carpenter"],
+    "Serralheria": ["craft=metal_construction"],
+    "Vidraçarias": ["craft=glaziery", "shop=glaziery"],
+    "Pintores": ["craft=painter"],
+    "Eletricistas": ["craft=electrician"],
+    "Encanadores": ["craft=plumber"],
+
+    # Tecnologia
+    "Assistência técnica": ["craft=electronics_repair", "shop=mobile_phone"],
+    "Lojas de informática": ["shop=computer"],
+    "Desenvolvimento de software": ["office=it"],
+    "Consultoria em TI": ["office=it", "office=consulting"],
+    "Segurança eletrônica": ["shop=security", "office=security"],
+
+    # Finanças
+    "Bancos": ["amenity=bank"],
+    "Cooperativas de crédito": ["amenity=bank", "office=financial"],
+    "Seguradoras": ["office=insurance"],
+    "Corretoras": ["office=insurance", "office=financial"],
+    "Casas de câmbio": ["amenity=bureau_de_change"],
+}
+
+
 def obter_todos_nichos():
     """Retorna lista de todos os nichos principais"""
-    return list(NICHOS_COMERCIAIS.keys())
+    return NICHOS
 
 
 def obter_categorias_nicho(nicho):
     """Retorna categorias específicas de um nicho"""
-    return NICHOS_COMERCIAIS.get(nicho, {}).get("categorias", [])
+    return CATEGORIAS_POR_NICHO.get(nicho, [])
 
 
 def obter_tags_osm_nicho(nicho):
     """Retorna tags OSM para busca de um nicho"""
-    return NICHOS_COMERCIAIS.get(nicho, {}).get("tags_osm", [])
+    return TAGS_POR_NICHO.get(nicho, [])
 
 
 def obter_todas_categorias():
     """Retorna todas as categorias de todos os nichos"""
-    todas = []
-    for nicho_data in NICHOS_COMERCIAIS.values():
-        todas.extend(nicho_data["categorias"])
-    return sorted(todas)
+    return TODAS_CATEGORIAS
+
+
+def mapear_categoria_para_tags(categoria):
+    """Mapeia categorias específicas para tags OSM precisas (sem diferenciar acentos e caixa)"""
+    return INDICE_CATEGORIAS.get(normalizar_texto(categoria))
+
+
+# Chaves normalizadas: a busca não diferencia acentos e caixa; a cobertura é conferida nos testes
+INDICE_CATEGORIAS = {normalizar_texto(categoria): tags for categoria, tags in TAGS_POR_CATEGORIA.items()}
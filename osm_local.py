@@ -0,0 +1,230 @@
+"""
+Backend OSM local: um extrato PBF (Brasil ou um estado) importado uma vez para SQLite
+Índice espacial R-tree e índice de tags das chaves usadas em NICHOS_COMERCIAIS respondem às buscas
+por raio+tags em milissegundos, no mesmo formato de elemento do Overpass
+"""
+
+import calendar
+import json
+import math
+import os
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from cache_local import PASTA_DADOS, conectar
+from identidade_leads import METROS_POR_GRAU, distancia_metros
+from nichos_comerciais import INDICE_CATEGORIAS, TAGS_POR_NICHO
+from overpass import agrupar_tags
+
+ARQUIVO_OSM_LOCAL = os.environ.get(
+    "PROSPECTOR_OSM_LOCAL",
+    os.path.join(PASTA_DADOS, "osm_local.sqlite3"),
+)
+
+# Só entram no armazém elementos com alguma chave usada por nichos ou categorias (amenity, shop, cuisine, ...)
+CHAVES_INDEXADAS = frozenset(
+    tag.partition("=")[0]
+    for tags in [*TAGS_POR_NICHO.values(), *INDICE_CATEGORIAS.values()]
+    for tag in tags
+)
+TAMANHO_LOTE_IMPORTACAO = 5000
+
+
+def _criar_tabelas(caminho: str) -> None:
+    with conectar(caminho) as conexao:
+        conexao.execute("""
+            CREATE TABLE IF NOT EXISTS elementos_osm (
+                rowid INTEGER PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                osm_id INTEGER NOT NULL,
+                lat REAL NOT NULL,
+                lon REAL NOT NULL,
+                tags TEXT NOT NULL,
+                alterado_em REAL NOT NULL,
+                UNIQUE (tipo, osm_id)
+            )
+        """)
+        conexao.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS indice_espacial USING rtree(id, min_lat, max_lat, min_lon, max_lon)"
+        )
+        conexao.execute("""
+            CREATE TABLE IF NOT EXISTS indice_tags (
+                chave TEXT NOT NULL,
+                valor TEXT NOT NULL,
+                elemento INTEGER NOT NULL
+            )
+        """)
+        conexao.execute("CREATE INDEX IF NOT EXISTS idx_indice_tags ON indice_tags (chave, valor)")
+        conexao.execute("CREATE INDEX IF NOT EXISTS idx_indice_tags_elemento ON indice_tags (elemento)")
+
+
+def _gravar_lote(conexao, lote: List[Dict]) -> None:
+    for element in lote:
+        conexao.execute(
+            "DELETE FROM indice_tags WHERE elemento = "
+            "(SELECT rowid FROM elementos_osm WHERE tipo = ? AND osm_id = ?)",
+            (element["tipo"], element["osm_id"]),
+        )
+        conexao.execute(
+            "INSERT INTO elementos_osm (tipo, osm_id, lat, lon, tags, alterado_em) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (tipo, osm_id) DO UPDATE SET lat = excluded.lat, lon = excluded.lon, "
+            "tags = excluded.tags, alterado_em = excluded.alterado_em",
+            (element["tipo"], element["osm_id"], element["lat"], element["lon"],
+             json.dumps(element["tags"], ensure_ascii=False), element["alterado_em"]),
+        )
+        rowid = conexao.execute(
+            "SELECT rowid FROM elementos_osm WHERE tipo = ? AND osm_id = ?", (element["tipo"], element["osm_id"])
+        ).fetchone()[0]
+        conexao.execute(
+            "INSERT OR REPLACE INTO indice_espacial VALUES (?, ?, ?, ?, ?)",
+            (rowid, element["lat"], element["lat"], element["lon"], element["lon"]),
+        )
+        conexao.executemany(
+            "INSERT INTO indice_tags (chave, valor, elemento) VALUES (?, ?, ?)",
+            [(chave, valor, rowid) for chave, valor in element["tags"].items() if chave in CHAVES_INDEXADAS],
+        )
+
+
+def importar_elementos(elementos: Iterable[Dict], caminho: str = ARQUIVO_OSM_LOCAL) -> int:
+    """Grava elementos já no formato do Overpass (node com lat/lon, way com center); retorna quantos entraram"""
+    _criar_tabelas(caminho)
+    total = 0
+    lote: List[Dict] = []
+    with conectar(caminho) as conexao:
+        for element in elementos:
+            tags = element.get("tags", {})
+            posicao = (element.get("lat"), element.get("lon")) if "lat" in element else (
+                element.get("center", {}).get("lat"), element.get("center", {}).get("lon")
+            )
+            if posicao[0] is None or not CHAVES_INDEXADAS.intersection(tags):
+                continue
+            lote.append({
+                "tipo": element.get("type", "node"),
+                "osm_id": element["id"],
+                "lat": posicao[0],
+                "lon": posicao[1],
+                "tags": tags,
+                "alterado_em": element.get("alterado_em", 0.0),
+            })
+            if len(lote) >= TAMANHO_LOTE_IMPORTACAO:
+                _gravar_lote(conexao, lote)
+                total += len(lote)
+                lote = []
+        _gravar_lote(conexao, lote)
+    return total + len(lote)
+
+
+def _ler_pbf(arquivo_pbf: str) -> Iterator[Dict]:
+    """Percorre o extrato em fluxo; ways saem, como no Overpass, com o centro médio dos seus nodes"""
+    try:
+        import osmium
+    except ImportError as e:
+        raise ImportError("Importar um extrato PBF exige o pacote osmium (pip install osmium)") from e
+
+    for objeto in osmium.FileProcessor(arquivo_pbf).with_locations():
+        if not (objeto.is_node() or objeto.is_way()) or not any(tag.k in CHAVES_INDEXADAS for tag in objeto.tags):
+            continue
+        element = {
+            "type": "node" if objeto.is_node() else "way",
+            "id": objeto.id,
+            "tags": {tag.k: tag.v for tag in objeto.tags},
+            "alterado_em": objeto.timestamp.timestamp() if objeto.timestamp else 0.0,
+        }
+        if objeto.is_node():
+            if not objeto.location.valid():
+                continue
+            element.update(lat=objeto.location.lat, lon=objeto.location.lon)
+        else:
+            pontos = [(nd.lat, nd.lon) for nd in objeto.nodes if nd.location.valid()]
+            if not pontos:
+                continue
+            element["center"] = {
+                "lat": sum(p[0] for p in pontos) / len(pontos),
+                "lon": sum(p[1] for p in pontos) / len(pontos),
+            }
+        yield element
+
+
+def importar_pbf(arquivo_pbf: str, caminho: str = ARQUIVO_OSM_LOCAL) -> int:
+    """Importa (ou reimporta, atualizando) um extrato .osm.pbf; retorna quantos elementos foram gravados"""
+    return importar_elementos(_ler_pbf(arquivo_pbf), caminho)
+
+
+def disponivel(caminho: str = ARQUIVO_OSM_LOCAL) -> bool:
+    """Indica se já existe um extrato importado (o arquivo e as tabelas)"""
+    if not os.path.exists(caminho):
+        return False
+    with conectar(caminho) as conexao:
+        tabela = conexao.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'elementos_osm'"
+        ).fetchone()
+    return tabela is not None
+
+
+def _momento(desde: str) -> float:
+    return calendar.timegm(time.strptime(desde, "%Y-%m-%dT%H:%M:%SZ"))
+
+
+def buscar_no_raio(
+    lat: float,
+    lon: float,
+    raio_metros: int,
+    tags: List[str],
+    limite: int,
+    desde: Optional[str] = None,
+    caminho: str = ARQUIVO_OSM_LOCAL,
+) -> List[Dict]:
+    """Mesma busca do Overpass (união das tags dentro do raio), com até `limite` nodes e `limite` ways,
+    os mais próximos do centro primeiro"""
+    condicoes, parametros = [], []
+    for chave, valores in agrupar_tags(tags).items():
+        if valores is None:
+            condicoes.append("chave = ?")
+            parametros.append(chave)
+        else:
+            condicoes.append(f"(chave = ? AND valor IN ({','.join('?' * len(valores))}))")
+            parametros.extend([chave, *valores])
+
+    delta_lat = raio_metros / METROS_POR_GRAU
+    delta_lon = delta_lat / max(0.01, math.cos(math.radians(lat)))
+    consulta = (
+        "SELECT e.tipo, e.osm_id, e.lat, e.lon, e.tags FROM indice_espacial r "
+        "JOIN elementos_osm e ON e.rowid = r.id "
+        "WHERE r.min_lat >= ? AND r.max_lat <= ? AND r.min_lon >= ? AND r.max_lon <= ? "
+        f"AND EXISTS (SELECT 1 FROM indice_tags WHERE elemento = e.rowid AND ({' OR '.join(condicoes)}))"
+    )
+    parametros = [lat - delta_lat, lat + delta_lat, lon - delta_lon, lon + delta_lon, *parametros]
+    if desde:
+        consulta += " AND e.alterado_em > ?"
+        parametros.append(_momento(desde))
+
+    with conectar(caminho) as conexao:
+        linhas = conexao.execute(consulta, parametros).fetchall()
+
+    candidatos = sorted(
+        (distancia_metros((lat, lon), (e_lat, e_lon)), tipo, osm_id, e_lat, e_lon, tags_json)
+        for tipo, osm_id, e_lat, e_lon, tags_json in linhas
+    )
+    elementos: List[Dict] = []
+    por_tipo: Dict[str, int] = {}
+    for distancia, tipo, osm_id, e_lat, e_lon, tags_json in candidatos:
+        if distancia > raio_metros:
+            break
+        grupo = "node" if tipo == "node" else "wr"
+        if por_tipo.get(grupo, 0) >= limite:
+            continue
+        por_tipo[grupo] = por_tipo.get(grupo, 0) + 1
+        element = {"type": tipo, "id": osm_id, "tags": json.loads(tags_json)}
+        if tipo == "node":
+            element.update(lat=e_lat, lon=e_lon)
+        else:
+            element["center"] = {"lat": e_lat, "lon": e_lon}
+        elementos.append(element)
+    return elementos
+
+
+if __name__ == "__main__":
+    import sys
+
+    for arquivo in sys.argv[1:]:
+        print(f"{importar_pbf(arquivo)} elementos de {arquivo} gravados em {ARQUIVO_OSM_LOCAL}")
@@ -0,0 +1,234 @@
+"""
+Consulta à Overpass API com cache persistente das respostas
+A chave do cache é o hash do texto da query; o corte no servidor é fixo, então max_leads só recorta a resposta
+Com PROSPECTOR_BACKEND_OSM=local as mesmas buscas são respondidas pelo extrato importado em osm_local (se houver)
+Cada endpoint tem seu disjuntor: um servidor fora do ar é pulado na hora e o próximo espelho é tentado
+"""
+
+import hashlib
+import os
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from cache_local import CachePersistente
+from cliente_http import requisitar
+from disjuntor import ServicoIndisponivel, obter_disjuntor, resposta_com_falha
+from identidade_leads import id_osm
+from instrumentacao import medir
+from limitador_taxa import requisitar_com_limite
+
+URL_OVERPASS = os.environ.get("PROSPECTOR_URL_OVERPASS", "https://overpass-api.de/api/interpreter")
+ESPELHOS_OVERPASS_PADRAO = "https://overpass.kumi.systems/api/interpreter,https://overpass.private.coffee/api/interpreter"
+# Espelhos tentados em ordem quando o principal falha; com uma URL própria (ex.: benchmarks) não há espelhos padrão
+ESPELHOS_OVERPASS = [
+    url for url in os.environ.get(
+        "PROSPECTOR_ESPELHOS_OVERPASS",
+        "" if "PROSPECTOR_URL_OVERPASS" in os.environ else ESPELHOS_OVERPASS_PADRAO,
+    ).split(",") if url.strip()
+]
+URLS_OVERPASS = [URL_OVERPASS] + [url.strip() for url in ESPELHOS_OVERPASS if url.strip() != URL_OVERPASS]
+BACKEND_OSM = os.environ.get("PROSPECTOR_BACKEND_OSM", "overpass")  # "overpass" ou "local"
+TTL_OVERPASS = 3 * 86400          # Respostas valem 3 dias
+TTL_OVERPASS_VAZIO = 6 * 3600     # Buscas sem resultado são refeitas antes
+
+# O corte no servidor não depende de max_leads (até esse valor), assim a mesma resposta em cache serve a todos
+LIMITE_ELEMENTOS_SERVIDOR = 50
+FATOR_LIMITE_FILTRADO = 4  # Buscas filtradas depois (ex.: pelo contorno do município) pedem um corte maior
+# Corte das buscas incrementais; se for atingido, a atualização é descartada e a área é minerada de novo
+LIMITE_ALTERACOES = 2000
+RAIOS_ADAPTATIVOS = (3000, 8000, 20000)  # Metros; o raio cresce até atingir max_leads
+# Maior raio de uma busca única, mesmo para cobrir um município grande: acima disso a query arrisca o timeout
+# (e abre o disjuntor do Overpass para todos); a cobertura completa de municípios maiores é a busca em ladrilhos
+RAIO_MAXIMO_ADAPTATIVO = 50000
+
+cache_overpass = CachePersistente(
+    "overpass",
+    ttl=TTL_OVERPASS,
+    ttl_negativo=TTL_OVERPASS_VAZIO,
+    max_entradas=2000,
+    comprimir=True,
+)
+
+
+def agrupar_tags(tags: List[str]) -> Dict[str, Optional[List[str]]]:
+    """Agrupa "chave=valor" por chave; None significa qualquer valor da chave"""
+    grupos: Dict[str, Optional[List[str]]] = {}
+    for tag in tags:
+        key, _, value = tag.partition("=")
+        if not value or key in grupos and grupos[key] is None:
+            grupos[key] = None
+        elif value not in grupos.setdefault(key, []):
+            grupos[key].append(value)
+    return grupos
+
+
+def montar_query_overpass(
+    lat: float,
+    lon: float,
+    raio_metros: int,
+    tags: List[str],
+    limite: int = LIMITE_ELEMENTOS_SERVIDOR,
+    desde: Optional[str] = None,
+) -> str:
+    """Monta uma query Overpass com um único nwr por chave (valores unidos em regex) e corte no servidor;
+    com `desde`, traz apenas elementos alterados depois dessa data"""
+    return _montar_query(f"(around:{raio_metros},{lat},{lon})", tags, limite, desde)
+
+
+def montar_query_caixa(
+    caixa: Tuple[float, float, float, float], tags: List[str], limite: int, desde: Optional[str] = None
+) -> str:
+    """Mesma query de montar_query_overpass, restrita à caixa (sul, oeste, norte, leste)"""
+    return _montar_query("({:.5f},{:.5f},{:.5f},{:.5f})".format(*caixa), tags, limite, desde)
+
+
+def _montar_query(local: str, tags: List[str], limite: int, desde: Optional[str]) -> str:
+    alterados = f'(newer:"{desde}")' if desde else ""
+    filtros = ""
+    for key, values in agrupar_tags(tags).items():
+        if values is None:
+            filtro = f'["{key}"]'
+        elif len(values) == 1:
+            filtro = f'["{key}"="{values[0]}"]'
+        else:
+            filtro = f'["{key}"~"^({"|".join(re.escape(v) for v in values)})$"]'
+        filtros += f"nwr{filtro}{alterados}{local};"
+
+    # Nodes saem só com coordenadas e tags; ways/relations sem a lista de nodes, apenas o centro
+    return (
+        f"[out:json][timeout:30];({filtros})->.r;"
+        f"node.r;out qt {limite};"
+        f"wr.r;out tags center qt {limite};"
+    )
+
+
+def chave_query(query: str) -> str:
+    """Impressão digital da query usada como chave do cache"""
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def enviar_query(query: str):
+    """POST da query no primeiro endpoint saudável; ServicoIndisponivel se todos falharem"""
+    falhas = []
+    for url in URLS_OVERPASS:
+        host = urlparse(url).hostname
+        servico = f"overpass:{host}"
+        try:
+            with medir("overpass", host) as span:
+                response = requisitar_com_limite(
+                    servico,
+                    lambda: requisitar("overpass", "POST", url, data={"data": query}),
+                    disjuntor=obter_disjuntor(servico),
+                )
+                span.bytes = len(response.content)
+                if resposta_com_falha(response):
+                    span.falhar(f"HTTP {response.status_code}")
+        except ServicoIndisponivel as e:
+            falhas.append(f"{host}: {e.motivo}")
+            continue
+        except Exception as e:
+            falhas.append(f"{host}: {type(e).__name__}")
+            continue
+        if resposta_com_falha(response):
+            falhas.append(f"{host}: HTTP {response.status_code}")
+            continue
+        # 4xx é erro da própria query: os espelhos responderiam o mesmo
+        response.raise_for_status()
+        return response
+    raise ServicoIndisponivel("overpass", "; ".join(falhas))
+
+
+def consultar_overpass(query: str, usar_cache: bool = True, renovar: bool = False) -> List[Dict]:
+    """Retorna os elementos da query, do cache quando possível (usar_cache=False nem lê nem grava;
+    renovar=True não lê, mas grava a resposta nova)"""
+    chave = chave_query(query)
+    if usar_cache and not renovar:
+        elementos = cache_overpass.obter(chave)
+        if elementos is not None:
+            return elementos
+
+    response = enviar_query(query)
+    with medir("overpass_json"):
+        elementos = response.json().get("elements", [])
+
+    if usar_cache:
+        cache_overpass.salvar(chave, elementos, negativo=not elementos)
+    return elementos
+
+
+def usar_osm_local() -> bool:
+    """Backend local configurado e com extrato importado; sem o extrato as buscas continuam no Overpass"""
+    if BACKEND_OSM != "local":
+        return False
+    from osm_local import disponivel
+
+    return disponivel()
+
+
+def buscar_no_backend(
+    lat: float, lon: float, raio: int, tags: List[str], limite: int, desde: Optional[str] = None,
+    renovar: bool = False,
+) -> List[Dict]:
+    """Executa a busca por raio+tags no backend configurado; o formato dos elementos é o mesmo"""
+    if usar_osm_local():
+        from osm_local import buscar_no_raio
+
+        with medir("osm_local"):
+            return buscar_no_raio(lat, lon, raio, tags, limite, desde)
+    # Buscas incrementais (desde) mudam a cada execução; não vale guardá-las
+    return consultar_overpass(
+        montar_query_overpass(lat, lon, raio, tags, limite, desde), usar_cache=desde is None, renovar=renovar
+    )
+
+
+def saturado(elementos: List[Dict], limite: int) -> bool:
+    """O servidor corta nodes e ways separadamente; qualquer um no limite indica que faltou algo"""
+    nodes = sum(1 for element in elementos if element.get("type") == "node")
+    return nodes >= limite or len(elementos) - nodes >= limite
+
+
+def buscar_com_raio_adaptativo(
+    lat: float,
+    lon: float,
+    tags: List[str],
+    minimo: int,
+    raios: Sequence[int] = RAIOS_ADAPTATIVOS,
+    filtrar: Optional[Callable[[List[Dict]], List[Dict]]] = None,
+    renovar: bool = False,
+) -> Tuple[List[Dict], int]:
+    """Começa com um raio pequeno e só amplia enquanto houver menos de `minimo` elementos
+    (contados depois de `filtrar`, se informado); retorna (elementos, raio usado).
+    Os elementos de todos os raios consultados são somados, do raio menor para o maior;
+    se um raio maior falhar, ficam os elementos já encontrados (a falha só sobe se nenhum raio respondeu)"""
+    import requests
+
+    limite = max(minimo, LIMITE_ELEMENTOS_SERVIDOR)
+    if filtrar is not None:
+        # O corte vale antes do filtro: parte da resposta pode cair fora da área e ser descartada
+        limite *= FATOR_LIMITE_FILTRADO
+    encontrados: Dict[str, Dict] = {}
+    raio_usado = None
+    for raio in raios:
+        try:
+            elementos = buscar_no_backend(lat, lon, raio, tags, limite, renovar=renovar)
+        except (ServicoIndisponivel, requests.RequestException, ValueError):
+            if raio_usado is None:
+                raise
+            # O raio gravado é o último que respondeu: a próxima busca tenta ampliar de novo
+            break
+        raio_usado = raio
+        if filtrar is not None:
+            elementos = filtrar(elementos)
+        for element in elementos:
+            encontrados.setdefault(id_osm(element), element)
+        if len(encontrados) >= minimo:
+            break
+    return list(encontrados.values()), raio_usado
+
+
+def buscar_alteracoes(lat: float, lon: float, raio: int, tags: List[str], desde: str) -> Optional[List[Dict]]:
+    """Elementos criados ou alterados no OSM desde a data informada (sem cache);
+    None se o corte foi atingido, isto é, mudou coisa demais e a área precisa ser minerada de novo"""
+    elementos = buscar_no_backend(lat, lon, raio, tags, LIMITE_ALTERACOES, desde)
+    return None if saturado(elementos, LIMITE_ALTERACOES) else elementos
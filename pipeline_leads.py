@@ -0,0 +1,191 @@
+"""
+Pipeline de leads em etapas: geocodificação → Overpass → montagem → auditoria → pontuação
+Os leads são entregues um a um, assim que a auditoria de cada site termina
+"""
+
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from armazem_leads import carregar_particao, data_overpass, mesclar_elementos, salvar_leads, salvar_particao
+from auditoria_sites import PRAZO_TOTAL_AUDITORIA, auditar_sites
+from contornos_municipios import obter_contorno
+from geocodificacao import geocodificar_cidade
+from identidade_leads import coordenadas_elemento, deduplicar_leads, id_osm, registrar_entidades
+from instrumentacao import medir
+from ladrilhos import RAIO_LADRILHADO, buscar_em_ladrilhos, raio_envolvente
+from nichos_comerciais import mapear_categoria_para_tags, obter_tags_osm_nicho
+from overpass import RAIOS_ADAPTATIVOS, buscar_alteracoes, buscar_com_raio_adaptativo
+from pontuacao import COLUNAS_AUDITORIA, calcular_prioridade_score
+
+
+class CidadeNaoLocalizada(Exception):
+    """O município não pôde ser geocodificado"""
+
+
+def resolver_tags(nicho: str, categoria: str) -> List[str]:
+    """Escolhe as tags OSM da busca: categoria específica primeiro, depois o nicho"""
+    # Tenta mapear categoria específica primeiro
+    if categoria != "Todas":
+        tags = mapear_categoria_para_tags(categoria)
+        if not tags:
+            # Se não encontrou mapeamento, usa tags do nicho
+            tags = obter_tags_osm_nicho(nicho)
+    else:
+        tags = obter_tags_osm_nicho(nicho)
+
+    if not tags:
+        tags = ["shop"]
+    return tags
+
+
+def buscar_elementos(
+    cidade: str, estado: str, nicho: str, categoria: str, max_leads: int, atualizar: bool = False,
+    ladrilhos: bool = False, ao_progredir: Optional[Callable[[int, int], None]] = None,
+) -> Tuple[Tuple[float, float], List[Dict]]:
+    """Retorna (centro, elementos OSM do nicho): do armazém local quando a cidade já foi minerada,
+    com atualização incremental sob demanda, ou geocodificando e consultando o Overpass;
+    com `ladrilhos`, cobre a área inteira em ladrilhos (cacheados um a um), do mais próximo ao mais distante,
+    chamando `ao_progredir(concluidos, total)` a cada ladrilho.
+    Com o contorno do município disponível, só ficam os elementos dentro dele"""
+    tags = resolver_tags(nicho, categoria)
+    contorno = obter_contorno(cidade, estado)
+    filtrar = contorno.filtrar if contorno else list
+    particao = carregar_particao(estado, cidade, nicho, categoria)
+    # Em ladrilhos o armazém só serve para a atualização incremental de uma busca que já cobriu a área toda
+    usar_particao = not ladrilhos or atualizar and particao is not None and particao["raio"] >= RAIO_LADRILHADO
+    renovar = False
+    if particao is not None and particao["tags"] == tags and usar_particao:
+        lat, lon = particao["centro"]
+        # Partições gravadas antes dos contornos podem ter elementos das cidades vizinhas
+        elementos = filtrar(particao["elementos"])
+        raios = contorno.raios_adaptativos(particao["centro"]) if contorno else RAIOS_ADAPTATIVOS
+        raio_ampliavel = particao["raio"] < raios[-1]
+        if not atualizar and (len(elementos) >= max_leads or not raio_ampliavel):
+            return particao["centro"], elementos
+        if atualizar and not (len(elementos) < max_leads and raio_ampliavel):
+            # Só o que mudou no OSM desde a última busca
+            inicio = time.time()
+            novos = buscar_alteracoes(lat, lon, particao["raio"], tags, data_overpass(particao["atualizado_em"]))
+            if novos is not None:
+                elementos = mesclar_elementos(elementos, filtrar(novos))
+                salvar_particao(
+                    estado, cidade, nicho, categoria, particao["centro"], particao["raio"], tags, elementos, inicio
+                )
+                return particao["centro"], elementos
+            # Mudou coisa demais para a busca incremental: a área é minerada de novo, sem o cache das queries
+            renovar = True
+
+    coordenadas = geocodificar_cidade(cidade, estado)
+    if coordenadas is None:
+        raise CidadeNaoLocalizada(f"Não foi possível localizar {cidade}/{estado}. Confira o nome do município.")
+    lat, lon = coordenadas
+
+    inicio = time.time()
+    if ladrilhos and contorno:
+        # Ladrilhos da caixa que não tocam o município ficam de fora
+        elementos = filtrar(buscar_em_ladrilhos(
+            coordenadas, tags, caixa=contorno.caixa, renovar=renovar, manter=contorno.cruza, ao_progredir=ao_progredir
+        ))
+        raio = max(RAIO_LADRILHADO, raio_envolvente(coordenadas, contorno.caixa))
+    elif ladrilhos:
+        elementos = buscar_em_ladrilhos(coordenadas, tags, renovar=renovar, ao_progredir=ao_progredir)
+        raio = RAIO_LADRILHADO
+    elif contorno:
+        # Os raios vão até cobrir o município; o mínimo de leads conta só os de dentro dele
+        elementos, raio = buscar_com_raio_adaptativo(
+            lat, lon, tags, max_leads, contorno.raios_adaptativos(coordenadas), filtrar, renovar
+        )
+    else:
+        elementos, raio = buscar_com_raio_adaptativo(lat, lon, tags, max_leads, renovar=renovar)
+    salvar_particao(estado, cidade, nicho, categoria, coordenadas, raio, tags, elementos, inicio)
+    return coordenadas, elementos
+
+
+def montar_lead(element: Dict, i: int, cidade: str, estado: str, nicho: str, categoria: str) -> Dict:
+    """Converte um elemento OSM no dicionário de lead (ainda sem pontuação)"""
+    tags = element.get("tags", {})
+
+    nome = tags.get("name", f"Estabelecimento {i}")
+    telefone = tags.get("phone", tags.get("contact:phone", ""))
+    whatsapp = "".join([c for c in telefone if c.isdigit()])
+    website = tags.get("website", tags.get("contact:website", ""))
+
+    rua = tags.get("addr:street", "")
+    numero = tags.get("addr:housenumber", "")
+    bairro = tags.get("addr:suburb", "")
+    endereco_completo = f"{rua}, {numero}" if rua and numero else ""
+    if bairro:
+        endereco_completo += f", {bairro}"
+    endereco_completo += f" - {cidade}/{estado}"
+
+    facebook = tags.get("contact:facebook", "")
+    instagram = tags.get("contact:instagram", "")
+    email = tags.get("email", tags.get("contact:email", ""))
+    lat, lon = coordenadas_elemento(element) or (None, None)
+
+    return {
+        "id": i,
+        "key": id_osm(element),
+        "osm_id": id_osm(element),
+        "empresa": nome,
+        "nicho": nicho,
+        "categoria": tags.get("amenity", tags.get("shop", tags.get("office", categoria))),
+        "estado": estado,
+        "cidade": cidade,
+        "endereco": endereco_completo,
+        "site": website,
+        "whatsapp": whatsapp,
+        "telefone": telefone,
+        "email": email,
+        "facebook": facebook,
+        "instagram": instagram,
+        "lat": lat,
+        "lon": lon,
+    }
+
+
+def selecionar_leads(leads: List[Dict], max_leads: int) -> List[Dict]:
+    """Deduplica, recorta em max_leads, renumera e associa às entidades já vistas"""
+    leads = deduplicar_leads(leads)[:max_leads]
+    for i, lead in enumerate(leads, 1):
+        lead["id"] = i
+    return registrar_entidades(leads)
+
+
+def enriquecer_leads(leads: List[Dict], prazo_total: float = PRAZO_TOTAL_AUDITORIA) -> Iterator[Dict]:
+    """Audita os sites em paralelo e entrega cada lead pontuado assim que fica pronto"""
+    for indice, analise in auditar_sites([lead["site"] for lead in leads], prazo_total=prazo_total):
+        lead_data = leads[indice]
+        prioridade_data = calcular_prioridade_score(lead_data, analise)
+
+        # A auditoria fica no lead para permitir repontuar sem refazer a busca
+        lead_data.update({campo: analise.get(campo) for campo in COLUNAS_AUDITORIA})
+        lead_data.update({
+            "prioridade": prioridade_data["prioridade"],
+            "prioridade_nivel": prioridade_data["prioridade_nivel"],
+            "score": prioridade_data["score"],
+            "sugestoes": prioridade_data["sugestoes"],
+        })
+        yield lead_data
+
+
+def gerar_leads(
+    cidade: str, estado: str, max_leads: int, nicho: str, categoria: str, atualizar: bool = False,
+    ladrilhos: bool = False, ao_progredir: Optional[Callable[[int, int], None]] = None,
+) -> Iterator[Tuple[Dict, int, int]]:
+    """Executa o pipeline completo, entregando (lead, concluídos, total) conforme cada lead fica pronto;
+    `ao_progredir` acompanha a busca em ladrilhos, antes do primeiro lead"""
+    # O cache guarda a resposta completa; max_leads só recorta (depois de remover duplicados)
+    with medir("busca_elementos"):
+        _, elements = buscar_elementos(
+            cidade, estado, nicho, categoria, max_leads, atualizar, ladrilhos, ao_progredir
+        )
+    with medir("montagem"):
+        leads = selecionar_leads(
+            [montar_lead(element, i, cidade, estado, nicho, categoria) for i, element in enumerate(elements, 1)],
+            max_leads,
+        )
+
+    for concluidos, lead in enumerate(enriquecer_leads(leads), 1):
+        yield lead, concluidos, len(leads)
+    salvar_leads(leads, nicho, categoria)
@@ -0,0 +1,195 @@
+"""
+Pontuação de oportunidade dos leads a partir da auditoria do site e das redes sociais
+Motor vetorizado sobre o DataFrame inteiro; pesos e limites vêm de config_pontuacao.json
+"""
+
+import json
+import math
+import os
+from functools import lru_cache
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from instrumentacao import medido
+
+ARQUIVO_CONFIGURACAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config_pontuacao.json")
+
+COLUNAS_AUDITORIA = [
+    "responde", "tem_https", "tem_mobile", "wordpress", "tempo",
+    "url_final", "redirecionamentos", "dns_ms", "conexao_ms", "tls_ms", "ttfb_ms",
+    "tamanho_bytes", "tamanho_exato", "compressao", "http2",
+    "certificado_valido", "certificado_dias_restantes", "cms", "cms_versao",
+]
+
+NIVEL_BAIXA, NIVEL_MEDIA, NIVEL_ALTA = 0, 1, 2
+ROTULOS_PRIORIDADE = {NIVEL_ALTA: "🔴 Alta", NIVEL_MEDIA: "🟡 Média", NIVEL_BAIXA: "🟢 Baixa"}
+
+# Sinais na ordem em que as sugestões aparecem
+SUGESTOES_SINAIS = {
+    "sem_site": "🌐 Criação de Site",
+    "site_offline": "🔧 Site Offline",
+    "sem_https": "🔒 HTTPS",
+    "site_lento": "⚡ Performance",
+    "sem_mobile": "📱 Mobile",
+    "sem_redes_sociais": "📱 Redes Sociais",
+}
+
+
+@lru_cache(maxsize=4)
+def _ler_configuracao(caminho: str, modificado_em: float) -> Dict:
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+def carregar_configuracao(caminho: str = ARQUIVO_CONFIGURACAO) -> Dict:
+    """Lê pesos e limites; o arquivo é relido automaticamente quando muda"""
+    return _ler_configuracao(caminho, os.path.getmtime(caminho))
+
+
+def _texto_preenchido(serie: pd.Series) -> pd.Series:
+    return serie.fillna("").astype(str).str.len() > 0
+
+
+def _coluna_texto(df_leads: pd.DataFrame, coluna: str) -> pd.Series:
+    # Leads montados fora do pipeline podem não ter todas as colunas de contato
+    if coluna not in df_leads:
+        return pd.Series("", index=df_leads.index)
+    return df_leads[coluna]
+
+
+def _booleano(auditorias: pd.DataFrame, coluna: str) -> pd.Series:
+    return auditorias[coluna].astype("boolean").fillna(False).astype(bool)
+
+
+def _numero(auditorias: pd.DataFrame, coluna: str) -> pd.Series:
+    return pd.to_numeric(auditorias[coluna], errors="coerce").fillna(0)
+
+
+def calcular_sinais(df_leads: pd.DataFrame, df_auditorias: pd.DataFrame, config: Dict) -> pd.DataFrame:
+    """Uma coluna booleana por oportunidade detectada, alinhada ao índice dos leads"""
+    # Auditorias antigas podem não ter as medições detalhadas: colunas ausentes viram vazias
+    auditorias = df_auditorias.reindex(index=df_leads.index, columns=COLUNAS_AUDITORIA)
+    limites = config["limites"]
+    tem_site = _texto_preenchido(_coluna_texto(df_leads, "site"))
+    responde = _booleano(auditorias, "responde")
+    online = tem_site & responde
+    redes = _texto_preenchido(_coluna_texto(df_leads, "facebook")) | _texto_preenchido(_coluna_texto(df_leads, "instagram"))
+
+    # Lentidão real: servidor demorando a responder (TTFB) ou página pesada, além do tempo total
+    lento = (
+        (_numero(auditorias, "tempo") > limites["tempo_lento"])
+        | (_numero(auditorias, "ttfb_ms") > limites["ttfb_lento_ms"])
+        | (_numero(auditorias, "tamanho_bytes") > limites["pagina_pesada_bytes"])
+    )
+
+    return pd.DataFrame({
+        "sem_site": ~tem_site,
+        "site_offline": tem_site & ~responde,
+        "sem_https": online & ~_booleano(auditorias, "tem_https"),
+        "site_lento": online & lento,
+        "sem_mobile": online & ~_booleano(auditorias, "tem_mobile"),
+        "sem_redes_sociais": ~redes,
+    }, index=df_leads.index)[list(SUGESTOES_SINAIS)]
+
+
+def pontuar_leads(
+    df_leads: pd.DataFrame, df_auditorias: pd.DataFrame, config: Optional[Dict] = None
+) -> pd.DataFrame:
+    """Calcula score, prioridade, prioridade_nivel e sugestoes para todos os leads de uma vez"""
+    config = config or carregar_configuracao()
+    sinais = calcular_sinais(df_leads, df_auditorias, config)
+    matriz = sinais.to_numpy(dtype=np.int64)
+
+    pesos = np.array([config["pesos"].get(nome, 0) for nome in sinais.columns], dtype=np.int64)
+    bruto = matriz @ pesos
+    limites = config["limites"]
+    nivel = np.select([bruto >= limites["alta"], bruto >= limites["media"]], [NIVEL_ALTA, NIVEL_MEDIA], NIVEL_BAIXA)
+
+    # Cada combinação de sinais vira um código; as listas de sugestões são montadas uma vez por combinação
+    codigos = matriz @ (1 << np.arange(matriz.shape[1], dtype=np.int64))
+    rotulos = list(SUGESTOES_SINAIS.values())
+    listas = {
+        codigo: ([r for bit, r in enumerate(rotulos) if codigo >> bit & 1] + config["sugestoes_fixas"])[:config["max_sugestoes"]]
+        for codigo in np.unique(codigos).tolist()
+    }
+
+    return pd.DataFrame({
+        "prioridade": pd.Series(nivel, index=df_leads.index).map(ROTULOS_PRIORIDADE),
+        "prioridade_nivel": nivel,
+        "score": np.minimum(bruto, 100),
+        "sugestoes": [listas[codigo] for codigo in codigos.tolist()],
+    }, index=df_leads.index)
+
+
+def repontuar(df: pd.DataFrame, config: Optional[Dict] = None) -> pd.DataFrame:
+    """Recalcula a pontuação de leads já auditados (colunas de auditoria no próprio DataFrame)"""
+    if df.empty or not set(COLUNAS_AUDITORIA) <= set(df.columns):
+        return df
+    return df.assign(**pontuar_leads(df, df[COLUNAS_AUDITORIA], config))
+
+
+def _ausente(valor) -> bool:
+    return valor is None or isinstance(valor, float) and math.isnan(valor)
+
+
+def _preenchido(valor) -> bool:
+    return not _ausente(valor) and len(str(valor)) > 0
+
+
+def _verdadeiro(valor) -> bool:
+    return not _ausente(valor) and bool(valor)
+
+
+def _valor_numerico(valor) -> float:
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if math.isnan(numero) else numero
+
+
+def sinais_lead(lead_data: Dict, analise_site: Dict, config: Dict) -> Dict[str, bool]:
+    """Os mesmos sinais de calcular_sinais para um único lead, sem montar DataFrames"""
+    limites = config["limites"]
+    tem_site = _preenchido(lead_data.get("site"))
+    responde = _verdadeiro(analise_site.get("responde"))
+    online = tem_site and responde
+    redes = _preenchido(lead_data.get("facebook")) or _preenchido(lead_data.get("instagram"))
+    lento = (
+        _valor_numerico(analise_site.get("tempo")) > limites["tempo_lento"]
+        or _valor_numerico(analise_site.get("ttfb_ms")) > limites["ttfb_lento_ms"]
+        or _valor_numerico(analise_site.get("tamanho_bytes")) > limites["pagina_pesada_bytes"]
+    )
+    sinais = {
+        "sem_site": not tem_site,
+        "site_offline": tem_site and not responde,
+        "sem_https": online and not _verdadeiro(analise_site.get("tem_https")),
+        "site_lento": online and lento,
+        "sem_mobile": online and not _verdadeiro(analise_site.get("tem_mobile")),
+        "sem_redes_sociais": not redes,
+    }
+    return {nome: sinais[nome] for nome in SUGESTOES_SINAIS}
+
+
+@medido("pontuacao")
+def calcular_prioridade_score(lead_data, analise_site, config: Optional[Dict] = None):
+    """Pontua um único lead com as mesmas regras do motor vetorizado (caminho escalar, para o streaming)"""
+    config = config or carregar_configuracao()
+    sinais = sinais_lead(lead_data, analise_site, config)
+    bruto = sum(config["pesos"].get(nome, 0) for nome, ativo in sinais.items() if ativo)
+    limites = config["limites"]
+    if bruto >= limites["alta"]:
+        nivel = NIVEL_ALTA
+    elif bruto >= limites["media"]:
+        nivel = NIVEL_MEDIA
+    else:
+        nivel = NIVEL_BAIXA
+    sugestoes = [SUGESTOES_SINAIS[nome] for nome, ativo in sinais.items() if ativo] + config["sugestoes_fixas"]
+    return {
+        "prioridade": ROTULOS_PRIORIDADE[nivel],
+        "prioridade_nivel": nivel,
+        "score": int(min(bruto, 100)),
+        "sugestoes": sugestoes[:config["max_sugestoes"]],
+    }
@@ -0,0 +1,134 @@
+"""
+Prospecção em lote: várias cidades (ou um estado inteiro) para o mesmo nicho em uma única execução
+Geocodificação e Overpass rodam em paralelo sob os limites de taxa compartilhados
+"""
+
+import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from auditoria_sites import MAX_AUDITORIAS_SIMULTANEAS, PRAZO_TOTAL_AUDITORIA
+from armazem_leads import salvar_leads
+from identidade_leads import coordenadas_elemento, deduplicar_leads, id_osm, registrar_entidades
+from pipeline_leads import buscar_elementos, enriquecer_leads, montar_lead
+from pontuacao import NIVEL_ALTA
+
+MAX_CIDADES_SIMULTANEAS = 4
+
+
+def _distancia2(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    """Distância ao quadrado aproximada (equiretangular), suficiente para comparar centros próximos"""
+    dlat = a[0] - b[0]
+    dlon = (a[1] - b[1]) * math.cos(math.radians((a[0] + b[0]) / 2))
+    return dlat * dlat + dlon * dlon
+
+
+def prospectar_cidades(
+    cidades: List[str],
+    estado: str,
+    max_leads: int,
+    nicho: str,
+    categoria: str,
+    max_cidades_simultaneas: int = MAX_CIDADES_SIMULTANEAS,
+    atualizar: bool = False,
+    ladrilhos: bool = False,
+    ao_progredir: Optional[Callable[[str, int, int], None]] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Prospecta várias cidades e retorna (leads consolidados, estatísticas por cidade);
+    uma exceção levantada por `ao_progredir` (ex.: cancelamento) interrompe o lote inteiro"""
+    buscas_concluidas = 0
+    interrupcoes: List[Exception] = []
+
+    def progredir(etapa, concluidos, total):
+        if ao_progredir:
+            ao_progredir(etapa, concluidos, total)
+
+    def verificar_interrupcao():
+        # Repete o progresso atual: vale como ponto de cancelamento dentro das threads das cidades
+        try:
+            progredir("busca", buscas_concluidas, len(cidades))
+        except Exception as e:
+            interrupcoes.append(e)
+            raise
+
+    def buscar_cidade(cidade):
+        verificar_interrupcao()
+        return buscar_elementos(
+            cidade, estado, nicho, categoria, max_leads, atualizar, ladrilhos,
+            lambda concluidos, total: verificar_interrupcao(),
+        )
+
+    stats = {cidade: {"cidade": cidade, "encontrados": 0, "duplicados": 0, "leads": 0, "erro": ""} for cidade in cidades}
+    resultados: Dict[str, Tuple[Tuple[float, float], List[Dict]]] = {}
+
+    # 1) Geocodificação + Overpass de todas as cidades em paralelo
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_cidades_simultaneas, len(cidades))))
+    try:
+        futuros = {executor.submit(buscar_cidade, cidade): cidade for cidade in cidades}
+        for buscas_concluidas, futuro in enumerate(as_completed(futuros), 1):
+            cidade = futuros[futuro]
+            try:
+                resultados[cidade] = futuro.result()
+            except Exception as e:
+                if interrupcoes:
+                    raise interrupcoes[0]
+                stats[cidade]["erro"] = str(e)
+            progredir("busca", buscas_concluidas, len(cidades))
+    except BaseException:
+        # Cidades ainda na fila não começam; as que estão rodando param no próximo ponto de cancelamento
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    # 2) Deduplicação: raios vizinhos se sobrepõem; cada elemento fica com o centro mais próximo
+    donos: Dict[str, str] = {}
+    for cidade, (centro, elementos) in resultados.items():
+        stats[cidade]["encontrados"] = len(elementos)
+        for element in elementos:
+            chave = id_osm(element)
+            atual = donos.get(chave)
+            if atual is None:
+                donos[chave] = cidade
+                continue
+            posicao = coordenadas_elemento(element)
+            if posicao and _distancia2(posicao, centro) < _distancia2(posicao, resultados[atual][0]):
+                donos[chave] = cidade
+
+    # 3) Montagem dos leads respeitando max_leads por cidade; node e way do mesmo lugar viram um só
+    leads = []
+    for cidade in cidades:
+        if cidade not in resultados:
+            continue
+        _, elementos = resultados[cidade]
+        proprios = [
+            montar_lead(element, i, cidade, estado, nicho, categoria)
+            for i, element in enumerate(elementos, 1)
+            if donos[id_osm(element)] == cidade
+        ]
+        unicos = deduplicar_leads(proprios)
+        stats[cidade]["duplicados"] = len(elementos) - len(unicos)
+        leads.extend(unicos[:max_leads])
+
+    leads = deduplicar_leads(leads)
+    for i, lead in enumerate(leads, 1):
+        lead["id"] = i
+    registrar_entidades(leads)
+
+    # 4) Auditoria de todos os sites em um único pool, com prazo proporcional ao lote
+    rodadas = max(1, math.ceil(len(leads) / MAX_AUDITORIAS_SIMULTANEAS))
+    for concluidos, lead in enumerate(enriquecer_leads(leads, prazo_total=PRAZO_TOTAL_AUDITORIA * rodadas), 1):
+        progredir("auditoria", concluidos, len(leads))
+    salvar_leads(leads, nicho, categoria)
+
+    df = pd.DataFrame(leads)
+    for cidade, dados_cidade in stats.items():
+        if df.empty:
+            break
+        da_cidade = df[df["cidade"] == cidade]
+        dados_cidade["leads"] = len(da_cidade)
+        dados_cidade["alta_prioridade"] = int((da_cidade["prioridade_nivel"] == NIVEL_ALTA).sum())
+        dados_cidade["score_medio"] = round(float(da_cidade["score"].mean()), 1) if len(da_cidade) else 0.0
+
+    return df, pd.DataFrame(list(stats.values()))
@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# Os módulos abrem o cache SQLite na importação: os testes usam uma pasta própria, descartável
+os.environ.setdefault("PROSPECTOR_CACHE_DIR", tempfile.mkdtemp(prefix="prospector-testes-"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,55 @@
+from contornos_municipios import Contorno, _poligonos_geojson
+from overpass import RAIO_MAXIMO_ADAPTATIVO
+
+# Quadrado de 1° com um buraco no meio, mais uma ilha separada a leste (vértices em (lon, lat))
+EXTERNO = [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)]
+BURACO = [(0.4, 0.4), (0.6, 0.4), (0.6, 0.6), (0.4, 0.6)]
+ILHA = [(2.0, 0.0), (2.01, 0.0), (2.01, 0.01)]
+CONTORNO = Contorno([[EXTERNO, BURACO], [ILHA]])
+
+
+def test_caixa_envolve_todas_as_partes():
+    assert CONTORNO.caixa == (0.0, 0.0, 1.0, 2.01)
+
+
+def test_contem_respeita_buracos_e_partes_separadas():
+    assert CONTORNO.contem(0.2, 0.2)
+    assert not CONTORNO.contem(0.5, 0.5)   # No buraco
+    assert not CONTORNO.contem(0.5, 1.5)   # Entre as partes
+    assert CONTORNO.contem(0.002, 2.008)   # Na ilha
+    assert not CONTORNO.contem(-0.1, 0.5)
+
+
+def test_filtrar_mantem_so_os_de_dentro_na_ordem():
+    elementos = [
+        {"type": "node", "id": 1, "lat": 0.2, "lon": 0.2},
+        {"type": "node", "id": 2, "lat": 0.5, "lon": 0.5},
+        {"type": "way", "id": 3, "center": {"lat": 0.8, "lon": 0.9}},
+        {"type": "way", "id": 4},
+    ]
+    assert [e["id"] for e in CONTORNO.filtrar(elementos)] == [1, 3]
+
+
+def test_cruza():
+    assert CONTORNO.cruza((0.1, 0.1, 0.2, 0.2))            # Inteira dentro
+    assert CONTORNO.cruza((0.9, 0.9, 1.1, 1.1))            # Só um canto dentro
+    assert CONTORNO.cruza((-0.1, 0.45, 1.1, 0.55))         # Atravessa sem nenhum canto dentro
+    assert CONTORNO.cruza((-0.1, 1.95, 0.1, 2.05))         # A ilha inteira dentro da caixa
+    assert not CONTORNO.cruza((0.45, 0.45, 0.55, 0.55))    # Dentro do buraco
+    assert not CONTORNO.cruza((0.2, 1.2, 0.8, 1.8))        # Entre as partes
+
+
+def test_raios_adaptativos_ate_cobrir_o_municipio_com_limite():
+    pequeno = Contorno([[[(-46.7, -23.6), (-46.6, -23.6), (-46.6, -23.5), (-46.7, -23.5)]]])
+    raios = pequeno.raios_adaptativos((-23.55, -46.65))
+    assert raios == tuple(sorted(raios)) and raios[-1] < 10000
+    assert CONTORNO.raios_adaptativos((0.5, 0.5))[-1] == RAIO_MAXIMO_ADAPTATIVO
+
+
+def test_poligonos_do_geojson():
+    geojson = {"features": [
+        {"geometry": {"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [1, 1]]]}},
+        {"geometry": {"type": "MultiPolygon", "coordinates": [[[[2, 0], [3, 0], [3, 1, 0]]]]}},
+        {"geometry": None},
+    ]}
+    assert _poligonos_geojson(geojson) == [[[(0, 0), (1, 0), (1, 1)]], [[(2, 0), (3, 0), (3, 1)]]]
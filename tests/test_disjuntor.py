@@ -0,0 +1,131 @@
+import types
+
+import pytest
+
+import disjuntor
+import limitador_taxa
+from disjuntor import ABERTO, FECHADO, MEIO_ABERTO, Disjuntor, ServicoIndisponivel
+from limitador_taxa import BaldeTokens, ler_retry_after, requisitar_com_limite
+
+
+class Relogio:
+    """Substitui o módulo time: o tempo só anda quando o teste (ou um sleep) manda"""
+
+    def __init__(self):
+        self.agora = 1000.0
+        self.esperas = []
+
+    def monotonic(self):
+        return self.agora
+
+    def time(self):
+        return self.agora
+
+    def sleep(self, segundos):
+        self.esperas.append(segundos)
+        self.agora += segundos
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(disjuntor, "time", relogio)
+    monkeypatch.setattr(limitador_taxa, "time", relogio)
+    return relogio
+
+
+def _resposta(status, **cabecalhos):
+    return types.SimpleNamespace(status_code=status, headers=cabecalhos)
+
+
+def test_abre_depois_das_falhas_seguidas(relogio):
+    d = Disjuntor("teste", limite_falhas=2, tempo_aberto=60)
+    d.registrar_falha("HTTP 504")
+    assert d.estado == FECHADO
+    d.registrar_falha("HTTP 504")
+    assert d.estado == ABERTO
+    with pytest.raises(ServicoIndisponivel):
+        d.verificar()
+
+
+def test_sucesso_zera_as_falhas_seguidas(relogio):
+    d = Disjuntor("teste", limite_falhas=2)
+    d.registrar_falha("HTTP 500")
+    d.registrar_resposta(_resposta(200))
+    d.registrar_falha("HTTP 500")
+    assert d.estado == FECHADO
+    d.registrar_resposta(_resposta(404))  # Erro da requisição, não do serviço
+    assert d.falhas_seguidas == 0
+
+
+def test_meio_aberto_fecha_com_sucesso_e_dobra_a_espera_com_falha(relogio):
+    d = Disjuntor("teste", limite_falhas=1, tempo_aberto=60)
+    d.registrar_falha("timeout")
+    relogio.agora += 59
+    assert not d.permitir()
+    relogio.agora += 1
+    assert d.permitir() and d.estado == MEIO_ABERTO
+    assert not d.permitir()  # Só uma chamada de teste por vez
+
+    d.registrar_falha("timeout")
+    assert d.estado == ABERTO and d.segundos_para_teste() == 120
+    relogio.agora += 120
+    assert d.permitir()
+    d.registrar_sucesso()
+    assert d.estado == FECHADO
+
+    # Depois de fechar, a espera volta ao valor inicial
+    d.registrar_falha("timeout")
+    assert d.segundos_para_teste() == 60
+
+
+def test_espera_dobrada_tem_limite(relogio):
+    d = Disjuntor("teste", limite_falhas=1, tempo_aberto=400)
+    d.registrar_falha("x")
+    for _ in range(3):
+        relogio.agora += d.segundos_para_teste()
+        assert d.permitir()
+        d.registrar_falha("x")
+    assert d.segundos_para_teste() == disjuntor.TEMPO_ABERTO_MAXIMO
+
+
+def test_balde_libera_rajada_e_depois_espera_a_taxa(relogio):
+    balde = BaldeTokens(taxa=0.5, capacidade=2)
+    assert balde.adquirir() == 0 and balde.adquirir() == 0
+    assert balde.adquirir() == pytest.approx(2.0)
+
+
+def test_bloqueio_suspende_o_balde(relogio):
+    balde = BaldeTokens(taxa=1.0, capacidade=1)
+    balde.bloquear(30)
+    assert balde.adquirir() == pytest.approx(30.0)  # O token é reposto durante o bloqueio
+
+
+def test_retry_after_em_segundos_ou_data(relogio):
+    assert ler_retry_after(_resposta(429, **{"Retry-After": "7"})) == 7
+    assert ler_retry_after(_resposta(429, **{"Retry-After": "-3"})) == 0
+    assert ler_retry_after(_resposta(429, **{"Retry-After": "Thu, 01 Jan 1970 00:20:00 GMT"})) == pytest.approx(200)
+    assert ler_retry_after(_resposta(429, **{"Retry-After": "depois"})) is None
+    assert ler_retry_after(_resposta(429)) is None
+
+
+def test_requisitar_respeita_retry_after(relogio):
+    respostas = iter([_resposta(429, **{"Retry-After": "5"}), _resposta(200)])
+    response = requisitar_com_limite("teste_retry_after", lambda: next(respostas))
+    assert response.status_code == 200
+    assert sum(relogio.esperas) == pytest.approx(5.0)
+
+
+def test_requisitar_para_quando_o_disjuntor_abre(relogio):
+    d = Disjuntor("teste", limite_falhas=2)
+    chamadas = []
+
+    def fazer():
+        chamadas.append(1)
+        return _resposta(504)
+
+    assert requisitar_com_limite("teste_disjuntor", fazer, max_tentativas=5, disjuntor=d).status_code == 504
+    assert len(chamadas) == 2 and d.estado == ABERTO
+    with pytest.raises(ServicoIndisponivel):
+        requisitar_com_limite("teste_disjuntor", fazer, disjuntor=d)
+    assert len(chamadas) == 2
@@ -0,0 +1,9 @@
+from ibge_localidades import _uf_municipio
+
+
+def test_uf_pela_microrregiao_ou_pela_regiao_imediata():
+    antigo = {"microrregiao": {"mesorregiao": {"UF": {"sigla": "SP"}}}}
+    recente = {"microrregiao": None, "regiao-imediata": {"regiao-intermediaria": {"UF": {"sigla": "MS"}}}}
+    assert _uf_municipio(antigo) == "SP"
+    assert _uf_municipio(recente) == "MS"
+    assert _uf_municipio({"microrregiao": None}) is None
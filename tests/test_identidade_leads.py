@@ -0,0 +1,12 @@
+from identidade_leads import registrar_entidades
+
+
+def _lead(osm_id):
+    return {"osm_id": osm_id, "key": osm_id, "empresa": "Padaria Sol", "telefone": "(11) 99999-0000", "cidade": "Lote"}
+
+
+def test_mesmo_nome_e_telefone_no_lote_recebem_chaves_distintas():
+    registrar_entidades([_lead("node/101")])
+    chaves = [lead["key"] for lead in registrar_entidades([_lead("node/102"), _lead("node/103")])]
+    assert chaves[0] == "node/101"
+    assert len(set(chaves)) == 2
@@ -0,0 +1,85 @@
+import pytest
+
+import ladrilhos
+from ladrilhos import AreaGrandeDemais, buscar_em_ladrilhos, gerar_ladrilhos, subdividir
+from overpass import saturado
+
+
+def _nodes(quantidade, lat=-23.55, lon=-46.63):
+    return [{"type": "node", "id": i, "lat": lat, "lon": lon} for i in range(quantidade)]
+
+
+def test_ladrilhos_da_grade_global_cobrem_a_caixa():
+    caixa = (-23.65, -46.75, -23.45, -46.55)
+    grade = gerar_ladrilhos(caixa)
+    assert len(grade) == 9  # 3 x 3 células de 0,1°
+    assert grade[0] == (-23.7, -46.8, -23.6, -46.7)
+    # Qualquer busca que toque a mesma célula gera exatamente os mesmos limites (e a mesma chave de cache)
+    assert grade[0] in gerar_ladrilhos((-23.61, -46.71, -23.60, -46.70))
+
+
+def test_subdividir_em_quadrantes():
+    partes = subdividir((0.0, 0.0, 0.1, 0.1))
+    assert partes == [(0.0, 0.0, 0.05, 0.05), (0.0, 0.05, 0.05, 0.1), (0.05, 0.0, 0.1, 0.05), (0.05, 0.05, 0.1, 0.1)]
+
+
+def test_saturado_conta_nodes_e_ways_separadamente():
+    ways = [{"type": "way", "id": i} for i in range(3)]
+    assert not saturado(_nodes(2) + ways[:2], 3)
+    assert saturado(_nodes(3), 3)
+    assert saturado(ways, 3)
+
+
+@pytest.fixture
+def overpass_falso(monkeypatch):
+    """Ladrilhos de nível 0 voltam saturados; os subdivididos, com um elemento cada"""
+    consultas = []
+
+    def consultar(query, usar_cache=True, renovar=False):
+        consultas.append(query)
+        return _nodes(ladrilhos.LIMITE_POR_LADRILHO) if len(consultas) == 1 else _nodes(1)
+
+    monkeypatch.setattr(ladrilhos, "consultar_overpass", consultar)
+    monkeypatch.setattr(ladrilhos, "usar_osm_local", lambda: False)
+    return consultas
+
+
+def test_ladrilho_saturado_e_subdividido_e_partes_recusadas_ficam_de_fora(overpass_falso):
+    elementos = ladrilhos.buscar_ladrilho((0.0, 0.0, 0.1, 0.1), ["amenity"], manter=lambda caixa: caixa[0] == 0.0)
+    assert len(overpass_falso) == 3  # O ladrilho e os dois quadrantes do sul
+    assert len(elementos) == 2
+
+
+def test_ladrilhos_fora_do_contorno_nao_sao_consultados(overpass_falso):
+    caixa = (-23.65, -46.75, -23.45, -46.55)
+    buscar_em_ladrilhos(
+        (-23.55, -46.65), ["amenity"], caixa=caixa, max_simultaneos=1, manter=lambda ladrilho: ladrilho[1] == -46.7
+    )
+    # Só a coluna de oeste -46,7: 3 ladrilhos, mais os 2 quadrantes mantidos do que saturou
+    assert len(overpass_falso) == 5
+
+
+def test_area_grande_demais_e_recusada_antes_de_consultar(overpass_falso):
+    with pytest.raises(AreaGrandeDemais):
+        buscar_em_ladrilhos((-5.0, -52.0), ["amenity"], caixa=(-8.0, -55.0, -2.0, -49.0))
+    assert overpass_falso == []
+
+
+class Cancelado(Exception):
+    pass
+
+
+def test_progresso_pode_interromper_a_busca(monkeypatch):
+    consultas = []
+    monkeypatch.setattr(ladrilhos, "usar_osm_local", lambda: False)
+    monkeypatch.setattr(
+        ladrilhos, "consultar_overpass", lambda query, usar_cache=True, renovar=False: consultas.append(query) or []
+    )
+
+    def cancelar(concluidos, total):
+        raise Cancelado
+
+    with pytest.raises(Cancelado):
+        buscar_em_ladrilhos((-23.55, -46.65), ["amenity"], max_simultaneos=1, ao_progredir=cancelar)
+    # Os ladrilhos ainda na fila são cancelados
+    assert len(consultas) < len(gerar_ladrilhos(ladrilhos.caixa_ao_redor(-23.55, -46.65)))
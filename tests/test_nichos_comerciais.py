@@ -0,0 +1,16 @@
+from nichos_comerciais import TAGS_POR_CATEGORIA, mapear_categoria_para_tags, obter_todas_categorias
+
+
+def test_toda_categoria_tem_tags():
+    sem_tags = [categoria for categoria in obter_todas_categorias() if not mapear_categoria_para_tags(categoria)]
+    assert sem_tags == []
+
+
+def test_tags_bem_formadas():
+    malformadas = [tag for tags in TAGS_POR_CATEGORIA.values() for tag in tags if not tag or tag.count("=") > 1]
+    assert malformadas == []
+
+
+def test_busca_sem_acentos_e_caixa():
+    assert mapear_categoria_para_tags("FARMACIAS") == mapear_categoria_para_tags("Farmácias")
+    assert mapear_categoria_para_tags("categoria inexistente") is None
@@ -0,0 +1,37 @@
+import json
+import os
+
+import pytest
+
+from identidade_leads import id_osm
+from osm_local import buscar_no_raio, disponivel, importar_elementos
+
+AMOSTRA = os.path.join(os.path.dirname(__file__), "fixtures", "osm_amostra.json")
+CENTRO = (-23.5505, -46.6333)
+
+
+@pytest.fixture
+def extrato(tmp_path):
+    caminho = str(tmp_path / "osm_local.sqlite3")
+    with open(AMOSTRA, encoding="utf-8") as arquivo:
+        assert importar_elementos(json.load(arquivo), caminho) == 5  # O elemento sem chave indexada fica de fora
+    return caminho
+
+
+def test_disponivel_so_depois_de_importar(tmp_path, extrato):
+    assert not disponivel(str(tmp_path / "vazio.sqlite3"))
+    assert disponivel(extrato)
+
+
+def test_busca_por_raio_e_tags(extrato):
+    elementos = buscar_no_raio(*CENTRO, 3000, ["amenity=restaurant"], 50, caminho=extrato)
+    assert [id_osm(e) for e in elementos] == ["node/1", "way/3", "node/2"]
+    assert elementos[1]["center"] == {"lat": -23.546, "lon": -46.6333}
+
+
+def test_limite_por_tipo_e_desde(extrato):
+    assert [id_osm(e) for e in buscar_no_raio(*CENTRO, 3000, ["amenity=restaurant"], 1, caminho=extrato)] == [
+        "node/1", "way/3"
+    ]
+    novos = buscar_no_raio(*CENTRO, 3000, ["amenity"], 50, desde="2024-01-01T00:00:00Z", caminho=extrato)
+    assert [id_osm(e) for e in novos] == ["node/2"]
@@ -0,0 +1,29 @@
+from overpass import agrupar_tags, montar_query_caixa, montar_query_overpass
+
+
+def test_agrupar_tags_por_chave():
+    grupos = agrupar_tags(["amenity=restaurant", "amenity=cafe", "amenity=cafe", "shop=bakery"])
+    assert grupos == {"amenity": ["restaurant", "cafe"], "shop": ["bakery"]}
+
+
+def test_chave_sem_valor_aceita_qualquer_valor():
+    assert agrupar_tags(["office", "office=lawyer"]) == {"office": None}
+    assert agrupar_tags(["office=lawyer", "office"]) == {"office": None}
+
+
+def test_query_com_um_nwr_por_chave_e_corte_no_servidor():
+    query = montar_query_overpass(-23.5, -46.6, 3000, ["amenity=restaurant", "amenity=fast_food", "craft"], 50)
+    assert 'nwr["amenity"~"^(restaurant|fast_food)$"](around:3000,-23.5,-46.6);' in query
+    assert 'nwr["craft"](around:3000,-23.5,-46.6);' in query
+    assert query.count("nwr[") == 2
+    assert "node.r;out qt 50;" in query and "wr.r;out tags center qt 50;" in query
+
+
+def test_query_incremental_e_por_caixa():
+    query = montar_query_caixa((-23.6, -46.7, -23.5, -46.6), ["shop=bakery"], 200, desde="2024-01-01T00:00:00Z")
+    assert 'nwr["shop"="bakery"](newer:"2024-01-01T00:00:00Z")(-23.60000,-46.70000,-23.50000,-46.60000);' in query
+
+
+def test_valores_com_caracteres_especiais_sao_escapados():
+    query = montar_query_overpass(0, 0, 100, ["cuisine=a.b", "cuisine=c+d"])
+    assert r'"^(a\.b|c\+d)$"' in query
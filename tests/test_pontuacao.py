@@ -0,0 +1,33 @@
+import pandas as pd
+
+from pontuacao import calcular_prioridade_score, pontuar_leads
+
+LEADS = [
+    {"site": "", "facebook": "", "instagram": ""},
+    {"site": "exemplo.com.br", "facebook": "fb.com/x", "instagram": ""},
+    {"site": "exemplo.com.br"},
+    {"site": None, "instagram": "@loja"},
+]
+AUDITORIAS = [
+    {},
+    {"responde": True, "tem_https": False, "tem_mobile": True, "tempo": 0.4, "ttfb_ms": 1500, "tamanho_bytes": None},
+    {"responde": False},
+    {"responde": None, "tempo": float("nan")},
+]
+
+
+def test_caminho_escalar_igual_ao_vetorizado():
+    vetorizado = pontuar_leads(pd.DataFrame(LEADS), pd.DataFrame(AUDITORIAS))
+    for i, (lead, analise) in enumerate(zip(LEADS, AUDITORIAS)):
+        escalar = calcular_prioridade_score(lead, analise)
+        linha = vetorizado.iloc[i]
+        assert escalar["score"] == linha["score"]
+        assert escalar["prioridade_nivel"] == linha["prioridade_nivel"]
+        assert escalar["prioridade"] == linha["prioridade"]
+        assert escalar["sugestoes"] == linha["sugestoes"]
+
+
+def test_lead_sem_redes_sociais_nas_chaves():
+    resultado = calcular_prioridade_score({"site": ""}, {})
+    assert "📱 Redes Sociais" in resultado["sugestoes"]
+    assert not pontuar_leads(pd.DataFrame([{"site": ""}]), pd.DataFrame([{}])).empty
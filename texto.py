@@ -0,0 +1,11 @@
+"""
+Utilitários de texto sem dependências externas, usados para comparar nomes de cidades, categorias e empresas
+"""
+
+import unicodedata
+
+
+def normalizar_texto(texto: str) -> str:
+    """Remove acentos, espaços extras e caixa para comparar nomes"""
+    sem_acentos = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return " ".join(sem_acentos.lower().split())